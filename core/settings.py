@@ -91,6 +91,28 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # le transazioni prendono subito il lock di scrittura: su SQLite
+            # select_for_update non esiste, così i flussi come
+            # respond_replacement restano serializzati
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+        # database di test su file: con quello in memoria (cache condivisa) i
+        # test con più thread ricevono "database table is locked" invece di
+        # attendere il lock come in produzione
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
+    }
+}
+
+
+# Cache (risposte dei calendari, vedi shifts/cache.py)
+# LocMem è per-processo: con più worker usare un backend condiviso (es. Redis)
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'shiftmanager',
     }
 }
 
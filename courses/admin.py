@@ -8,15 +8,15 @@ from .models import (
 
 @admin.register(CategoryBaseRate)
 class CategoryBaseRateAdmin(admin.ModelAdmin):
-    list_display = ("role", "base_rate")
+    list_display = ("role", "base_rate", "effective_from", "effective_to")
     search_fields = ("role__code", "role__label")
-    ordering = ("role__code",)
+    ordering = ("role__code", "effective_from")
     autocomplete_fields = ("role",)
 
 
 @admin.register(UserHourlyRate)
 class UserHourlyRateAdmin(admin.ModelAdmin):
-    list_display = ("user", "rate")
+    list_display = ("user", "rate", "effective_from", "effective_to")
     search_fields = ("user__username",)
     autocomplete_fields = ("user",)
     
@@ -33,7 +33,7 @@ class CourseTypeAdmin(admin.ModelAdmin):
 
 @admin.register(InstructorCourseRate)
 class InstructorCourseRateAdmin(admin.ModelAdmin):
-    list_display = ("instructor", "course_type", "rate")
+    list_display = ("instructor", "course_type", "rate", "effective_from", "effective_to")
     search_fields = ("instructor__username", "course_type__name")
     autocomplete_fields = ("instructor", "course_type")
     list_filter = ("course_type",)
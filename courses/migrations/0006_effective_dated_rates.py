@@ -0,0 +1,85 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:31
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0005_alter_categorybaserate_options_and_more'),
+        ('users', '0006_payroll_close_payslip'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='instructorcourserate',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='categorybaserate',
+            name='effective_from',
+            field=models.DateField(blank=True, null=True, verbose_name='Valida dal'),
+        ),
+        migrations.AddField(
+            model_name='categorybaserate',
+            name='effective_to',
+            field=models.DateField(blank=True, null=True, verbose_name='Valida fino al'),
+        ),
+        migrations.AddField(
+            model_name='instructorcourserate',
+            name='effective_from',
+            field=models.DateField(blank=True, null=True, verbose_name='Valida dal'),
+        ),
+        migrations.AddField(
+            model_name='instructorcourserate',
+            name='effective_to',
+            field=models.DateField(blank=True, null=True, verbose_name='Valida fino al'),
+        ),
+        migrations.AddField(
+            model_name='userhourlyrate',
+            name='effective_from',
+            field=models.DateField(blank=True, null=True, verbose_name='Valida dal'),
+        ),
+        migrations.AddField(
+            model_name='userhourlyrate',
+            name='effective_to',
+            field=models.DateField(blank=True, null=True, verbose_name='Valida fino al'),
+        ),
+        migrations.AlterField(
+            model_name='categorybaserate',
+            name='role',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='base_rates', to='users.userrole', verbose_name='Ruolo'),
+        ),
+        migrations.AlterField(
+            model_name='userhourlyrate',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hourly_rates', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='categorybaserate',
+            constraint=models.UniqueConstraint(fields=('role', 'effective_from'), name='unique_base_rate_from'),
+        ),
+        migrations.AddConstraint(
+            model_name='categorybaserate',
+            constraint=models.UniqueConstraint(condition=models.Q(('effective_from__isnull', True)), fields=('role',), name='unique_base_rate_open_start'),
+        ),
+        migrations.AddConstraint(
+            model_name='instructorcourserate',
+            constraint=models.UniqueConstraint(fields=('instructor', 'course_type', 'effective_from'), name='unique_instructor_rate_from'),
+        ),
+        migrations.AddConstraint(
+            model_name='instructorcourserate',
+            constraint=models.UniqueConstraint(condition=models.Q(('effective_from__isnull', True)), fields=('instructor', 'course_type'), name='unique_instructor_rate_open_start'),
+        ),
+        migrations.AddConstraint(
+            model_name='userhourlyrate',
+            constraint=models.UniqueConstraint(fields=('user', 'effective_from'), name='unique_user_rate_from'),
+        ),
+        migrations.AddConstraint(
+            model_name='userhourlyrate',
+            constraint=models.UniqueConstraint(condition=models.Q(('effective_from__isnull', True)), fields=('user',), name='unique_user_rate_open_start'),
+        ),
+    ]
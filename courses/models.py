@@ -1,15 +1,59 @@
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.conf import settings
 
 
+# ================================
+# Validità delle tariffe nel tempo
+# ================================
+class EffectiveDatedRate(models.Model):
+    """
+    Periodo di validità di una tariffa: da effective_from a effective_to
+    (inclusi). Date vuote = nessun limite. Le tariffe passate restano
+    salvate, così i compensi storici non cambiano.
+    """
+    effective_from = models.DateField(null=True, blank=True, verbose_name='Valida dal')
+    effective_to = models.DateField(null=True, blank=True, verbose_name='Valida fino al')
+
+    # campi che identificano la tariffa (es. ("role",))
+    rate_key = ()
+
+    class Meta:
+        abstract = True
+
+    def covers(self, day):
+        return (
+            (self.effective_from is None or self.effective_from <= day) and
+            (self.effective_to is None or day <= self.effective_to)
+        )
+
+    def clean(self):
+        super().clean()
+        if self.effective_from and self.effective_to and self.effective_to < self.effective_from:
+            raise ValidationError("La data di fine validità precede quella di inizio")
+
+        # nessuna sovrapposizione con gli altri periodi della stessa tariffa
+        if not all(getattr(self, f"{field}_id", None) for field in self.rate_key):
+            return
+        others = type(self).objects.filter(
+            **{f"{field}_id": getattr(self, f"{field}_id") for field in self.rate_key}
+        ).exclude(pk=self.pk)
+        if self.effective_to:
+            others = others.exclude(effective_from__gt=self.effective_to)
+        if self.effective_from:
+            others = others.exclude(effective_to__lt=self.effective_from)
+        if others.exists():
+            raise ValidationError("Il periodo di validità si sovrappone a un'altra tariffa")
+
+
 # ================================
 # 1️ - Tariffe base per ogni ruolo/categoria.
 # ================================
-class CategoryBaseRate(models.Model):
-    role = models.OneToOneField(
+class CategoryBaseRate(EffectiveDatedRate):
+    role = models.ForeignKey(
         'users.UserRole',
         on_delete=models.CASCADE,
-        related_name='base_rate',
+        related_name='base_rates',
         verbose_name='Ruolo'
     )
     base_rate = models.DecimalField(
@@ -18,9 +62,22 @@ class CategoryBaseRate(models.Model):
         verbose_name='Tariffa base (€/h)'
     )
 
+    rate_key = ("role",)
+
     class Meta:
         verbose_name = 'Tariffa base per categoria'
         verbose_name_plural = 'Tariffe base per categoria'
+        constraints = [
+            models.UniqueConstraint(
+                fields=["role", "effective_from"],
+                name="unique_base_rate_from",
+            ),
+            models.UniqueConstraint(
+                fields=["role"],
+                condition=models.Q(effective_from__isnull=True),
+                name="unique_base_rate_open_start",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.role.label}: {self.base_rate} €/h"
@@ -30,14 +87,29 @@ class CategoryBaseRate(models.Model):
 # 2️ - Tariffe personalizzate per utente
 # (bagnino, segreteria, pulizie)
 # ====================================
-class UserHourlyRate(models.Model):
-    user = models.OneToOneField(
+class UserHourlyRate(EffectiveDatedRate):
+    user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
-        related_name="custom_hourly_rate"
+        related_name="hourly_rates"
     )
     rate = models.DecimalField(max_digits=6, decimal_places=2)
 
+    rate_key = ("user",)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "effective_from"],
+                name="unique_user_rate_from",
+            ),
+            models.UniqueConstraint(
+                fields=["user"],
+                condition=models.Q(effective_from__isnull=True),
+                name="unique_user_rate_open_start",
+            ),
+        ]
+
     def __str__(self):
         return f"{self.user.username}: {self.rate} €/h"
 
@@ -57,7 +129,7 @@ class CourseType(models.Model):
 # ==================================================
 # 4️ - Tariffa personalizzata dell'istruttore per corso
 # ==================================================
-class InstructorCourseRate(models.Model):
+class InstructorCourseRate(EffectiveDatedRate):
     instructor = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
@@ -70,8 +142,20 @@ class InstructorCourseRate(models.Model):
     )
     rate = models.DecimalField(max_digits=6, decimal_places=2)
 
+    rate_key = ("instructor", "course_type")
+
     class Meta:
-        unique_together = ("instructor", "course_type")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["instructor", "course_type", "effective_from"],
+                name="unique_instructor_rate_from",
+            ),
+            models.UniqueConstraint(
+                fields=["instructor", "course_type"],
+                condition=models.Q(effective_from__isnull=True),
+                name="unique_instructor_rate_open_start",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.instructor.username} – {self.course_type.name}: {self.rate} €"
\ No newline at end of file
@@ -0,0 +1,254 @@
+"""
+Calcolo dei compensi mensili lato server.
+
+Le durate arrivano già sommate per utente, mese, ruolo e tipo di corso
+dal registro ore (shifts.MonthlyHoursLedger), quindi la lettura costa
+O(utenti) e non O(turni). Le tariffe hanno uno storico con date di
+validità: vengono risolte in memoria dal RateResolver (un solo
+caricamento dello storico, lookup con bisect sul giorno).
+
+I mesi in cui cambia una tariffa, o coperti solo in parte dall'intervallo
+richiesto, vengono sommati direttamente dai turni raggruppati per giorno,
+così ogni giorno è prezzato con la tariffa valida in quel giorno.
+
+Regole (le stesse di ContabilitaDettaglio):
+- ruoli a ore (bagnino, segreteria, pulizia): ore × tariffa, dove la
+  tariffa è UserHourlyRate dell'utente, altrimenti CategoryBaseRate del ruolo
+- istruttore: tariffa InstructorCourseRate dell'istruttore per il corso,
+  altrimenti CourseType.base_rate; i corsi in HOURLY_INSTRUCTOR_COURSES
+  sono pagati a ore, tutti gli altri a turno
+"""
+import heapq
+from datetime import timedelta
+from decimal import Decimal
+from itertools import groupby
+
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+from shifts.ledger import month_start, shift_minutes
+from shifts.models import MonthlyHoursLedger, Shift
+from .rates import get_resolver
+
+ROW_FIELDS = (
+    "user_id",
+    "user__username",
+    "user__first_name",
+    "user__last_name",
+    "role_id",
+    "role__code",
+    "role__label",
+    "course_type_id",
+    "course_type__name",
+)
+
+
+def _next_month(day):
+    return (day + timedelta(days=32)).replace(day=1)
+
+
+def _plan_months(start, end, boundaries):
+    """
+    Divide l'intervallo in mesi letti dal registro ore (interi, senza cambi
+    di tariffa dopo il primo giorno) e intervalli da sommare dai turni.
+    """
+    ledger_months, shift_ranges = [], []
+    current = month_start(start)
+    while current <= end:
+        last = _next_month(current) - timedelta(days=1)
+        whole = start <= current and last <= end
+        changes = any(current < day <= last for day in boundaries)
+        if whole and not changes:
+            ledger_months.append(current)
+        else:
+            shift_ranges.append((max(start, current), min(end, last)))
+        current = _next_month(current)
+    return ledger_months, shift_ranges
+
+
+def _ledger_rows(months, user_ids):
+    if not months:
+        return
+    qs = MonthlyHoursLedger.objects.filter(month__in=months)
+    if user_ids is not None:
+        qs = qs.filter(user_id__in=user_ids)
+
+    rows = (
+        qs
+        .values(*ROW_FIELDS, "month")
+        .annotate(minutes=Sum("total_minutes"), shifts=Sum("shift_count"))
+        .order_by("month", "user__username", "role__code", "course_type__name")
+    )
+    for row in rows.iterator(chunk_size=2000):
+        row["day"] = row["month"]
+        row["year"], row["month"] = row["day"].year, row["day"].month
+        yield row
+
+
+def _shift_rows(ranges, user_ids):
+    if not ranges:
+        return
+    period = Q()
+    for range_start, range_end in ranges:
+        period |= Q(date__gte=range_start, date__lte=range_end)
+
+    qs = Shift.objects.filter(period)
+    if user_ids is not None:
+        qs = qs.filter(user_id__in=user_ids)
+
+    rows = (
+        qs
+        .annotate(year=ExtractYear("date"), month_number=ExtractMonth("date"))
+        .values(*ROW_FIELDS, "year", "month_number", "date")
+        .annotate(minutes=Sum(shift_minutes()), shifts=Count("id"))
+        .order_by("year", "month_number", "user__username", "role__code", "course_type__name", "date")
+    )
+    for row in rows.iterator(chunk_size=2000):
+        row["day"] = row.pop("date")
+        row["month"] = row.pop("month_number")
+        yield row
+
+
+def _rate(value):
+    return Decimal(value if value is not None else 0).quantize(Decimal("0.01"))
+
+
+def priced_lines(start, end, user_ids=None):
+    """
+    Voci di compenso tra start e end (inclusi), in ordine di mese e utente:
+    una per (utente, mese, ruolo, tipo corso, tariffa). Se la tariffa cambia
+    nel mese la stessa voce compare una volta per ogni tariffa.
+
+    Restituisce coppie (riga, voce) dove riga contiene i dati anagrafici.
+    """
+    resolver = get_resolver()
+    ledger_months, shift_ranges = _plan_months(start, end, resolver.boundaries())
+
+    # i due flussi coprono mesi diversi: basta unirli per (anno, mese)
+    rows = heapq.merge(
+        _ledger_rows(ledger_months, user_ids),
+        _shift_rows(shift_ranges, user_ids),
+        key=lambda r: (r["year"], r["month"]),
+    )
+
+    def group_key(row):
+        return (row["user_id"], row["year"], row["month"], row["role_id"], row["course_type_id"])
+
+    for _, group in groupby(rows, key=group_key):
+        first = None
+        totals = {}
+        for row in group:
+            first = first or row
+            unit, rate = resolver.unit_and_rate(
+                row["user_id"], row["role_id"], row["course_type_id"], row["day"]
+            )
+            entry = totals.setdefault((unit, _rate(rate)), [0, 0])
+            entry[0] += row["minutes"] or 0
+            entry[1] += row["shifts"]
+
+        for (unit, rate), (minutes, shifts) in totals.items():
+            yield first, price_line(first, resolver, unit, rate, minutes, shifts)
+
+
+def price_line(row, resolver, unit, rate, minutes, shifts):
+    """Voce di compenso per una riga aggregata con unità e tariffa già risolte."""
+    if unit == "hour":
+        quantity = Decimal(minutes) / Decimal(60)
+    else:
+        quantity = Decimal(shifts)
+
+    if resolver.is_instructor(row["role_id"]):
+        section, label = "instructor", f"Istruttore – {row['course_type__name'] or 'Altro'}"
+    else:
+        section, label = "role", row["role__label"]
+
+    return {
+        "section": section,
+        "label": label,
+        "role_id": row["role_id"],
+        "role_code": row["role__code"],
+        "course_type_id": row["course_type_id"],
+        "course_name": row["course_type__name"],
+        "unit": unit,
+        "minutes": minutes,
+        "shifts": shifts,
+        "quantity": quantity.quantize(Decimal("0.01")),
+        "rate": rate,
+        "subtotal": (quantity * rate).quantize(Decimal("0.01")),
+    }
+
+
+def compute_payroll(start, end, user_ids=None):
+    """
+    Compensi per utente e per mese tra start e end (inclusi).
+
+    Restituisce una lista di dict:
+    {user_id, username, year, month, lines: [...], total}
+    """
+    results = []
+    current = None
+
+    for row, line in priced_lines(start, end, user_ids):
+        key = (row["user_id"], row["year"], row["month"])
+        if current is None or current["_key"] != key:
+            current = {
+                "_key": key,
+                "user_id": row["user_id"],
+                "username": row["user__username"],
+                "year": row["year"],
+                "month": row["month"],
+                "lines": [],
+                "total": Decimal("0.00"),
+            }
+            results.append(current)
+
+        current["lines"].append(line)
+        current["total"] += line["subtotal"]
+
+    for item in results:
+        del item["_key"]
+    results.sort(key=lambda r: (r["username"], r["year"], r["month"]))
+    return results
+
+
+# ----------------------------------------------------------
+# EXPORT (streaming)
+# ----------------------------------------------------------
+EXPORT_COLUMNS = [
+    "user_id",
+    "username",
+    "first_name",
+    "last_name",
+    "year",
+    "month",
+    "role_code",
+    "course_type_id",
+    "course_name",
+    "unit",
+    "minutes",
+    "shifts",
+    "quantity",
+    "rate",
+    "subtotal",
+]
+
+
+def iter_line_items(start, end):
+    """
+    Voci di compenso di tutti i collaboratori tra start e end (inclusi),
+    in ordine di mese e utente.
+
+    Le righe aggregate arrivano da .iterator() a blocchi e vengono prezzate
+    con il RateResolver in memoria: la memoria resta costante anche per
+    un anno intero di turni.
+    """
+    for row, line in priced_lines(start, end):
+        yield {
+            "user_id": row["user_id"],
+            "username": row["user__username"],
+            "first_name": row["user__first_name"],
+            "last_name": row["user__last_name"],
+            "year": row["year"],
+            "month": row["month"],
+            **{key: line[key] for key in EXPORT_COLUMNS[6:]},
+        }
@@ -0,0 +1,173 @@
+"""
+Risoluzione in memoria delle tariffe.
+
+RateResolver carica una sola volta lo storico delle quattro tabelle delle
+tariffe (UserHourlyRate, CategoryBaseRate, InstructorCourseRate, CourseType)
+e risponde a ogni lookup senza query per turno: per ogni chiave i periodi
+di validità sono ordinati per data di inizio e la tariffa di un giorno si
+trova con bisect in O(log k). L'istanza condivisa viene invalidata dai
+signal di save/delete su quei modelli (vedi courses/signals.py).
+"""
+import threading
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+
+from .models import CategoryBaseRate, CourseType, InstructorCourseRate, UserHourlyRate
+
+INSTRUCTOR_ROLE_CODE = "istruttore"
+HOURLY_INSTRUCTOR_COURSES = {"propaganda", "agonismo"}
+
+ZERO = Decimal("0.00")
+
+
+class RateTimeline:
+    """
+    Periodi di validità per chiave, ordinati per inizio.
+    Un inizio vuoto vale date.min, una fine vuota date.max.
+    """
+
+    def __init__(self, rows):
+        periods = defaultdict(list)
+        for key, start, end, rate in rows:
+            periods[key].append((start or date.min, end or date.max, rate))
+
+        self._starts = {}
+        self._periods = {}
+        for key, items in periods.items():
+            items.sort(key=lambda item: item[0])
+            self._starts[key] = [item[0] for item in items]
+            self._periods[key] = items
+
+    def at(self, key, day):
+        """Tariffa valida per la chiave nel giorno indicato (None se assente)."""
+        starts = self._starts.get(key)
+        if not starts:
+            return None
+        index = bisect_right(starts, day) - 1
+        if index < 0:
+            return None
+        _, end, rate = self._periods[key][index]
+        return rate if day <= end else None
+
+    def boundaries(self):
+        """Giorni in cui almeno una tariffa cambia (inizi e giorni dopo le fini)."""
+        days = set()
+        for items in self._periods.values():
+            for start, end, _ in items:
+                if start != date.min:
+                    days.add(start)
+                if end != date.max:
+                    days.add(date.fromordinal(end.toordinal() + 1))
+        return days
+
+
+class RateResolver:
+    """
+    Tariffe con le stesse regole di precedenza della contabilità,
+    valutate nel giorno del turno:
+    - ruoli a ore: UserHourlyRate dell'utente, altrimenti CategoryBaseRate del ruolo
+    - istruttore: InstructorCourseRate (istruttore, corso), altrimenti CourseType.base_rate
+    """
+
+    def __init__(self):
+        from users.models import UserRole
+
+        self.role_codes = dict(UserRole.objects.values_list("id", "code"))
+        self.user_rates = RateTimeline(
+            (user_id, start, end, rate)
+            for user_id, start, end, rate in UserHourlyRate.objects.values_list(
+                "user_id", "effective_from", "effective_to", "rate"
+            )
+        )
+        self.base_rates = RateTimeline(
+            (role_id, start, end, rate)
+            for role_id, start, end, rate in CategoryBaseRate.objects.values_list(
+                "role_id", "effective_from", "effective_to", "base_rate"
+            )
+        )
+        self.instructor_rates = RateTimeline(
+            ((instructor_id, course_type_id), start, end, rate)
+            for instructor_id, course_type_id, start, end, rate in InstructorCourseRate.objects.values_list(
+                "instructor_id", "course_type_id", "effective_from", "effective_to", "rate"
+            )
+        )
+        self.course_rates = {}
+        self.course_names = {}
+        for course_id, name, rate in CourseType.objects.values_list("id", "name", "base_rate"):
+            self.course_rates[course_id] = rate
+            self.course_names[course_id] = name
+
+    def is_instructor(self, role_id):
+        return self.role_codes.get(role_id) == INSTRUCTOR_ROLE_CODE
+
+    def is_hourly_course(self, course_type_id):
+        name = self.course_names.get(course_type_id) or ""
+        return name.lower() in HOURLY_INSTRUCTOR_COURSES
+
+    def boundaries(self):
+        """Giorni in cui cambia almeno una tariffa dello storico."""
+        return (
+            self.user_rates.boundaries() |
+            self.base_rates.boundaries() |
+            self.instructor_rates.boundaries()
+        )
+
+    def hourly_rate(self, user_id, role_id, day):
+        """Tariffa oraria per i ruoli non istruttore, valida nel giorno indicato."""
+        rate = self.user_rates.at(user_id, day)
+        if rate is None:
+            rate = self.base_rates.at(role_id, day)
+        return rate if rate is not None else ZERO
+
+    def course_rate(self, user_id, course_type_id, day):
+        """Tariffa dell'istruttore per un tipo di corso (a turno o a ora)."""
+        if course_type_id is None:
+            return ZERO
+        rate = self.instructor_rates.at((user_id, course_type_id), day)
+        if rate is None:
+            rate = self.course_rates.get(course_type_id)
+        return rate if rate is not None else ZERO
+
+    def unit_and_rate(self, user_id, role_id, course_type_id, day):
+        """Unità ("hour" / "turn") e tariffa di un turno nel giorno indicato."""
+        if self.is_instructor(role_id):
+            unit = "hour" if self.is_hourly_course(course_type_id) else "turn"
+            return unit, self.course_rate(user_id, course_type_id, day)
+        return "hour", self.hourly_rate(user_id, role_id, day)
+
+    def price(self, user_id, role_id, course_type_id, minutes, shifts, day):
+        """
+        Prezza una voce (uno o più turni dello stesso tipo con la stessa tariffa).
+        Restituisce (unit, quantity, rate, subtotal) con unit "hour" o "turn".
+        """
+        unit, rate = self.unit_and_rate(user_id, role_id, course_type_id, day)
+        if unit == "hour":
+            quantity = Decimal(minutes) / Decimal(60)
+        else:
+            quantity = Decimal(shifts)
+
+        return unit, quantity, rate, (quantity * rate).quantize(Decimal("0.01"))
+
+
+_lock = threading.Lock()
+_resolver = None
+
+
+def get_resolver():
+    """Istanza condivisa, ricaricata pigramente dopo un'invalidazione."""
+    global _resolver
+    resolver = _resolver
+    if resolver is None:
+        with _lock:
+            if _resolver is None:
+                _resolver = RateResolver()
+            resolver = _resolver
+    return resolver
+
+
+def invalidate_resolver():
+    global _resolver
+    with _lock:
+        _resolver = None
@@ -0,0 +1,25 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import CategoryBaseRate, CourseType, InstructorCourseRate, UserHourlyRate
+from .rates import invalidate_resolver
+
+
+# ----------------------------------------------------------
+# INVALIDAZIONE RateResolver
+# ----------------------------------------------------------
+@receiver(post_save, sender=CategoryBaseRate)
+@receiver(post_save, sender=UserHourlyRate)
+@receiver(post_save, sender=InstructorCourseRate)
+@receiver(post_save, sender=CourseType)
+@receiver(post_delete, sender=CategoryBaseRate)
+@receiver(post_delete, sender=UserHourlyRate)
+@receiver(post_delete, sender=InstructorCourseRate)
+@receiver(post_delete, sender=CourseType)
+@receiver(post_save, sender="users.UserRole")
+@receiver(post_delete, sender="users.UserRole")
+def rates_changed(sender, **kwargs):
+    # subito per il thread corrente, di nuovo al commit per gli altri
+    invalidate_resolver()
+    transaction.on_commit(invalidate_resolver)
@@ -0,0 +1,98 @@
+from datetime import date, time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from shifts.models import Shift
+from users.models import UserRole
+from .models import CategoryBaseRate, CourseType, InstructorCourseRate, UserHourlyRate
+from .payroll import compute_payroll
+from .rates import get_resolver
+
+User = get_user_model()
+
+
+# ============================================================
+#  TARIFFE CON DATE DI VALIDITÀ (user-012)
+# ============================================================
+class RateChangeMidMonthTests(TestCase):
+    def setUp(self):
+        self.role = UserRole.objects.get(code="bagnino")
+        CategoryBaseRate.objects.filter(role=self.role).delete()
+        CategoryBaseRate.objects.create(
+            role=self.role, base_rate=Decimal("10.00"), effective_to=date(2025, 3, 14),
+        )
+        CategoryBaseRate.objects.create(
+            role=self.role, base_rate=Decimal("20.00"), effective_from=date(2025, 3, 15),
+        )
+        self.user = User.objects.create(username="mario")
+
+    def _shift(self, day, start=8, end=10, **kwargs):
+        return Shift.objects.create(
+            user=self.user, role=self.role, date=day, start_time=time(start), end_time=time(end), **kwargs
+        )
+
+    def _lines(self, start, end):
+        (payroll,) = compute_payroll(start, end)
+        return payroll, sorted((line["rate"], line["quantity"], line["subtotal"]) for line in payroll["lines"])
+
+    def test_resolver_switches_on_the_effective_date(self):
+        resolver = get_resolver()
+        self.assertEqual(resolver.hourly_rate(self.user.id, self.role.id, date(2025, 3, 14)), Decimal("10.00"))
+        self.assertEqual(resolver.hourly_rate(self.user.id, self.role.id, date(2025, 3, 15)), Decimal("20.00"))
+        self.assertIn(date(2025, 3, 15), resolver.boundaries())
+
+    def test_month_is_split_at_the_effective_date(self):
+        self._shift(date(2025, 3, 14))
+        self._shift(date(2025, 3, 15))
+        self._shift(date(2025, 3, 31), 9, 10)
+
+        payroll, lines = self._lines(date(2025, 3, 1), date(2025, 3, 31))
+
+        self.assertEqual(lines, [
+            (Decimal("10.00"), Decimal("2.00"), Decimal("20.00")),
+            (Decimal("20.00"), Decimal("3.00"), Decimal("60.00")),
+        ])
+        self.assertEqual(payroll["total"], Decimal("80.00"))
+
+    def test_month_without_changes_matches_the_shifts(self):
+        # aprile arriva dal registro ore, come un mese intero senza cambi
+        self._shift(date(2025, 4, 1))
+        self._shift(date(2025, 4, 30), 14, 17)
+
+        payroll, lines = self._lines(date(2025, 4, 1), date(2025, 4, 30))
+
+        self.assertEqual(lines, [(Decimal("20.00"), Decimal("5.00"), Decimal("100.00"))])
+
+    def test_user_rate_overrides_the_base_rate_from_its_start(self):
+        UserHourlyRate.objects.create(user=self.user, rate=Decimal("12.50"), effective_from=date(2025, 3, 20))
+        self._shift(date(2025, 3, 17))
+        self._shift(date(2025, 3, 24))
+
+        _, lines = self._lines(date(2025, 3, 1), date(2025, 3, 31))
+
+        self.assertEqual(lines, [
+            (Decimal("12.50"), Decimal("2.00"), Decimal("25.00")),
+            (Decimal("20.00"), Decimal("2.00"), Decimal("40.00")),
+        ])
+
+    def test_instructor_course_rate_change_is_priced_per_turn(self):
+        instructor_role = UserRole.objects.get(code="istruttore")
+        course = CourseType.objects.create(name="Acquaticità", base_rate=Decimal("15.00"))
+        InstructorCourseRate.objects.create(
+            instructor=self.user, course_type=course, rate=Decimal("18.00"), effective_from=date(2025, 3, 10),
+        )
+        for day in (date(2025, 3, 3), date(2025, 3, 10), date(2025, 3, 17)):
+            Shift.objects.create(
+                user=self.user, role=instructor_role, course_type=course,
+                date=day, start_time=time(17), end_time=time(18),
+            )
+
+        payroll, lines = self._lines(date(2025, 3, 1), date(2025, 3, 31))
+
+        self.assertEqual({line["unit"] for line in payroll["lines"]}, {"turn"})
+        self.assertEqual(lines, [
+            (Decimal("15.00"), Decimal("1.00"), Decimal("15.00")),
+            (Decimal("18.00"), Decimal("2.00"), Decimal("36.00")),
+        ])
@@ -63,6 +63,7 @@ export default function App() {
   const [selectedMonth, setSelectedMonth] = useState(() => new Date());
   const [selectedWeeks, setSelectedWeeks] = useState([]);
   const [publishedWeeks, setPublishedWeeks] = useState([]);
+  const [autoAssign, setAutoAssign] = useState(false);
 
   const getWeeksOfMonth = (year, month) => {
     const firstDay = new Date(year, month, 1);
@@ -206,6 +207,17 @@ export default function App() {
   // ricarica events dai template
   
 
+  // scoperture della settimana tipo (ricalcolate a ogni modifica)
+  const [coverage, setCoverage] = useState([]);
+  const WEEKDAY_LABELS = ["Lunedì", "Martedì", "Mercoledì", "Giovedì", "Venerdì", "Sabato", "Domenica"];
+
+  const loadCoverage = () => {
+    api
+      .get("/templates/coverage/", { params: { category } })
+      .then((res) => setCoverage(res.data || []))
+      .catch(() => setCoverage([]));
+  };
+
   const loadEvents = () => {
     api.get(`/templates/?category=${category}`).then((res) => {
       const rows = Array.isArray(res.data) ? res.data : [];
@@ -240,6 +252,7 @@ export default function App() {
       setEvents(mapped);
       setCalendarKey((k) => k + 1);
     });
+    loadCoverage();
   };
 
 
@@ -511,6 +524,25 @@ export default function App() {
       {/* Calendario */}
       {renderCalendar()}
 
+      {/* Scoperture rispetto alle presenze richieste */}
+      {coverage.length > 0 && (
+        <div className="mt-4 p-3 border rounded bg-white">
+          <h2 className="font-semibold mb-2">Copertura</h2>
+          <ul className="text-sm space-y-1">
+            {coverage.map((c, i) => (
+              <li
+                key={i}
+                className={c.status === "under" ? "text-red-600" : "text-orange-500"}
+              >
+                {WEEKDAY_LABELS[c.weekday]} {c.start}–{c.end}:{" "}
+                {c.staffed} presenti,{" "}
+                {c.status === "under" ? `minimo ${c.required}` : `massimo ${c.required}`}
+              </li>
+            ))}
+          </ul>
+        </div>
+      )}
+
       {/* Popup pubblicazione */}
       {showPublishModal && (
         <div id="popup-overlay">
@@ -569,6 +601,15 @@ export default function App() {
               })}
             </div>
 
+            <label className="flex items-center gap-2 mb-3">
+              <input
+                type="checkbox"
+                checked={autoAssign}
+                onChange={(e) => setAutoAssign(e.target.checked)}
+              />
+              Assegna automaticamente gli slot liberi
+            </label>
+
             <button
               className="bg-green-600 hover:bg-green-700 text-white px-3 py-2 rounded w-full mb-2"
               onClick={async () => {
@@ -583,12 +624,50 @@ export default function App() {
                       end: w.end.toISOString().slice(0, 10),
                     }));
 
-                  await api.post("/shifts/publish/", {
+                  // proposta di assegnazione degli slot liberi, da confermare
+                  let assignments = [];
+                  if (autoAssign) {
+                    let unassigned = 0;
+                    for (const week of weeksPayload) {
+                      const { data } = await api.post("/templates/assign/", {
+                        category: category,
+                        week: week.start,
+                      });
+                      assignments = assignments.concat(data.assignments);
+                      unassigned += data.unassigned.length;
+                    }
+                    const preview = assignments
+                      .map((a) => `${a.date} ${a.start_time}-${a.end_time} → ${a.username}`)
+                      .join("\n");
+                    if (
+                      !window.confirm(
+                        `Slot assegnati: ${assignments.length}, scoperti: ${unassigned}\n\n${preview}\n\nPubblicare?`
+                      )
+                    ) {
+                      return;
+                    }
+                  }
+
+                  // la pubblicazione gira in background: polling del job
+                  let { data: job } = await api.post("/shifts/publish/", {
                     category: category,
                     weeks: weeksPayload,
+                    assignments: assignments,
+                    background: true,
                   });
 
-                  alert("Pubblicazione completata!");
+                  while (job.status === "queued" || job.status === "running") {
+                    await new Promise((r) => setTimeout(r, 1000));
+                    ({ data: job } = await api.get(`/jobs/${job.id}/`));
+                  }
+
+                  if (job.status === "failed") {
+                    throw new Error(job.error);
+                  }
+
+                  alert(
+                    `Pubblicazione completata! (creati ${job.created}, aggiornati ${job.updated}, eliminati ${job.deleted})`
+                  );
                   setShowPublishModal(false);
                 } catch (e) {
                   console.error(e);
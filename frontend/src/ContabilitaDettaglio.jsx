@@ -1,6 +1,6 @@
 import { useEffect, useState } from "react";
 import { useParams } from "react-router-dom";
-import api from "./api";
+import api, { getAllPages } from "./api";
 import "./ContabilitaDettaglio.css";
 
 
@@ -142,10 +142,7 @@ export default function ContabilitaDettaglio() {
 
   const [user, setUser] = useState(null);
   const [shifts, setShifts] = useState([]);
-  const [courseTypes, setCourseTypes] = useState([]);
-  const [baseRates, setBaseRates] = useState([]);
-  const [userHourlyRates, setUserHourlyRates] = useState([]);
-  const [instructorCourseRates, setInstructorCourseRates] = useState([]);
+  const [payroll, setPayroll] = useState(null);
   const [roles, setRoles] = useState([]);
 
   useEffect(() => {
@@ -161,16 +158,6 @@ export default function ContabilitaDettaglio() {
   const nonInstructorRoles = roles.filter(r => r.code !== "istruttore");
   const nonInstructorCodes = nonInstructorRoles.map(r => r.code);
 
-  // ruoli pagati a ore (NON istruttore)
-  const roleHourly = nonInstructorCodes;
-
-
-  useEffect(() => {
-    api.get("/courses/types/").then((r) => setCourseTypes(r.data || [])).catch(()=>{});
-    api.get("/courses/base-rates/").then((r) => setBaseRates(r.data || [])).catch(()=>{});
-    api.get("/courses/user-hourly-rates/").then((r) => setUserHourlyRates(r.data || [])).catch(()=>{});
-    api.get("/courses/instructor-course-rates/").then((r) => setInstructorCourseRates(r.data || [])).catch(()=>{});
-  }, []);
 
   // mese/anno attuali come stato, per poter cambiare mese
   const today = new Date();
@@ -206,17 +193,24 @@ export default function ContabilitaDettaglio() {
 
   useEffect(() => {
     // carica turni del mese selezionato
-    api
-      .get(
-        `/shifts/?user=${userId}&month=${currentMonth}&year=${currentYear}`
-      )
-      .then((res) => {
+    getAllPages(
+      `/shifts/?user=${userId}&month=${currentMonth}&year=${currentYear}`
+    )
+      .then((data) => {
         // ordina per data
-        const sorted = res.data.sort((a, b) =>
+        const sorted = data.sort((a, b) =>
           a.date.localeCompare(b.date)
         );
         setShifts(sorted);
       });
+
+    // compensi calcolati dal backend (stesse regole di tariffa)
+    api
+      .get(
+        `/contabilita/payroll/?user=${userId}&month=${currentMonth}&year=${currentYear}`
+      )
+      .then((res) => setPayroll(res.data?.[0] || null))
+      .catch(() => setPayroll(null));
   }, [userId, currentMonth, currentYear]);
 
   // Raggruppa turni per giorno
@@ -249,198 +243,28 @@ export default function ContabilitaDettaglio() {
   const formatEUR = (n) =>
     new Intl.NumberFormat("it-IT", { style: "currency", currency: "EUR" }).format(n);
 
-  // bagnino/segreteria/pulizia: prima personalizzata (UserHourlyRate), altrimenti base (CategoryBaseRate)
-  const getHourlyRateForRole = (roleCode) => {
-    const roleObj = roles.find(r => r.code === roleCode);
-    if (!roleObj) return 0;
-
-    // 🔹 USER OVERRIDE
-    const custom = userHourlyRates.find(
-      x =>
-        x.user === Number(userId) &&
-        (x.role === roleObj.id || x.category === roleObj.id)
-    );
-    if (custom?.rate != null) return Number(custom.rate);
-
-    // 🔹 BASE RATE
-    const base = baseRates.find(
-      x =>
-        x.role === roleObj.id ||
-        x.category === roleObj.id ||
-        x.category_id === roleObj.id
-    );
-
-    if (base?.base_rate != null) return Number(base.base_rate);
-    if (base?.rate != null) return Number(base.rate);
-
-    return 0;
-  };
-
-
-
-
   const pretty = (s) => (s ? s.charAt(0).toUpperCase() + s.slice(1) : s);
 
-  // costruisce righe di breakdown e totale
-  const computeMonthlyPayBreakdown = (shifts) => {
-    const HOURLY_INSTRUCTOR_COURSES = new Set(["propaganda", "agonismo"]);
-    const nonInstructorCodes = roles
-      .filter(r => r.code !== "istruttore")
-      .map(r => r.code);
-
-    // aggregazioni
-    const hoursByRole = {};
-    const instructorTurnsByCourse = {};
-    const instructorHoursByCourse = {};
-
-    for (const s of shifts) {
-      if (roleHourly.includes(s.role_data?.code)) {
-        hoursByRole[s.role_data.code] =
-          (hoursByRole[s.role_data.code] || 0) +
-          diffHours(s.start_time, s.end_time);
-        continue;
-      }
-
-
-      if (s.role_data?.code === "istruttore") {
-        const courseNameRaw = (s.course_type_data?.name || s.course?.name || "Altro").toLowerCase();
-        const courseTypeId = s.course_type_data?.id ?? s.course_type ?? null;
-
-        if (HOURLY_INSTRUCTOR_COURSES.has(courseNameRaw)) {
-          instructorHoursByCourse[courseNameRaw] = (instructorHoursByCourse[courseNameRaw] || 0) + diffHours(s.start_time, s.end_time);
-        } else {
-          // per corsi a turno raggruppiamo per courseTypeId, così la tariffa è corretta
-          const key = String(courseTypeId ?? courseNameRaw);
-          instructorTurnsByCourse[key] = instructorTurnsByCourse[key] || { count: 0, name: courseNameRaw, courseTypeId };
-          instructorTurnsByCourse[key].count += 1;
-        }
-      }
-    }
-
-    const lines = [];
-    let totalEUR = 0;
-
-    // --- bagnino/segreteria/pulizia ---
-    for (const role of roleHourly) {
-      const hours = hoursByRole[role] || 0;
-      if (hours <= 0) continue;
-
-      const rate = getHourlyRateForRole(role);
-      const subtotal = hours * rate;
-      totalEUR += subtotal;
-
-      lines.push({
-        section: "role",
-        label: pretty(role),
-        qtyText: `${formatHours(hours)} ore`,
-        rateText: `${formatEUR(rate)}/h`,
-        subtotal,
-      });
-    }
+  // righe del compenso: calcolate da /contabilita/payroll/
+  const payLines = (payroll?.lines || []).map((l) => {
+    const qty = Number(l.quantity);
+    const rate = Number(l.rate);
+    const isTurn = l.unit === "turn";
 
-    // --- istruttore: corsi a turno ---
-    // ordina per nome corso
-    const turnCourses = Object.values(instructorTurnsByCourse).sort((a, b) =>
-      (a.name || "").localeCompare(b.name || "")
-    );
-
-    for (const c of turnCourses) {
-      if (!c.count) continue;
-
-      const rate = getInstructorRateForCourseTypeId(c.courseTypeId);
-      const subtotal = c.count * rate;
-      totalEUR += subtotal;
-
-      lines.push({
-        section: "instructor",
-        label: `Istruttore – ${pretty(c.name)}`,
-        qtyText: `${c.count} ${c.count === 1 ? "turno" : "turni"}`,
-        rateText: `${formatEUR(rate)}/turno`,
-        subtotal,
-      });
-    }
-
-    // --- istruttore: corsi a ore (propaganda/agonismo) ---
-    const hourCourses = Object.entries(instructorHoursByCourse).sort((a, b) =>
-      a[0].localeCompare(b[0])
-    );
-
-    for (const [courseName, hours] of hourCourses) {
-      if (hours <= 0) continue;
-
-      // tariffa: serve courseTypeId per essere corretti al 100%
-      // qui usiamo una lookup sul primo shift di quel corso per recuperare l'id
-      const sample = shifts.find(
-        (s) =>
-          s.role_data?.code === "istruttore" &&
-          (s.course_type_data?.name || s.course?.name || "").toLowerCase() === courseName
-      );
-      const courseTypeId = sample?.course_type_data?.id ?? sample?.course_type ?? null;
-
-      const rate = getInstructorRateForCourseTypeId(courseTypeId);
-      const subtotal = hours * rate;
-      totalEUR += subtotal;
-
-      lines.push({
-        section: "instructor",
-        label: `Istruttore – ${pretty(courseName)}`,
-        qtyText: `${formatHours(hours)} ore`,
-        rateText: `${formatEUR(rate)}/h`,
-        subtotal,
-      });
-    }
-
-    return { lines, totalEUR };
-  };
-
-
-  
-
-  // istruttore: prima personalizzata per corso (InstructorCourseRate), altrimenti base del corso (CourseType.base_rate)
-  const getInstructorRateForCourseTypeId = (courseTypeId) => {
-    if (!courseTypeId) return 0;
-
-    const custom = instructorCourseRates.find(
-      (x) => x.instructor === Number(userId) && x.course_type === courseTypeId
-    );
-    if (custom?.rate != null) return Number(custom.rate);
-
-    const base = courseTypes.find((ct) => ct.id === courseTypeId);
-    if (base?.base_rate != null) return Number(base.base_rate);
-
-    return 0;
-  };
-
-  const computeMonthlyPayEUR = (shifts) => {
-    const HOURLY_INSTRUCTOR_COURSES = new Set(["propaganda", "agonismo"]);
-    let total = 0;
-
-    for (const s of shifts) {
-      if (nonInstructorCodes.includes(s.role_data?.code)) {
-        const hours = diffHours(s.start_time, s.end_time);
-        total += hours * getHourlyRateForRole(s.role_data.code);
-        continue;
-      }
-
-      if (s.role_data?.code === "istruttore") {
-        const courseTypeId = s.course_type_data?.id ?? s.course_type ?? null;
-        const courseName = (s.course_type_data?.name || s.course?.name || "").toLowerCase();
-        const rate = getInstructorRateForCourseTypeId(courseTypeId);
-
-        if (HOURLY_INSTRUCTOR_COURSES.has(courseName)) {
-          const hours = diffHours(s.start_time, s.end_time);
-          total += hours * rate;       // €/h
-        } else {
-          total += 1 * rate;           // €/turno
-        }
-      }
-    }
-
-    return total;
-  };
-
-
-  const { lines: payLines, totalEUR: monthlyPay } = computeMonthlyPayBreakdown(shifts);
+    return {
+      section: l.section,
+      label:
+        l.section === "role"
+          ? pretty(l.role_code)
+          : `Istruttore – ${pretty((l.course_name || "Altro").toLowerCase())}`,
+      qtyText: isTurn
+        ? `${qty} ${qty === 1 ? "turno" : "turni"}`
+        : `${formatHours(qty)} ore`,
+      rateText: isTurn ? `${formatEUR(rate)}/turno` : `${formatEUR(rate)}/h`,
+      subtotal: Number(l.subtotal),
+    };
+  });
+  const monthlyPay = Number(payroll?.total || 0);
 
 
   return (
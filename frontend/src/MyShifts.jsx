@@ -2,10 +2,10 @@ import FullCalendar from "@fullcalendar/react";
 import timeGridPlugin from "@fullcalendar/timegrid";
 import interactionPlugin from "@fullcalendar/interaction";
 import itLocale from "@fullcalendar/core/locales/it";
-import api from "./api";
+import api, { getAllPages } from "./api";
 import "./myshifts.css";
 import { useAuth } from "./auth/AuthContext";
-import { useEffect, useState, useCallback } from "react";
+import { useEffect, useState, useCallback, useRef } from "react";
 
 
 
@@ -31,6 +31,18 @@ export default function MyShifts() {
   const [receivedRequests, setReceivedRequests] = useState([]);
 
   const [hasNewResponses, setHasNewResponses] = useState(false);
+
+  // --- Indisponibilità dichiarate
+  const [unavailabilities, setUnavailabilities] = useState([]);
+  const emptyUnavailability = {
+    start_date: "",
+    end_date: "",
+    weekday: "",
+    start_time: "",
+    end_time: "",
+    note: "",
+  };
+  const [unavailabilityForm, setUnavailabilityForm] = useState(emptyUnavailability);
   const LAST_SEEN_SENT_REPLIES = "last_seen_sent_replies";
 
   const { user, logout} = useAuth();
@@ -59,10 +71,9 @@ export default function MyShifts() {
   // =====================================================
   const loadShifts = useCallback(() => {
     if (!userId || !user) return; 
-    api
-      .get(`/shifts/?user=${userId}`)
-      .then((res) => {
-        const mapped = res.data.map((s) => {
+    getAllPages(`/shifts/?user=${userId}`)
+      .then((data) => {
+        const mapped = data.map((s) => {
           let color = "#3b82f6"; // blu
           let clickable = true;
 
@@ -149,10 +160,8 @@ export default function MyShifts() {
   const loadRequests = useCallback(() => {
     if (!userId || !user) return;
 
-    api
-      .get(`/shifts/replacements_sent/?user_id=${userId}&year=${filterYear}&month=${filterMonth}`)
-      .then((res) => {
-        const data = res.data || [];
+    getAllPages(`/shifts/replacements_sent/?user_id=${userId}&year=${filterYear}&month=${filterMonth}`)
+      .then((data) => {
         setSentRequests(data);
 
         const lastSeenRaw = localStorage.getItem(LAST_SEEN_SENT_REPLIES);
@@ -169,9 +178,8 @@ export default function MyShifts() {
       .catch(handle401); 
 
 
-    api
-      .get(`/shifts/replacements_received/?user_id=${userId}&year=${filterYear}&month=${filterMonth}&only_pending=false`)
-      .then((res) => setReceivedRequests(res.data || []))
+    getAllPages(`/shifts/replacements_received/?user_id=${userId}&year=${filterYear}&month=${filterMonth}&only_pending=false`)
+      .then((data) => setReceivedRequests(data))
       .catch(handle401); 
 
   }, [userId, user, filterYear, filterMonth]);
@@ -183,21 +191,74 @@ export default function MyShifts() {
     }
   }, [userId, loadShifts, loadRequests]);
 
+  // =====================================================
+  // AGGIORNAMENTI LIVE (Server-Sent Events, polling di riserva)
+  // =====================================================
+  const loadersRef = useRef({ loadShifts, loadRequests });
+  loadersRef.current = { loadShifts, loadRequests };
+
   useEffect(() => {
     if (!userId) return;
 
-    const interval = setInterval(loadRequests, 5000);
-    return () => clearInterval(interval);
-  }, [userId, loadRequests]);
-
-
+    let source = null;
+    let retry = null;
+    let polling = null;
+
+    // polling ogni 5s finché lo stream non è aperto: server senza SSE
+    // (runserver / WSGI), proxy che lo bloccano, riconnessioni
+    const startPolling = () => {
+      if (polling) return;
+      polling = setInterval(() => {
+        loadersRef.current.loadShifts();
+        loadersRef.current.loadRequests();
+      }, 5000);
+    };
+    const stopPolling = () => {
+      clearInterval(polling);
+      polling = null;
+    };
 
-  useEffect(() => {
-    if (!userId) return;
+    const connect = () => {
+      startPolling();
+      const token = localStorage.getItem("access");
+      source = new EventSource(
+        `${import.meta.env.VITE_API_BASE_URL}/api/events/?token=${encodeURIComponent(token)}`
+      );
+
+      const reloadAll = () => {
+        loadersRef.current.loadShifts();
+        loadersRef.current.loadRequests();
+      };
+
+      // alla (ri)connessione ricarico tutto: eventi persi mentre ero offline
+      source.onopen = () => {
+        stopPolling();
+        reloadAll();
+      };
+      source.addEventListener("resync", reloadAll);
+      source.addEventListener("shift", () => loadersRef.current.loadShifts());
+      source.addEventListener("replacement", () => loadersRef.current.loadRequests());
+
+      source.onerror = () => {
+        startPolling();
+        // EventSource riprova da solo, tranne dopo un 401 (token scaduto):
+        // riapro con il token aggiornato dall'interceptor di api.js
+        if (source.readyState === EventSource.CLOSED) {
+          retry = setTimeout(() => {
+            loadersRef.current.loadRequests();
+            connect();
+          }, 5000);
+        }
+      };
+    };
 
-    const interval = setInterval(loadShifts, 5000);
-    return () => clearInterval(interval);
-  }, [userId, loadShifts]);
+    connect();
+    return () => {
+      clearTimeout(retry);
+      stopPolling();
+      source?.close();
+    };
+  }, [userId]);
 
 
 
@@ -233,12 +294,14 @@ export default function MyShifts() {
   // =====================================================
   // INVIO RICHIESTE SOSTITUZIONE
   // =====================================================
-  const sendReplacementRequests = async () => {
+  // broadcast = richiesta a tutti i collaboratori del ruolo del turno
+  const sendReplacementRequests = async (broadcast = false) => {
     if (!selectedShift) return;
-    if (selectedUsers.length === 0) return alert("Seleziona almeno un collaboratore");
+    if (!broadcast && selectedUsers.length === 0) return alert("Seleziona almeno un collaboratore");
 
     const payload = {
-      target_users: selectedUsers,
+      target_users: broadcast ? [] : selectedUsers,
+      broadcast,
       partial,
       partial_start: partial ? partialStart : null,
       partial_end: partial ? partialEnd : null,
@@ -692,11 +755,18 @@ const renderRequests = () => (
 
               <button
                 className="w-full bg-green-600 text-white py-2 rounded mb-2"
-                onClick={sendReplacementRequests}
+                onClick={() => sendReplacementRequests()}
               >
                 Invia richieste
               </button>
 
+              <button
+                className="w-full bg-blue-600 text-white py-2 rounded mb-2"
+                onClick={() => sendReplacementRequests(true)}
+              >
+                Invia a tutti i colleghi del ruolo
+              </button>
+
               <button
                 className="w-full bg-gray-300 py-2 rounded"
                 onClick={() => {
@@ -713,6 +783,110 @@ const renderRequests = () => (
     );
   };
 
+  // =====================================================
+  // INDISPONIBILITÀ
+  // =====================================================
+  const WEEKDAYS = ["Lunedì", "Martedì", "Mercoledì", "Giovedì", "Venerdì", "Sabato", "Domenica"];
+
+  const loadUnavailabilities = useCallback(() => {
+    api
+      .get("/unavailabilities/")
+      .then((res) => setUnavailabilities(res.data || []))
+      .catch(handle401);
+  }, [handle401]);
+
+  useEffect(() => {
+    if (activeTab === "unavailability") loadUnavailabilities();
+  }, [activeTab, loadUnavailabilities]);
+
+  const saveUnavailability = async () => {
+    const f = unavailabilityForm;
+    try {
+      await api.post("/unavailabilities/", {
+        start_date: f.start_date,
+        end_date: f.end_date || null,
+        weekday: f.weekday === "" ? null : Number(f.weekday),
+        start_time: f.start_time || null,
+        end_time: f.end_time || null,
+        note: f.note,
+      });
+      setUnavailabilityForm(emptyUnavailability);
+      loadUnavailabilities();
+    } catch (err) {
+      handle401(err);
+      alert(Object.values(err.response?.data || {}).flat().join("\n") || "Errore nel salvataggio");
+    }
+  };
+
+  const deleteUnavailability = async (id) => {
+    await api.delete(`/unavailabilities/${id}/`).catch(handle401);
+    loadUnavailabilities();
+  };
+
+  const renderUnavailability = () => {
+    const f = unavailabilityForm;
+    const set = (field) => (e) => setUnavailabilityForm({ ...f, [field]: e.target.value });
+
+    return (
+      <div className="max-w-xl">
+        <div className="border rounded p-3 mb-4 grid grid-cols-2 gap-2 text-sm">
+          <label>
+            Dal
+            <input type="date" className="w-full border p-1 rounded" value={f.start_date} onChange={set("start_date")} />
+          </label>
+          <label>
+            Al (vuoto = senza scadenza)
+            <input type="date" className="w-full border p-1 rounded" value={f.end_date} onChange={set("end_date")} />
+          </label>
+          <label>
+            Ogni settimana il
+            <select className="w-full border p-1 rounded" value={f.weekday} onChange={set("weekday")}>
+              <option value="">Tutti i giorni</option>
+              {WEEKDAYS.map((d, i) => (
+                <option key={i} value={i}>{d}</option>
+              ))}
+            </select>
+          </label>
+          <label>
+            Nota
+            <input className="w-full border p-1 rounded" value={f.note} onChange={set("note")} />
+          </label>
+          <label>
+            Dalle (vuoto = tutto il giorno)
+            <input type="time" className="w-full border p-1 rounded" value={f.start_time} onChange={set("start_time")} />
+          </label>
+          <label>
+            Alle
+            <input type="time" className="w-full border p-1 rounded" value={f.end_time} onChange={set("end_time")} />
+          </label>
+          <button
+            className="col-span-2 bg-blue-600 text-white py-2 rounded"
+            disabled={!f.start_date}
+            onClick={saveUnavailability}
+          >
+            Aggiungi indisponibilità
+          </button>
+        </div>
+
+        <ul className="text-sm space-y-1">
+          {unavailabilities.map((u) => (
+            <li key={u.id} className="flex justify-between border rounded p-2">
+              <span>
+                {u.start_date} → {u.end_date || "…"}
+                {u.weekday !== null && ` · ogni ${WEEKDAYS[u.weekday]}`}
+                {u.start_time && ` · ${u.start_time.slice(0, 5)}–${u.end_time.slice(0, 5)}`}
+                {u.note && ` · ${u.note}`}
+              </span>
+              <button className="text-red-600" onClick={() => deleteUnavailability(u.id)}>
+                Elimina
+              </button>
+            </li>
+          ))}
+        </ul>
+      </div>
+    );
+  };
+
   // =====================================================
   // RENDER COMPLETO
   // =====================================================
@@ -756,9 +930,22 @@ const renderRequests = () => (
             <span className="absolute -top-1 -right-1 w-3 h-3 bg-red-500 rounded-full" />
           )}
         </button>
+
+        <button
+          onClick={() => setActiveTab("unavailability")}
+          className={`px-4 py-2 rounded ${
+            activeTab === "unavailability"
+              ? "bg-blue-600 text-white"
+              : "bg-gray-300 text-gray-800"
+          }`}
+        >
+          Indisponibilità
+        </button>
       </div>
 
-      {activeTab === "shifts" ? renderCalendar() : renderRequests()}
+      {activeTab === "shifts" && renderCalendar()}
+      {activeTab === "requests" && renderRequests()}
+      {activeTab === "unavailability" && renderUnavailability()}
       {renderPopup()}
     </div>
   );
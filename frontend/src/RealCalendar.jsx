@@ -3,7 +3,7 @@ import FullCalendar from "@fullcalendar/react";
 import timeGridPlugin from "@fullcalendar/timegrid";
 import interactionPlugin from "@fullcalendar/interaction";
 import itLocale from "@fullcalendar/core/locales/it";
-import api from "./api";
+import api, { getAllPages } from "./api";
 
 // Utility: dd/mm/yyyy
 function formatIT(d) {
@@ -75,10 +75,9 @@ export default function RealCalendar() {
   const loadAllShifts = () => {
     setLoading(true);
 
-    api
-      .get("/shifts/")
-      .then((res) => {
-        const all = Array.isArray(res.data) ? res.data : [];
+    getAllPages("/shifts/")
+      .then((data) => {
+        const all = Array.isArray(data) ? data : [];
 
         const mapped = all.map((s) => {
           const userId =
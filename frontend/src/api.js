@@ -88,6 +88,22 @@ export const getRoles = async () => {
   return data;
 };
 
+// 📄 LISTE PAGINATE (cursore)
+// segue "next" finché ci sono pagine e restituisce tutti i risultati
+export const getAllPages = async (url) => {
+  const results = [];
+  let next = url;
+
+  while (next) {
+    const { data } = await api.get(next);
+    if (Array.isArray(data)) return data; // endpoint non paginato
+    results.push(...(data.results || []));
+    next = data.next;
+  }
+
+  return results;
+};
+
 // ============================================
 // 🔧 EXPORT DEFAULT
 // ============================================
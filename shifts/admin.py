@@ -4,7 +4,12 @@ from .models import (
     Shift,
     TemplateShift,
     PublishedWeek,
-    ReplacementRequest
+    ReplacementRequest,
+    Job,
+    MonthlyHoursLedger,
+    CoverageRequirement,
+    ShiftPreference,
+    Unavailability,
 )
 from .utils import generate_shifts_from_template
 
@@ -82,3 +87,97 @@ class ReplacementRequestAdmin(admin.ModelAdmin):
     )
     list_filter = ('status', 'partial', 'shift__role')
     search_fields = ('requester__username', 'target_user__username')
+
+
+# ==============================
+# JOB IN BACKGROUND
+# ==============================
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = (
+        'id',
+        'kind',
+        'status',
+        'weeks_done',
+        'weeks_total',
+        'created',
+        'updated',
+        'deleted',
+        'created_at',
+        'finished_at'
+    )
+    list_filter = ('kind', 'status')
+
+
+# ==============================
+# REGISTRO ORE (sola lettura)
+# ==============================
+@admin.register(MonthlyHoursLedger)
+class MonthlyHoursLedgerAdmin(admin.ModelAdmin):
+    list_display = (
+        'user',
+        'month',
+        'role',
+        'course_type',
+        'total_minutes',
+        'shift_count'
+    )
+    list_filter = ('month', 'role', 'course_type')
+    search_fields = ('user__username',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+# ==============================
+# COPERTURE RICHIESTE
+# ==============================
+@admin.register(CoverageRequirement)
+class CoverageRequirementAdmin(admin.ModelAdmin):
+    list_display = (
+        'role',
+        'weekday',
+        'start_time',
+        'end_time',
+        'min_staff',
+        'max_staff'
+    )
+    list_filter = ('role', 'weekday')
+
+
+# ==============================
+# PREFERENZE TURNI
+# ==============================
+@admin.register(ShiftPreference)
+class ShiftPreferenceAdmin(admin.ModelAdmin):
+    list_display = (
+        'user',
+        'kind',
+        'role',
+        'weekday',
+        'start_time',
+        'end_time'
+    )
+    list_filter = ('kind', 'role', 'weekday')
+    search_fields = ('user__username',)
+
+
+# ==============================
+# INDISPONIBILITÀ
+# ==============================
+@admin.register(Unavailability)
+class UnavailabilityAdmin(admin.ModelAdmin):
+    list_display = (
+        'user',
+        'start_date',
+        'end_date',
+        'weekday',
+        'start_time',
+        'end_time',
+        'note'
+    )
+    list_filter = ('weekday', 'start_date')
+    search_fields = ('user__username',)
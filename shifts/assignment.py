@@ -0,0 +1,327 @@
+"""
+Assegnazione automatica degli slot liberi della settimana tipo.
+
+Gli slot dei TemplateShift senza collaboratore (plan_publish li mette in
+plan.open_slots) vengono coperti con i collaboratori del ruolo rispettando:
+- nessuna sovrapposizione con i turni della settimana (tutti i ruoli,
+  già considerando il piano di pubblicazione), con le indisponibilità
+  dichiarate (UnavailabilityIndex) né con gli slot assegnati qui
+- il limite di ore settimanali (User.max_weekly_hours)
+- le preferenze dichiarate (ShiftPreference): "prefer" abbassa il costo,
+  "avoid" lo alza molto senza escludere il collaboratore
+
+Greedy: gli slot più lunghi per primi, ognuno al collaboratore di costo
+minimo (preferenze + ore già in settimana, per distribuire il carico).
+Riparazione: per ogni slot rimasto scoperto si prova a liberare un
+collaboratore spostando su un altro l'unico slot assegnato che lo blocca.
+Entrambe le fasi si fermano allo scadere del time budget.
+
+Il risultato è un piano da rivedere: publish lo riceve in "assignments".
+"""
+import time
+from collections import defaultdict, namedtuple
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+
+from .availability import UnavailabilityIndex
+from .expansion import load_open_templates, plan_publish
+from .ledger import minutes_between
+from .models import Shift, ShiftPreference
+from .periods import week_period
+
+User = get_user_model()
+
+DEFAULT_TIME_BUDGET = 0.5
+MAX_TIME_BUDGET = 10
+
+PREFER_BONUS = 10
+AVOID_PENALTY = 1000
+
+Assignment = namedtuple("Assignment", ["slot", "user_id"])
+AssignmentResult = namedtuple("AssignmentResult", ["assignments", "unassigned", "complete", "elapsed"])
+
+
+def parse_assignments(items):
+    """
+    Converte la lista JSON [{"template", "date", "user"}] nel dizionario
+    {(template_id, data): user_id} usato da plan_publish.
+    Solleva ValueError se il formato non è valido.
+    """
+    if not isinstance(items, list):
+        raise ValueError("assignments deve essere una lista")
+    try:
+        pairs = [
+            ((int(item["template"]), date.fromisoformat(item["date"])), int(item["user"]))
+            for item in items
+        ]
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("assignments non valido: servono template, date e user")
+
+    assignments = dict(pairs)
+    if len(assignments) != len(pairs):
+        raise ValueError("assignments non valido: lo stesso slot (template, date) compare più volte")
+    return assignments
+
+
+def invalid_assignments(role, week_starts, assignments):
+    """
+    Voci di `assignments` non applicabili, con il motivo: collaboratore
+    inesistente, inattivo o senza il ruolo; template che non è uno slot
+    libero del ruolo in quel giorno della settimana; data fuori dalle
+    settimane pubblicate. Due query.
+    """
+    if not assignments:
+        return []
+
+    staff = set(
+        User.objects
+        .filter(roles=role, is_active=True, id__in={u for u in assignments.values()})
+        .values_list("id", flat=True)
+    )
+    open_weekdays = {
+        tpl["id"]: weekday
+        for weekday, templates in load_open_templates(role).items()
+        for tpl in templates
+    }
+    dates = {ws + timedelta(days=i) for ws in week_starts for i in range(7)}
+
+    invalid = []
+    for (template_id, day), user_id in sorted(assignments.items()):
+        if template_id not in open_weekdays:
+            reason = "template non è uno slot libero del ruolo"
+        elif open_weekdays[template_id] != day.weekday():
+            reason = "data non corrisponde al giorno del template"
+        elif day not in dates:
+            reason = "data fuori dalle settimane pubblicate"
+        elif user_id not in staff:
+            reason = "collaboratore inesistente, inattivo o senza il ruolo"
+        else:
+            continue
+        invalid.append({"template": template_id, "date": str(day), "user": user_id, "error": reason})
+    return invalid
+
+
+def _overlaps(intervals, start, end):
+    return any(s < end and e > start for s, e in intervals)
+
+
+class _Solver:
+    """Stato dell'assegnazione: carichi, intervalli occupati e slot assegnati."""
+
+    def __init__(self, slots, users, busy, load, caps, scores, deadline):
+        self.slots = slots
+        self.users = users
+        self.busy = busy            # (user_id, data) -> [(inizio, fine)] fissi
+        self.load = load            # user_id -> minuti già in settimana
+        self.caps = caps            # user_id -> minuti massimi (None = nessun limite)
+        self.scores = scores        # indice slot -> {user_id: costo preferenze}
+        self.deadline = deadline
+        self.minutes = [minutes_between(s.start_time, s.end_time) for s in slots]
+        self.assigned = {}          # indice slot -> user_id
+        self.by_user_day = defaultdict(list)  # (user_id, data) -> [indice slot]
+
+    def expired(self):
+        return time.perf_counter() > self.deadline
+
+    def cost(self, i, user_id):
+        return self.scores[i].get(user_id, 0) + self.load[user_id] / 60
+
+    def blockers(self, i, user_id):
+        """Slot assegnati qui che si sovrappongono a i, oppure None se un turno fisso lo impedisce."""
+        slot = self.slots[i]
+        key = (user_id, slot.date)
+        if _overlaps(self.busy.get(key, ()), slot.start_time, slot.end_time):
+            return None
+        return [
+            j for j in self.by_user_day.get(key, ())
+            if self.slots[j].start_time < slot.end_time and self.slots[j].end_time > slot.start_time
+        ]
+
+    def fits(self, i, user_id, freed=0):
+        cap = self.caps.get(user_id)
+        return cap is None or self.load[user_id] - freed + self.minutes[i] <= cap
+
+    def feasible(self, i, user_id):
+        return self.fits(i, user_id) and self.blockers(i, user_id) == []
+
+    def assign(self, i, user_id):
+        self.assigned[i] = user_id
+        self.load[user_id] += self.minutes[i]
+        self.by_user_day[(user_id, self.slots[i].date)].append(i)
+
+    def unassign(self, i):
+        user_id = self.assigned.pop(i)
+        self.load[user_id] -= self.minutes[i]
+        self.by_user_day[(user_id, self.slots[i].date)].remove(i)
+
+    def best_user(self, i, exclude=None):
+        """Collaboratore ammissibile di costo minimo (i costi di carico crescono con le ore)."""
+        best, best_cost = None, None
+        floor = min(0, min(self.scores[i].values(), default=0))
+        for user_id in sorted(self.users, key=self.load.__getitem__):
+            # candidati in ordine di carico: oltre questa soglia nessuno può fare meglio
+            if best_cost is not None and self.load[user_id] / 60 + floor >= best_cost:
+                break
+            if user_id == exclude or not self.feasible(i, user_id):
+                continue
+            cost = self.cost(i, user_id)
+            if best_cost is None or cost < best_cost:
+                best, best_cost = user_id, cost
+        return best
+
+    def greedy(self):
+        order = sorted(
+            range(len(self.slots)),
+            key=lambda i: (-self.minutes[i], self.slots[i].date, self.slots[i].start_time),
+        )
+        for i in order:
+            if self.expired():
+                return False
+            user_id = self.best_user(i)
+            if user_id is not None:
+                self.assign(i, user_id)
+        return True
+
+    def repair(self):
+        """Un passo di ejection chain: sposta l'unico slot che blocca un collaboratore."""
+        for i in range(len(self.slots)):
+            if i in self.assigned:
+                continue
+            for user_id in sorted(self.users, key=lambda u: self.cost(i, u)):
+                if self.expired():
+                    return False
+                blocking = self.blockers(i, user_id)
+                if not blocking or len(blocking) > 1:
+                    continue
+                j = blocking[0]
+                if not self.fits(i, user_id, freed=self.minutes[j]):
+                    continue
+
+                self.unassign(j)
+                other = self.best_user(j, exclude=user_id)
+                if other is None:
+                    self.assign(j, user_id)
+                    continue
+                self.assign(j, other)
+                self.assign(i, user_id)
+                break
+        return True
+
+
+def solve(slots, users, busy, load, caps, scores, time_budget=DEFAULT_TIME_BUDGET):
+    """
+    Assegna gli slot (lista di OpenSlot) ai collaboratori `users`.
+    Restituisce un AssignmentResult; complete=False se il time budget è scaduto.
+    """
+    started = time.perf_counter()
+    solver = _Solver(slots, users, busy, dict(load), caps, scores, started + time_budget)
+    complete = solver.greedy() and solver.repair()
+
+    assignments = [Assignment(slots[i], user_id) for i, user_id in sorted(solver.assigned.items())]
+    unassigned = [slot for i, slot in enumerate(slots) if i not in solver.assigned]
+    return AssignmentResult(assignments, unassigned, complete, time.perf_counter() - started)
+
+
+def _week_busy(plan, week, user_ids):
+    """Intervalli occupati e minuti per collaboratore nello stato finale del piano."""
+    busy = defaultdict(list)
+    load = dict.fromkeys(user_ids, 0)
+
+    replaced = {s.id for s in plan.to_update} | {s.id for s in plan.to_delete}
+    existing = (
+        Shift.objects
+        .filter(user_id__in=user_ids, **week.filter())
+        .exclude(id__in=replaced)
+        .values_list("user_id", "date", "start_time", "end_time")
+    )
+    final = list(existing) + [
+        (s.user_id, s.date, s.start_time, s.end_time) for s in plan.to_update + plan.to_create
+    ]
+    for user_id, day, start, end in final:
+        if user_id in load:
+            busy[(user_id, day)].append((start, end))
+            load[user_id] += minutes_between(start, end)
+    return busy, load
+
+
+def _preference_scores(slots, user_ids, role):
+    """Costo delle preferenze per ogni slot, solo per chi ne ha dichiarate."""
+    preferences = defaultdict(list)
+    for pref in ShiftPreference.objects.filter(
+        Q(role__isnull=True) | Q(role=role), user_id__in=user_ids
+    ):
+        preferences[pref.user_id].append(pref)
+
+    scores = []
+    for slot in slots:
+        weekday = slot.date.weekday()
+        slot_scores = {}
+        for user_id, prefs in preferences.items():
+            score = 0
+            for pref in prefs:
+                if pref.weekday is not None and pref.weekday != weekday:
+                    continue
+                if pref.start_time is not None and not (
+                    pref.start_time < slot.end_time and pref.end_time > slot.start_time
+                ):
+                    continue
+                score += -PREFER_BONUS if pref.kind == "prefer" else AVOID_PENALTY
+            if score:
+                slot_scores[user_id] = score
+        scores.append(slot_scores)
+    return scores
+
+
+def plan_assignments(role, week_start, time_budget=DEFAULT_TIME_BUDGET):
+    """
+    Proposta di assegnazione degli slot liberi di una settimana
+    (week_start già normalizzata a Lunedì).
+    """
+    plan = plan_publish(role, [week_start])
+    slots = plan.open_slots
+
+    staff = list(
+        User.objects
+        .filter(roles=role, is_active=True)
+        .values_list("id", "max_weekly_hours")
+    )
+    user_ids = [user_id for user_id, _ in staff]
+    caps = {user_id: hours * 60 for user_id, hours in staff if hours is not None}
+
+    week = week_period(week_start)
+    busy, load = _week_busy(plan, week, user_ids)
+    for key, intervals in UnavailabilityIndex(week.start, week.last, user_ids).intervals.items():
+        busy[key].extend(intervals)
+
+    scores = _preference_scores(slots, user_ids, role)
+    return solve(slots, user_ids, busy, load, caps, scores, time_budget)
+
+
+def assignments_as_dicts(result):
+    """Rappresentazione JSON della proposta (stesso formato accettato da publish)."""
+    usernames = dict(
+        User.objects
+        .filter(id__in={a.user_id for a in result.assignments})
+        .values_list("id", "username")
+    )
+
+    def slot_dict(slot):
+        return {
+            "template": slot.template_id,
+            "date": str(slot.date),
+            "start_time": slot.start_time.strftime("%H:%M"),
+            "end_time": slot.end_time.strftime("%H:%M"),
+            "course_type_id": slot.course_type_id,
+        }
+
+    return {
+        "assignments": [
+            {**slot_dict(a.slot), "user": a.user_id, "username": usernames.get(a.user_id)}
+            for a in result.assignments
+        ],
+        "unassigned": [slot_dict(slot) for slot in result.unassigned],
+        "complete": result.complete,
+        "elapsed_ms": round(result.elapsed * 1000, 1),
+    }
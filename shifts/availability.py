@@ -0,0 +1,86 @@
+"""
+Disponibilità dei collaboratori: turni già assegnati e indisponibilità dichiarate.
+
+Due modi di interrogarle:
+- in SQL, dentro la query dei candidati: free_users() risponde a "chi è
+  libero il giorno D dalle HH:MM alle HH:MM nel ruolo R" con una sola
+  query, con due NOT EXISTS correlati sull'utente (indici shift_user_date_idx
+  e unavail_user_dates_idx);
+- in memoria, per i controlli in blocco (publish, assegnazione automatica):
+  UnavailabilityIndex carica con una query le indisponibilità che toccano
+  l'intervallo e le espande in intervalli per (utente, giorno).
+"""
+from collections import defaultdict
+from datetime import time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.db.models import Exists, OuterRef, Q
+
+from .models import Shift, Unavailability
+
+User = get_user_model()
+
+
+def unavailability_filter(day, start_time, end_time):
+    """Q delle indisponibilità che coprono il giorno tra start_time ed end_time."""
+    return (
+        Q(start_date__lte=day) &
+        (Q(end_date__isnull=True) | Q(end_date__gte=day)) &
+        (Q(weekday__isnull=True) | Q(weekday=day.weekday())) &
+        (Q(start_time__isnull=True) | Q(start_time__lt=end_time, end_time__gt=start_time))
+    )
+
+
+def overlapping_shifts(day, start_time, end_time, user=OuterRef("pk")):
+    return Shift.objects.filter(user=user, date=day, start_time__lt=end_time, end_time__gt=start_time)
+
+
+def blocking_unavailabilities(day, start_time, end_time, user=OuterRef("pk")):
+    return Unavailability.objects.filter(unavailability_filter(day, start_time, end_time), user=user)
+
+
+def free_users(role_id, day, start_time, end_time):
+    """
+    Collaboratori attivi del ruolo senza turni sovrapposti né indisponibilità
+    nell'intervallo. Restituisce un queryset: resta una sola query anche
+    aggiungendo filtri o annotazioni.
+    """
+    return (
+        User.objects
+        .filter(roles=role_id, is_active=True)
+        .exclude(Exists(overlapping_shifts(day, start_time, end_time)))
+        .exclude(Exists(blocking_unavailabilities(day, start_time, end_time)))
+    )
+
+
+class UnavailabilityIndex:
+    """Intervalli di indisponibilità per (utente, giorno) tra start e end (inclusi)."""
+
+    def __init__(self, start, end, user_ids=None):
+        self.intervals = defaultdict(list)
+
+        qs = Unavailability.objects.filter(
+            Q(end_date__isnull=True) | Q(end_date__gte=start),
+            start_date__lte=end,
+        )
+        if user_ids is not None:
+            qs = qs.filter(user_id__in=user_ids)
+
+        for user_id, first, last, weekday, start_time, end_time in qs.values_list(
+            "user_id", "start_date", "end_date", "weekday", "start_time", "end_time"
+        ):
+            window = (start_time or time.min, end_time or time.max)
+            day, last = max(first, start), min(last or end, end)
+            step = 1
+            if weekday is not None:
+                day += timedelta(days=(weekday - day.weekday()) % 7)
+                step = 7
+            while day <= last:
+                self.intervals[(user_id, day)].append(window)
+                day += timedelta(days=step)
+
+    def get(self, user_id, day):
+        return self.intervals.get((user_id, day), [])
+
+    def blocks(self, user_id, day, start_time, end_time):
+        return any(s < end_time and e > start_time for s, e in self.get(user_id, day))
@@ -0,0 +1,167 @@
+"""
+Cache versionata delle risposte dei calendari (settimana / mese / lista turni).
+
+Ogni periodo (mese) ha un numero di versione per ruolo e uno complessivo
+("all"), più una versione globale per le richieste senza periodo.
+I signal su Shift / ReplacementRequest e le operazioni bulk (publish,
+generate_month) incrementano le versioni interessate: le chiavi vecchie
+non vengono mai lette di nuovo e scadono da sole.
+
+Le versioni stanno nel database (CacheVersion), non nella cache Django:
+la cache è per processo (LocMemCache), mentre le scritture arrivano anche
+dal worker run_jobs e dagli altri processi del server. L'incremento fa
+parte della transazione che modifica i turni, quindi è visibile a tutti
+insieme ai dati.
+
+L'ETag è derivato da URL + versioni, quindi un polling senza modifiche
+riceve 304 con una sola query (le versioni), senza toccare i turni.
+"""
+import hashlib
+import time
+from datetime import date, timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from rest_framework.response import Response
+
+CACHE_PREFIX = "shifts"
+RESPONSE_TIMEOUT = 60 * 60 * 24
+GLOBAL_SCOPE = "global"
+
+
+def month_scope(year, month, role_id=None):
+    return f"{year:04d}-{month:02d}:{role_id or 'all'}"
+
+
+def months_between(start, end):
+    """Coppie (anno, mese) toccate dall'intervallo [start, end]."""
+    months = []
+    current = date(start.year, start.month, 1)
+    while current <= end:
+        months.append((current.year, current.month))
+        current = (current + timedelta(days=32)).replace(day=1)
+    return months
+
+
+def period_scopes(period, role_id=None):
+    """Scope dei mesi toccati da un Period (intervallo semiaperto)."""
+    return [month_scope(y, m, role_id) for y, m in months_between(period.start, period.last)]
+
+
+# ----------------------------------------------------------
+# VERSIONI
+# ----------------------------------------------------------
+def _fresh_version():
+    # una versione nuova riparte da un valore sempre maggiore (anche dopo
+    # aver svuotato la tabella), così non collide con risposte già salvate
+    return int(time.time() * 1000)
+
+
+def get_versions(scopes):
+    """Versioni correnti degli scope, con una query (0 se mai incrementati)."""
+    from .models import CacheVersion
+
+    versions = dict(CacheVersion.objects.filter(scope__in=scopes).values_list("scope", "version"))
+    return [versions.get(s, 0) for s in scopes]
+
+
+def bump(scopes):
+    """
+    Invalida le risposte dei periodi indicati (e le liste senza periodo).
+    Va chiamata nella transazione che modifica i dati: chi legge la nuova
+    versione legge anche i dati committati, chi legge la vecchia al più
+    salva in cache dati già superati con una chiave che non sarà più letta.
+    """
+    from .models import CacheVersion
+
+    scopes = set(scopes) | {GLOBAL_SCOPE}
+    with transaction.atomic(savepoint=False):
+        CacheVersion.objects.filter(scope__in=scopes).update(version=F("version") + 1)
+        CacheVersion.objects.bulk_create(
+            [CacheVersion(scope=scope, version=_fresh_version()) for scope in sorted(scopes)],
+            ignore_conflicts=True,
+        )
+
+
+def bump_shift(shift_date, role_id):
+    """Invalida il mese del turno, sia per il ruolo sia per "all"."""
+    bump([
+        month_scope(shift_date.year, shift_date.month, role_id),
+        month_scope(shift_date.year, shift_date.month),
+    ])
+
+
+def bump_dates(pairs):
+    """Come bump_shift per tante coppie (data, role_id), usato dalle operazioni bulk."""
+    scopes = set()
+    for shift_date, role_id in pairs:
+        scopes.add(month_scope(shift_date.year, shift_date.month, role_id))
+        scopes.add(month_scope(shift_date.year, shift_date.month))
+    if scopes:
+        bump(scopes)
+
+
+def _role_key(code):
+    return f"{CACHE_PREFIX}:role:{code}"
+
+
+def role_id_for_code(code):
+    """
+    Risolve (con cache) il codice ruolo usato nei filtri delle liste.
+    I codici inesistenti non vanno in cache: un ruolo creato dopo
+    sarebbe ignorato fino alla scadenza della chiave.
+    """
+    from users.models import UserRole
+
+    key = _role_key(code)
+    role_id = cache.get(key)
+    if role_id is None:
+        role_id = UserRole.objects.filter(code=code).values_list("id", flat=True).first()
+        if role_id is not None:
+            cache.set(key, role_id, RESPONSE_TIMEOUT)
+    return role_id
+
+
+def forget_roles(codes):
+    """Toglie dalla cache i codici ruolo indicati (ruolo salvato, rinominato o eliminato)."""
+    keys = [_role_key(code) for code in codes if code]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+# ----------------------------------------------------------
+# RISPOSTE CON ETAG
+# ----------------------------------------------------------
+def _etag_matches(request, etag):
+    header = request.headers.get("If-None-Match")
+    if not header:
+        return False
+    candidates = [t.strip().removeprefix("W/") for t in header.split(",")]
+    return etag in candidates or "*" in candidates
+
+
+def cached_response(request, scopes, build):
+    """
+    Restituisce la risposta di `build()` passando dalla cache versionata.
+
+    - If-None-Match uguale all'ETag corrente → 304 senza chiamare build()
+    - risposta in cache per le versioni correnti → nessuna query
+    - altrimenti build() e salvataggio in cache
+    """
+    versions = get_versions(scopes)
+    path = request.get_full_path()
+    digest = hashlib.sha1(f"{path}|{versions}".encode()).hexdigest()
+    etag = f'"{digest}"'
+
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if _etag_matches(request, etag):
+        return Response(status=304, headers=headers)
+
+    key = f"{CACHE_PREFIX}:resp:{digest}"
+    data = cache.get(key)
+    if data is None:
+        data = build()
+        cache.set(key, data, RESPONSE_TIMEOUT)
+
+    return Response(data, status=200, headers=headers)
@@ -0,0 +1,211 @@
+"""
+Feed incrementale di turni e richieste di sostituzione (/api/shifts/changes/).
+
+Ogni scrittura su Shift e ReplacementRequest prende un numero dal
+contatore globale (ChangeCounter) e lo salva in change_seq: save() lo fa
+da sé (ChangeTracked), le operazioni bulk e gli update() usano stamp() e
+ChangeCounter.allocate(). Le eliminazioni lasciano una Tombstone con lo
+stesso tipo di numero, così come un turno che passa a un altro
+collaboratore (per chi filtra per utente è come se fosse sparito).
+
+Le eliminazioni bulk (apply_plan) usano delete_shifts: i signal non
+registrano tombstone né invalidano la cache riga per riga (suspended);
+le tombstone di turni e richieste a cascata vengono scritte con un solo
+numero e un solo INSERT, le versioni della cache incrementate una volta.
+
+Il client tiene l'ultimo cursore ricevuto e chiede solo le righe con
+change_seq maggiore: applica prima "deleted", poi le righe aggiornate.
+"""
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+
+from django.db.models import Q
+
+from .cache import bump_dates
+from .models import ChangeCounter, ReplacementRequest, Shift, Tombstone
+from .serializers import ShiftSerializer
+
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 5000
+
+_state = threading.local()
+
+ChangeSet = namedtuple("ChangeSet", ["cursor", "more", "shifts", "replacements", "deleted"])
+
+
+class CursorExpired(Exception):
+    """Il cursore è precedente alle tombstone eliminate: serve un caricamento completo."""
+
+    def __init__(self, cursor):
+        super().__init__("Cursore scaduto: ricaricare i dati")
+        self.cursor = cursor
+
+
+# ----------------------------------------------------------
+# SCRITTURA
+# ----------------------------------------------------------
+def stamp(objs):
+    """Assegna change_seq consecutivi a oggetti da salvare con bulk_create / bulk_update."""
+    objs = list(objs)
+    if objs:
+        last = ChangeCounter.allocate(len(objs))
+        for seq, obj in enumerate(objs, start=last - len(objs) + 1):
+            obj.change_seq = seq
+    return objs
+
+
+def bury(kind, rows, change_seq=None):
+    """
+    Registra le tombstone (object_id, owner_id) di un tipo.
+    Senza change_seq ne riserva uno nuovo: va chiamata nella transazione
+    dell'eliminazione (i post_delete lo sono già).
+    """
+    rows = [(object_id, owner_id) for object_id, owner_id in rows if object_id is not None]
+    if not rows:
+        return
+    if change_seq is None:
+        change_seq = ChangeCounter.allocate()
+    Tombstone.objects.bulk_create([
+        Tombstone(kind=kind, object_id=object_id, owner_id=owner_id, change_seq=change_seq)
+        for object_id, owner_id in rows
+    ])
+
+
+@contextmanager
+def suspended():
+    """
+    Disattiva tombstone e invalidazione cache dei signal di eliminazione
+    (il chiamante usa bury / bump_dates).
+    """
+    previous = getattr(_state, "suspended", False)
+    _state.suspended = True
+    try:
+        yield
+    finally:
+        _state.suspended = previous
+
+
+def is_suspended():
+    return getattr(_state, "suspended", False)
+
+
+def delete_shifts(shifts):
+    """
+    Elimina i turni indicati e, a cascata, le loro richieste di sostituzione,
+    con le tombstone di tutte le righe sotto un unico change_seq e
+    un solo incremento delle versioni della cache.
+    Va chiamata in una transazione.
+    """
+    ids = [s.id for s in shifts]
+    if not ids:
+        return
+    requests = list(
+        ReplacementRequest.objects.filter(shift_id__in=ids)
+        .values_list("id", "requester_id", "target_user_id")
+    )
+    with suspended():
+        Shift.objects.filter(id__in=ids).delete()
+
+    change_seq = ChangeCounter.allocate()
+    Tombstone.objects.bulk_create(
+        [Tombstone(kind="shift", object_id=s.id, owner_id=s.user_id, change_seq=change_seq) for s in shifts] +
+        [
+            Tombstone(kind="replacement", object_id=request_id, owner_id=owner_id, change_seq=change_seq)
+            for request_id, requester_id, target_user_id in requests
+            for owner_id in (requester_id, target_user_id)
+        ]
+    )
+    bump_dates((s.date, s.role_id) for s in shifts)
+
+
+def prune_tombstones(before):
+    """
+    Elimina le tombstone create prima di `before`. I cursori precedenti
+    all'ultima eliminata diventano scaduti (CursorExpired).
+    """
+    old = Tombstone.objects.filter(created_at__lt=before)
+    last = old.order_by("-change_seq").values_list("change_seq", flat=True).first()
+    if last is None:
+        return 0
+    deleted, _ = old.delete()
+    ChangeCounter.objects.filter(pk=1, pruned__lt=last).update(pruned=last)
+    return deleted
+
+
+# ----------------------------------------------------------
+# LETTURA
+# ----------------------------------------------------------
+def _sources(user_id):
+    shifts = Shift.objects.all()
+    replacements = ReplacementRequest.objects.all()
+    tombstones = Tombstone.objects.all()
+    if user_id is not None:
+        shifts = shifts.filter(user_id=user_id)
+        replacements = replacements.filter(Q(requester_id=user_id) | Q(target_user_id=user_id))
+        tombstones = tombstones.filter(owner_id=user_id)
+    return shifts, replacements, tombstones
+
+
+def _page_end(querysets, since, upto, limit):
+    """
+    Ultimo change_seq della pagina: al massimo `limit` righe per tipo,
+    senza spezzare le righe con lo stesso numero (un update() ne scrive
+    molte con lo stesso change_seq).
+    """
+    end = upto
+    for qs in querysets:
+        boundary = (
+            qs.filter(change_seq__gt=since, change_seq__lte=upto)
+            .order_by("change_seq")
+            .values_list("change_seq", flat=True)[limit:limit + 1]
+            .first()
+        )
+        if boundary is not None:
+            # un solo gruppo oltre il limite: lo restituisco intero
+            end = min(end, boundary - 1 if boundary - 1 > since else boundary)
+    return end
+
+
+def changes_since(since, user_id=None, limit=DEFAULT_LIMIT):
+    """
+    Modifiche con change_seq in (since, cursore]. `since=None` restituisce
+    solo il cursore corrente, da usare dopo un caricamento completo.
+    Solleva CursorExpired se since precede le tombstone eliminate.
+    """
+    upto, pruned = ChangeCounter.current()
+    if since is not None and since < pruned:
+        raise CursorExpired(upto)
+    if since is None or since >= upto:
+        # nessuna modifica: il caso normale di un client in polling, una sola query
+        return ChangeSet(upto, False, [], [], {"shifts": [], "replacements": []})
+
+    shifts, replacements, tombstones = _sources(user_id)
+    end = _page_end((shifts, replacements, tombstones), since, upto, limit)
+    window = {"change_seq__gt": since, "change_seq__lte": end}
+
+    shifts = list(
+        ShiftSerializer.setup_eager_loading(shifts.filter(**window))
+        .order_by("change_seq", "id")
+    )
+    replacements = list(
+        ShiftSerializer.setup_eager_loading(
+            replacements.filter(**window).select_related("shift", "requester", "target_user", "closed_by"),
+            prefix="shift__",
+        ).order_by("change_seq", "id")
+    )
+
+    # una riga ancora presente (o tornata visibile) vale più della sua tombstone
+    alive = {"shift": {s.id for s in shifts}, "replacement": {r.id for r in replacements}}
+    deleted = {"shift": set(), "replacement": set()}
+    for kind, object_id in tombstones.filter(**window).values_list("kind", "object_id"):
+        if object_id not in alive[kind]:
+            deleted[kind].add(object_id)
+
+    return ChangeSet(
+        cursor=end,
+        more=end < upto,
+        shifts=shifts,
+        replacements=replacements,
+        deleted={"shifts": sorted(deleted["shift"]), "replacements": sorted(deleted["replacement"])},
+    )
@@ -0,0 +1,160 @@
+"""
+Rilevamento dei turni sovrapposti per lo stesso collaboratore.
+
+I turni vengono letti (o ordinati) per (utente, data, inizio) e scanditi
+una volta sola: per ogni (utente, giorno) un heap tiene i turni ancora
+"aperti" ordinati per fine, così ogni turno viene confrontato solo con
+quelli che lo sovrappongono davvero. Costo O(n log n + conflitti).
+
+Usato dall'endpoint /api/shifts/conflicts/, dal comando find_conflicts,
+dalla validazione di publish e da create / PATCH dei turni. publish
+controlla anche le indisponibilità dichiarate (plan_unavailable).
+"""
+import heapq
+from collections import namedtuple
+from itertools import count
+
+from .availability import UnavailabilityIndex
+from .models import Shift
+
+# id è None per i turni pianificati non ancora salvati
+ShiftSlot = namedtuple("ShiftSlot", ["id", "user_id", "date", "start_time", "end_time"])
+Conflict = namedtuple("Conflict", ["user_id", "date", "first", "second"])
+
+SLOT_FIELDS = ("id", "user_id", "date", "start_time", "end_time")
+
+
+def find_overlaps(slots):
+    """
+    Tutte le coppie sovrapposte (start < altro.end e end > altro.start).
+    `slots` deve essere ordinato per (user_id, date, start_time).
+    """
+    conflicts = []
+    current = None
+    heap = []
+    tie = count()
+
+    for slot in slots:
+        key = (slot.user_id, slot.date)
+        if key != current:
+            current, heap = key, []
+
+        # chiude i turni finiti prima che inizi questo
+        while heap and heap[0][0] <= slot.start_time:
+            heapq.heappop(heap)
+
+        conflicts.extend(
+            Conflict(slot.user_id, slot.date, other, slot) for _, _, other in heap
+        )
+        heapq.heappush(heap, (slot.end_time, next(tie), slot))
+
+    return conflicts
+
+
+def load_slots(period, user_ids=None):
+    qs = Shift.objects.filter(**period.filter())
+    if user_ids is not None:
+        qs = qs.filter(user_id__in=user_ids)
+    return [
+        ShiftSlot(*row)
+        for row in qs.order_by("user_id", "date", "start_time", "id").values_list(*SLOT_FIELDS)
+    ]
+
+
+def detect_conflicts(period, user_ids=None):
+    """Sovrapposizioni tra i turni salvati nel periodo (una query)."""
+    return find_overlaps(load_slots(period, user_ids))
+
+
+def _planned_slots(plan):
+    return [
+        ShiftSlot(None, p.user_id, p.date, p.start_time, p.end_time) for p in plan.to_create
+    ] + [
+        ShiftSlot(s.id, s.user_id, s.date, s.start_time, s.end_time) for s in plan.to_update
+    ]
+
+
+def plan_unavailable(plan):
+    """Turni creati o modificati dal piano che cadono in un'indisponibilità (una query)."""
+    planned = _planned_slots(plan)
+    if not planned:
+        return []
+
+    index = UnavailabilityIndex(
+        min(s.date for s in planned),
+        max(s.date for s in planned),
+        {s.user_id for s in planned},
+    )
+    return [s for s in planned if index.blocks(s.user_id, s.date, s.start_time, s.end_time)]
+
+
+def plan_conflicts(plan):
+    """
+    Sovrapposizioni che il piano di publish introdurrebbe, valutate sullo
+    stato finale (turni esistenti di tutti i ruoli + modifiche del piano).
+    Le sovrapposizioni già presenti e non toccate dal piano vengono ignorate.
+    """
+    planned = _planned_slots(plan)
+    if not planned:
+        return []
+
+    touched = {s.id for s in plan.to_update}
+    replaced = touched | {s.id for s in plan.to_delete}
+
+    existing = (
+        Shift.objects
+        .filter(
+            user_id__in={s.user_id for s in planned},
+            date__gte=min(s.date for s in planned),
+            date__lte=max(s.date for s in planned),
+        )
+        .exclude(id__in=replaced)
+        .values_list(*SLOT_FIELDS)
+    )
+    slots = planned + [ShiftSlot(*row) for row in existing]
+    slots.sort(key=lambda s: (s.user_id, s.date, s.start_time))
+
+    return [
+        c for c in find_overlaps(slots)
+        if c.first.id is None or c.second.id is None or
+        c.first.id in touched or c.second.id in touched
+    ]
+
+
+def shift_conflicts(user_id, day, start_time, end_time, exclude_ids=()):
+    """Turni salvati del collaboratore che si sovrappongono all'intervallo (una query)."""
+    return list(
+        Shift.objects
+        .filter(user_id=user_id, date=day, start_time__lt=end_time, end_time__gt=start_time)
+        .exclude(id__in=exclude_ids)
+        .order_by("start_time")
+        .values_list("id", "start_time", "end_time")
+    )
+
+
+def _slot_dict(slot):
+    return {
+        "id": slot.id,
+        "start_time": slot.start_time.strftime("%H:%M"),
+        "end_time": slot.end_time.strftime("%H:%M"),
+    }
+
+
+def slots_as_dicts(slots):
+    """Rappresentazione JSON dei turni in un'indisponibilità."""
+    return [
+        {"user_id": slot.user_id, "date": str(slot.date), **_slot_dict(slot)}
+        for slot in slots
+    ]
+
+
+def conflicts_as_dicts(conflicts):
+    """Rappresentazione JSON dei conflitti."""
+    return [
+        {
+            "user_id": c.user_id,
+            "date": str(c.date),
+            "shifts": [_slot_dict(c.first), _slot_dict(c.second)],
+        }
+        for c in conflicts
+    ]
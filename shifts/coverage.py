@@ -0,0 +1,167 @@
+"""
+Copertura del personale al minuto, per ruolo e per giorno.
+
+I turni (TemplateShift della settimana tipo oppure Shift di un periodo)
+diventano +1 all'inizio e -1 alla fine in una matrice di delta
+(ruoli × giorni × minuti); una cumsum lungo i minuti dà le presenze di
+ogni minuto. Il costo è O(turni + minuti) invece del confronto a coppie,
+quindi si può ricalcolare a ogni modifica della settimana tipo.
+
+Le CoverageRequirement (minimo ed eventuale massimo per fascia oraria)
+riempiono matrici della stessa forma e il confronto avviene in blocco:
+restano solo gli intervalli sotto il minimo ("under") o sopra il
+massimo ("over").
+"""
+import numpy as np
+
+from .models import CoverageRequirement, Shift, TemplateShift
+
+MINUTES_PER_DAY = 24 * 60
+NO_LIMIT = np.iinfo(np.int32).max
+
+
+def _minute(t):
+    return t.hour * 60 + t.minute
+
+
+def _hhmm(minute):
+    return f"{minute // 60:02d}:{minute % 60:02d}"
+
+
+def occupancy(role_index, day_index, starts, ends, roles, days):
+    """
+    Presenze al minuto: matrice int32 (roles, days, MINUTES_PER_DAY).
+    Gli argomenti sono array paralleli, un elemento per turno.
+    """
+    deltas = np.zeros((roles, days, MINUTES_PER_DAY + 1), dtype=np.int32)
+    np.add.at(deltas, (role_index, day_index, starts), 1)
+    np.add.at(deltas, (role_index, day_index, ends), -1)
+    return np.cumsum(deltas, axis=2, dtype=np.int32)[:, :, :MINUTES_PER_DAY]
+
+
+def requirement_bounds(requirements, role_pos, weekdays):
+    """
+    Minimo e massimo richiesti al minuto, con la stessa forma di occupancy.
+    Se più fasce si sovrappongono valgono il minimo più alto e il massimo più basso.
+    """
+    shape = (len(role_pos), len(weekdays), MINUTES_PER_DAY)
+    need = np.zeros(shape, dtype=np.int32)
+    cap = np.full(shape, NO_LIMIT, dtype=np.int32)
+    weekdays = np.asarray(weekdays)
+
+    for req in requirements:
+        r = role_pos[req.role_id]
+        days = np.flatnonzero(weekdays == req.weekday if req.weekday is not None else weekdays >= 0)
+        window = slice(_minute(req.start_time), _minute(req.end_time))
+
+        need[r, days, window] = np.maximum(need[r, days, window], req.min_staff)
+        if req.max_staff is not None:
+            cap[r, days, window] = np.minimum(cap[r, days, window], req.max_staff)
+
+    return need, cap
+
+
+def staffing_gaps(staffed, need, cap):
+    """
+    Intervalli fuori copertura come array paralleli
+    (ruolo, giorno, inizio, fine, stato, presenti, richiesti), dove
+    stato è 1 = sotto il minimo, 2 = sopra il massimo. Ogni intervallo ha
+    presenze e richiesta costanti.
+    """
+    state = np.where(staffed < need, 1, np.where(staffed > cap, 2, 0)).astype(np.int8)
+    required = np.where(state == 2, cap, need)
+
+    rows = state.reshape(-1, MINUTES_PER_DAY)
+    counts = staffed.reshape(-1, MINUTES_PER_DAY)
+    limits = required.reshape(-1, MINUTES_PER_DAY)
+
+    # inizio di un intervallo: primo minuto o cambio di stato / presenti / richiesti
+    change = np.ones(rows.shape, dtype=bool)
+    change[:, 1:] = (
+        (rows[:, 1:] != rows[:, :-1]) |
+        (counts[:, 1:] != counts[:, :-1]) |
+        (limits[:, 1:] != limits[:, :-1])
+    )
+    row, start = np.nonzero(change)
+
+    end = np.empty_like(start)
+    end[:-1] = start[1:]
+    end[np.append(row[1:] != row[:-1], True)] = MINUTES_PER_DAY
+
+    keep = rows[row, start] != 0
+    row, start, end = row[keep], start[keep], end[keep]
+    role, day = np.divmod(row, staffed.shape[1])
+    return role, day, start, end, rows[row, start], counts[row, start], limits[row, start]
+
+
+def _gap_dicts(gaps, roles, day_labels):
+    states = {1: "under", 2: "over"}
+    return [
+        {
+            "role_id": roles[r],
+            **day_labels[d],
+            "start": _hhmm(int(s)),
+            "end": _hhmm(int(e)),
+            "status": states[int(st)],
+            "staffed": int(n),
+            "required": int(q),
+        }
+        for r, d, s, e, st, n, q in zip(*gaps)
+    ]
+
+
+def _coverage(requirements, rows, weekdays, day_labels):
+    """rows: (role_id, indice giorno, inizio, fine) dei turni."""
+    roles = sorted({req.role_id for req in requirements})
+    if not roles:
+        return []
+    role_pos = {role_id: i for i, role_id in enumerate(roles)}
+
+    rows = [
+        (role_pos[role_id], day, _minute(start), _minute(end))
+        for role_id, day, start, end in rows
+        if role_id in role_pos and start < end
+    ]
+    columns = np.array(rows, dtype=np.int32).reshape(-1, 4).T
+
+    staffed = occupancy(*columns, roles=len(roles), days=len(weekdays))
+    need, cap = requirement_bounds(requirements, role_pos, weekdays)
+    return _gap_dicts(staffing_gaps(staffed, need, cap), roles, day_labels)
+
+
+def _requirements(role_ids):
+    qs = CoverageRequirement.objects.all()
+    if role_ids is not None:
+        qs = qs.filter(role_id__in=role_ids)
+    return list(qs)
+
+
+def template_coverage(role_ids=None):
+    """Scoperture della settimana tipo (solo i template con collaboratore assegnato)."""
+    requirements = _requirements(role_ids)
+    rows = (
+        TemplateShift.objects
+        .filter(category_id__in={req.role_id for req in requirements}, user__isnull=False)
+        .values_list("category_id", "weekday", "start_time", "end_time")
+    )
+    weekdays = list(range(7))
+    return _coverage(requirements, rows, weekdays, [{"weekday": d} for d in weekdays])
+
+
+def shift_coverage(period, role_ids=None):
+    """Scoperture dei turni effettivi nel periodo."""
+    requirements = _requirements(role_ids)
+    days = period.days()
+    rows = (
+        (role_id, (day - period.start).days, start, end)
+        for role_id, day, start, end in (
+            Shift.objects
+            .filter(**period.filter(), role_id__in={req.role_id for req in requirements})
+            .values_list("role_id", "date", "start_time", "end_time")
+        )
+    )
+    return _coverage(
+        requirements, rows,
+        [d.weekday() for d in days],
+        [{"date": str(d), "weekday": d.weekday()} for d in days],
+    )
@@ -0,0 +1,129 @@
+"""
+Notifiche push ai client (Server-Sent Events, vedi /api/events/).
+
+Le modifiche a turni e richieste di sostituzione pubblicano eventi
+compatti ({"type", "action", "users", ...}) al commit della transazione;
+ogni connessione SSE è una Subscription con la sua asyncio.Queue e riceve
+solo gli eventi dei propri utenti (lo staff li riceve tutti). Il client
+ricarica i dati solo quando arriva un evento: una connessione ferma non
+esegue query.
+
+Il broker è configurabile con SHIFT_EVENTS_BROKER (percorso della classe).
+LocalBroker funziona in un solo processo ASGI; con più worker serve un
+broker condiviso (es. Redis pub/sub) con gli stessi metodi
+subscribe / unsubscribe / publish. Con LocalBroker gli eventi dei job
+eseguiti da run_jobs li pubblica il server (jobs.watch_finished_jobs).
+"""
+import asyncio
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+QUEUE_SIZE = 100
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+class Subscription:
+    """Coda degli eventi di una connessione, legata al suo event loop."""
+
+    def __init__(self, user_id, everything=False):
+        self.user_id = user_id
+        self.everything = everything
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+
+    def wants(self, event):
+        users = event.get("users")
+        return self.everything or not users or self.user_id in users
+
+    def deliver(self, event):
+        """Chiamabile da qualunque thread."""
+        self.loop.call_soon_threadsafe(self._put, event)
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # client troppo lento: scarta la coda e chiede di ricaricare tutto
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"type": "resync"})
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class LocalBroker:
+    """Pub/sub in memoria, per un solo processo."""
+
+    def __init__(self):
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id, everything=False):
+        subscription = Subscription(user_id, everything)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            if subscription.wants(event):
+                subscription.deliver(event)
+
+    def __len__(self):
+        return len(self._subscriptions)
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                path = getattr(settings, "SHIFT_EVENTS_BROKER", "shifts.events.LocalBroker")
+                _broker = import_string(path)()
+    return _broker
+
+
+def publish(event_type, action, users=(), **data):
+    """
+    Pubblica un evento al commit della transazione corrente
+    (subito se non c'è una transazione aperta).
+    """
+    event = {
+        "type": event_type,
+        "action": action,
+        "users": sorted({u for u in users if u is not None}),
+        **data,
+    }
+    transaction.on_commit(lambda: get_broker().publish(event))
+
+
+def shift_event(action, shift, previous_user_id=None):
+    publish(
+        "shift", action,
+        users=[shift.user_id, previous_user_id],
+        id=shift.id,
+        date=str(shift.date),
+        role_id=shift.role_id,
+    )
+
+
+def replacement_event(action, request, shift_user_id=None):
+    publish(
+        "replacement", action,
+        users=[request.requester_id, request.target_user_id, shift_user_id],
+        id=request.id,
+        shift_id=request.shift_id,
+        status=request.status,
+    )
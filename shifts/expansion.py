@@ -0,0 +1,434 @@
+"""
+Espansione dei TemplateShift in turni reali.
+
+Un unico motore usato da publish, generate_month e dall'azione admin:
+i template vengono trasformati in un piano in memoria (tuple di turni),
+confrontato con i Shift esistenti e, solo in modalità "apply", scritto
+sul database con operazioni bulk.
+"""
+from collections import defaultdict, namedtuple
+from datetime import timedelta
+
+from django.db import transaction
+
+from . import ledger
+from .cache import bump_dates
+from .changes import delete_shifts, stamp
+from .events import publish
+from .models import Shift, TemplateShift, PublishedWeek
+
+
+PlannedShift = namedtuple(
+    "PlannedShift",
+    ["user_id", "role_id", "date", "start_time", "end_time", "course_type_id"],
+)
+
+# slot di un template senza collaboratore in una data precisa
+OpenSlot = namedtuple(
+    "OpenSlot",
+    ["template_id", "role_id", "date", "start_time", "end_time", "course_type_id"],
+)
+
+
+def normalize_week_start(start_date):
+    """
+    Normalizza l'inizio settimana a Lunedì.
+    La Domenica viene spostata al Lunedì successivo (come fa il calendario).
+    """
+    if start_date.weekday() == 6:
+        return start_date + timedelta(days=1)
+    return start_date - timedelta(days=start_date.weekday())
+
+
+def load_templates(role=None):
+    """
+    Carica una sola volta i template assegnati (eventualmente di un solo ruolo),
+    raggruppati per giorno della settimana.
+    """
+    templates_by_weekday = defaultdict(list)
+    for tpl in assigned_templates(role):
+        templates_by_weekday[tpl["weekday"]].append(tpl)
+    return templates_by_weekday
+
+
+def assigned_templates(role=None):
+    qs = TemplateShift.objects.filter(user__isnull=False)
+    if role is not None:
+        qs = qs.filter(category=role)
+    return qs.order_by("weekday", "start_time", "id").values(
+        "weekday", "user_id", "category_id", "start_time", "end_time", "course_type_id"
+    )
+
+
+def load_open_templates(role):
+    """Template del ruolo senza collaboratore, raggruppati per giorno della settimana."""
+    templates_by_weekday = defaultdict(list)
+    for tpl in (
+        TemplateShift.objects
+        .filter(user__isnull=True, category=role)
+        .order_by("weekday", "start_time", "id")
+        .values("id", "weekday", "category_id", "start_time", "end_time", "course_type_id")
+    ):
+        templates_by_weekday[tpl["weekday"]].append(tpl)
+    return templates_by_weekday
+
+
+def expand_open_slots(templates_by_weekday, dates):
+    return [
+        OpenSlot(
+            template_id=tpl["id"],
+            role_id=tpl["category_id"],
+            date=current_date,
+            start_time=tpl["start_time"],
+            end_time=tpl["end_time"],
+            course_type_id=tpl["course_type_id"],
+        )
+        for current_date in dates
+        for tpl in templates_by_weekday.get(current_date.weekday(), [])
+    ]
+
+
+def expand_templates(templates_by_weekday, dates):
+    """Espande i template sulle date indicate in una lista di PlannedShift."""
+    return [
+        PlannedShift(
+            user_id=tpl["user_id"],
+            role_id=tpl["category_id"],
+            date=current_date,
+            start_time=tpl["start_time"],
+            end_time=tpl["end_time"],
+            course_type_id=tpl["course_type_id"],
+        )
+        for current_date in dates
+        for tpl in templates_by_weekday.get(current_date.weekday(), [])
+    ]
+
+
+class SchedulePlan:
+    """
+    Diff tra i turni pianificati e quelli esistenti.
+
+    - to_create: PlannedShift da inserire
+    - to_update: Shift esistenti già modificati in memoria
+    - to_delete: Shift esistenti da eliminare
+    - published_weeks: (role_id, start_date) da registrare come pubblicate
+    - previous: valori originali (start, end, course_type_id) dei turni in to_update
+    - open_slots: OpenSlot dei template senza collaboratore ancora da coprire
+    """
+
+    def __init__(self):
+        self.to_create = []
+        self.to_update = []
+        self.to_delete = []
+        self.published_weeks = []
+        self.previous = {}
+        self.open_slots = []
+
+    def counts(self):
+        return {
+            "created": len(self.to_create),
+            "updated": len(self.to_update),
+            "deleted": len(self.to_delete),
+        }
+
+    def as_dict(self):
+        """Rappresentazione JSON del piano (per l'anteprima / dry-run)."""
+        return {
+            **self.counts(),
+            "open_slots": len(self.open_slots),
+            "to_create": [
+                {
+                    "user_id": p.user_id,
+                    "role_id": p.role_id,
+                    "date": str(p.date),
+                    "start_time": p.start_time.strftime("%H:%M"),
+                    "end_time": p.end_time.strftime("%H:%M"),
+                    "course_type_id": p.course_type_id,
+                }
+                for p in self.to_create
+            ],
+            "to_update": [
+                {
+                    "id": s.id,
+                    "user_id": s.user_id,
+                    "date": str(s.date),
+                    "start_time": s.start_time.strftime("%H:%M"),
+                    "end_time": s.end_time.strftime("%H:%M"),
+                    "course_type_id": s.course_type_id,
+                }
+                for s in self.to_update
+            ],
+            "to_delete": [
+                {
+                    "id": s.id,
+                    "user_id": s.user_id,
+                    "date": str(s.date),
+                    "start_time": s.start_time.strftime("%H:%M"),
+                    "end_time": s.end_time.strftime("%H:%M"),
+                }
+                for s in self.to_delete
+            ],
+        }
+
+
+def existing_shifts(start, end, role=None):
+    qs = Shift.objects.filter(date__gte=start, date__lte=end)
+    if role is not None:
+        qs = qs.filter(role=role)
+    return qs.only(
+        "id", "user_id", "role_id", "date", "start_time", "end_time", "course_type_id"
+    ).order_by("date", "user_id", "start_time", "id")
+
+
+def _match_slots(desired, existing):
+    """
+    Abbina i turni pianificati di un (data, utente) a quelli esistenti.
+
+    Prima i turni che sono già nello slot giusto (stessi orari), poi i
+    rimanenti in ordine di orario: abbinando subito in ordine di orario
+    un turno potrebbe essere spostato sullo slot ancora occupato da un
+    altro (unique_shift_slot). Così gli slot di destinazione degli
+    spostamenti sono sempre liberi.
+
+    Restituisce (coppie (pianificato, esistente), da creare, da eliminare).
+    """
+    by_slot = {(s.start_time, s.end_time): s for s in existing}
+    pairs, unplaced, seen = [], [], set()
+    for planned in sorted(desired, key=lambda p: p.start_time):
+        slot = (planned.start_time, planned.end_time)
+        if slot in seen:
+            # template duplicati: uno slot è comunque un solo turno
+            continue
+        seen.add(slot)
+        shift = by_slot.pop(slot, None)
+        if shift is None:
+            unplaced.append(planned)
+        else:
+            pairs.append((planned, shift))
+
+    unmatched = [s for s in existing if by_slot.get((s.start_time, s.end_time)) is s]
+    pairs.extend(zip(unplaced, unmatched))
+    return pairs, unplaced[len(unmatched):], unmatched[len(unplaced):]
+
+
+def plan_publish(role, week_starts, assignments=None):
+    """
+    Piano di pubblicazione delle settimane di un ruolo.
+
+    Sincronizza i turni del ruolo con i template: per ogni (data, utente)
+    i turni vengono abbinati per slot e poi in ordine di orario
+    (_match_slots), quelli in più creati o eliminati. Le settimane devono essere già normalizzate a Lunedì.
+
+    Gli slot dei template senza collaboratore vengono coperti con
+    `assignments` ({(template_id, data): user_id}, vedi shifts/assignment.py);
+    un turno esistente con gli stessi orari di uno slot libero non assegnato
+    viene mantenuto, gli altri slot restano in plan.open_slots.
+    """
+    assignments = assignments or {}
+    plan = SchedulePlan()
+    week_starts = sorted(set(week_starts))
+    if not week_starts:
+        return plan
+
+    dates = [ws + timedelta(days=i) for ws in week_starts for i in range(7)]
+    date_set = set(dates)
+    plan.published_weeks = [(role.id, ws) for ws in week_starts]
+
+    existing_map = defaultdict(list)
+    for shift in existing_shifts(week_starts[0], week_starts[-1] + timedelta(days=6), role):
+        if shift.date in date_set:
+            existing_map[(shift.date, shift.user_id)].append(shift)
+
+    desired_map = defaultdict(list)
+    for planned in expand_templates(load_templates(role), dates):
+        desired_map[(planned.date, planned.user_id)].append(planned)
+
+    open_slots = []
+    for slot in expand_open_slots(load_open_templates(role), dates):
+        user_id = assignments.get((slot.template_id, slot.date))
+        if user_id is None:
+            open_slots.append(slot)
+            continue
+        desired_map[(slot.date, user_id)].append(PlannedShift(
+            user_id=user_id,
+            role_id=slot.role_id,
+            date=slot.date,
+            start_time=slot.start_time,
+            end_time=slot.end_time,
+            course_type_id=slot.course_type_id,
+        ))
+
+    for key, desired in desired_map.items():
+        pairs, unplaced, unmatched = _match_slots(desired, existing_map.pop(key, []))
+
+        for planned, shift in pairs:
+            if (
+                shift.start_time != planned.start_time or
+                shift.end_time != planned.end_time or
+                shift.course_type_id != planned.course_type_id
+            ):
+                plan.previous[shift.id] = (shift.start_time, shift.end_time, shift.course_type_id)
+                shift.start_time = planned.start_time
+                shift.end_time = planned.end_time
+                shift.course_type_id = planned.course_type_id
+                plan.to_update.append(shift)
+
+        plan.to_create.extend(unplaced)
+        plan.to_delete.extend(unmatched)
+
+    # Turni non più presenti nei template, salvo quelli che già coprono uno slot libero
+    leftovers = defaultdict(list)
+    for shifts in existing_map.values():
+        for shift in shifts:
+            leftovers[(shift.date, shift.start_time, shift.end_time, shift.course_type_id)].append(shift)
+
+    for slot in open_slots:
+        covering = leftovers.get((slot.date, slot.start_time, slot.end_time, slot.course_type_id))
+        if covering:
+            covering.pop(0)
+        else:
+            plan.open_slots.append(slot)
+
+    for shifts in leftovers.values():
+        plan.to_delete.extend(shifts)
+
+    return plan
+
+
+def plan_generate(start, end, role=None):
+    """
+    Piano di generazione additiva tra start e end (inclusi).
+
+    Crea solo gli slot mancanti (chiave unique_shift_slot),
+    senza modificare né eliminare i turni esistenti.
+    """
+    plan = SchedulePlan()
+    dates = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+
+    existing = {
+        (s.user_id, s.role_id, s.date, s.start_time, s.end_time)
+        for s in existing_shifts(start, end, role)
+    }
+
+    for planned in expand_templates(load_templates(role), dates):
+        key = (planned.user_id, planned.role_id, planned.date, planned.start_time, planned.end_time)
+        if key in existing:
+            continue
+        existing.add(key)
+        plan.to_create.append(planned)
+
+    return plan
+
+
+def _revalidate(plan):
+    """
+    Rilegge, dentro la transazione di scrittura, i turni toccati dal piano:
+    un'altra pubblicazione o generazione concorrente può averli già creati,
+    modificati o eliminati dopo il calcolo del piano. Restituisce un
+    SchedulePlan con solo le righe ancora da scrivere e, in previous, i
+    valori attualmente sul database.
+
+    Su SQLite le transazioni sono IMMEDIATE (vedi core/settings.py): chi
+    scrive è serializzato, quindi quello che si legge qui è quello che
+    verrà sovrascritto.
+    """
+    written = SchedulePlan()
+    written.published_weeks = plan.published_weeks
+    written.open_slots = plan.open_slots
+
+    fields = ("id", "user_id", "role_id", "date", "start_time", "end_time", "course_type_id")
+    touched = {s.id for s in plan.to_update} | {s.id for s in plan.to_delete}
+    current = {s.id: s for s in Shift.objects.filter(id__in=touched).only(*fields)} if touched else {}
+
+    for planned in plan.to_update:
+        shift = current.get(planned.id)
+        if shift is None:
+            continue
+        values = (planned.start_time, planned.end_time, planned.course_type_id)
+        previous = (shift.start_time, shift.end_time, shift.course_type_id)
+        if previous == values:
+            continue
+        written.previous[shift.id] = previous
+        shift.start_time, shift.end_time, shift.course_type_id = values
+        written.to_update.append(shift)
+
+    written.to_delete = [current[s.id] for s in plan.to_delete if s.id in current]
+
+    if plan.to_create:
+        existing = set(
+            Shift.objects
+            .filter(
+                date__in={p.date for p in plan.to_create},
+                role_id__in={p.role_id for p in plan.to_create},
+            )
+            .values_list("user_id", "role_id", "date", "start_time", "end_time")
+        )
+        for planned in plan.to_create:
+            key = (planned.user_id, planned.role_id, planned.date, planned.start_time, planned.end_time)
+            if key not in existing:
+                existing.add(key)
+                written.to_create.append(planned)
+
+    return written
+
+
+def apply_plan(plan):
+    """
+    Scrive il piano sul database in un'unica transazione, con operazioni bulk.
+    Le righe vengono prima rilette (_revalidate): registro ore, notifiche
+    e conteggi created / updated / deleted restituiti riguardano solo
+    quelle effettivamente scritte.
+
+    Solleva IntegrityError (senza scrivere nulla) se una scrittura
+    concorrente ha occupato uno slot di destinazione dopo il calcolo del piano.
+    """
+    with transaction.atomic(), ledger.suspended():
+        written = _revalidate(plan)
+
+        deltas = ledger.new_deltas()
+        for p in written.to_create:
+            ledger.add_delta(deltas, p.user_id, p.date, p.role_id, p.course_type_id, p.start_time, p.end_time)
+        for s in written.to_update:
+            start_time, end_time, course_type_id = written.previous[s.id]
+            ledger.add_delta(deltas, s.user_id, s.date, s.role_id, course_type_id, start_time, end_time, sign=-1)
+            ledger.add_delta(deltas, s.user_id, s.date, s.role_id, s.course_type_id, s.start_time, s.end_time)
+        for s in written.to_delete:
+            ledger.add_delta(deltas, s.user_id, s.date, s.role_id, s.course_type_id, s.start_time, s.end_time, sign=-1)
+
+        if written.published_weeks:
+            PublishedWeek.objects.bulk_create(
+                [
+                    PublishedWeek(role_id=role_id, start_date=start_date)
+                    for role_id, start_date in written.published_weeks
+                ],
+                ignore_conflicts=True,
+            )
+        # prima le eliminazioni: liberano gli slot su cui spostamenti e
+        # nuovi turni possono andare (unique_shift_slot)
+        delete_shifts(written.to_delete)
+        if written.to_update:
+            Shift.objects.bulk_update(
+                stamp(written.to_update), ["start_time", "end_time", "course_type", "change_seq"]
+            )
+        if written.to_create:
+            Shift.objects.bulk_create(
+                stamp(Shift(**planned._asdict()) for planned in written.to_create)
+            )
+        ledger.apply_deltas(deltas)
+        # le bulk non inviano signal: invalida qui la cache dei calendari
+        bump_dates(
+            [(p.date, p.role_id) for p in written.to_create] +
+            [(s.date, s.role_id) for s in written.to_update]
+        )
+
+    # e avvisa i client (nel worker run_jobs li avvisa il server, vedi jobs.py)
+    touched = written.to_create + written.to_update + written.to_delete
+    if touched:
+        publish(
+            "shift", "bulk",
+            users=[s.user_id for s in touched],
+            start=str(min(s.date for s in touched)),
+            end=str(max(s.date for s in touched)),
+        )
+
+    return written.counts()
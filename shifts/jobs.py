@@ -0,0 +1,230 @@
+"""
+Esecuzione in background delle operazioni lunghe (publish / generate_month).
+
+Le view salvano un Job "queued"; lo esegue il processo separato
+`python manage.py run_jobs`, un job alla volta, così su SQLite il lock in
+scrittura viene preso per una settimana alla volta invece che per
+l'intera richiesta HTTP. Il worker non gira nei processi del server (né
+in migrate, shell, test...): un job si prende con un UPDATE condizionato,
+e all'avvio quelli rimasti "running" da un worker interrotto tornano in coda.
+
+Le versioni della cache dei calendari stanno nel database, quindi le
+scritture del worker le vede subito anche il server. Gli eventi SSE
+invece il worker li pubblica sul proprio broker, senza sottoscrittori:
+ogni processo del server li ricava dai job terminati
+(watch_finished_jobs, avviato dalla prima connessione a /api/events/).
+"""
+import calendar
+import datetime
+import logging
+import threading
+import time
+
+from django.db import close_old_connections
+from django.utils import timezone
+
+from . import events
+
+from .assignment import invalid_assignments, parse_assignments
+from .conflicts import plan_conflicts, plan_unavailable
+from .expansion import apply_plan, plan_generate, plan_publish
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+JOB_EVENTS_INTERVAL = 2.0
+
+_watcher = None
+_watcher_lock = threading.Lock()
+
+
+def submit_job(kind, payload, user=None):
+    """Crea il Job in coda: lo esegue il worker (comando run_jobs)."""
+    return Job.objects.create(
+        kind=kind,
+        payload=payload,
+        submitted_by=user if user and user.is_authenticated else None,
+    )
+
+
+def requeue_stale_jobs():
+    """
+    Rimette in coda i job rimasti "running" (worker terminato a metà).
+    Le settimane già scritte non producono modifiche alla ripetizione:
+    si azzera solo weeks_done, i conteggi restano quelli già scritti.
+    """
+    return Job.objects.filter(status="running").update(
+        status="queued", started_at=None, weeks_done=0,
+    )
+
+
+def claim_next_job():
+    """Prende il job in coda più vecchio e lo segna "running"; None se la coda è vuota."""
+    queued = Job.objects.filter(status="queued")
+    while True:
+        job_id = queued.order_by("created_at", "id").values_list("id", flat=True).first()
+        if job_id is None:
+            return None
+        # se un altro worker ha preso lo stesso id l'UPDATE non trova la riga: riprovo
+        if queued.filter(id=job_id).update(status="running", started_at=timezone.now()):
+            return Job.objects.get(id=job_id)
+
+
+def _month_chunks(year, month):
+    """Divide il mese in settimane (Lunedì-Domenica) troncate ai bordi del mese."""
+    _, num_days = calendar.monthrange(year, month)
+    first = datetime.date(year, month, 1)
+    last = datetime.date(year, month, num_days)
+
+    chunks = []
+    start = first
+    while start <= last:
+        end = min(start + datetime.timedelta(days=6 - start.weekday()), last)
+        chunks.append((start, end))
+        start = end + datetime.timedelta(days=1)
+    return chunks
+
+
+def _add_progress(job, counts):
+    job.weeks_done += 1
+    job.created += counts["created"]
+    job.updated += counts["updated"]
+    job.deleted += counts["deleted"]
+    job.save(update_fields=["weeks_done", "created", "updated", "deleted"])
+
+
+def _run_publish(job):
+    from users.models import UserRole
+
+    role = UserRole.objects.get(id=job.payload["role_id"])
+    week_starts = sorted({datetime.date.fromisoformat(d) for d in job.payload["weeks"]})
+
+    job.weeks_total = len(week_starts)
+    job.save(update_fields=["weeks_total"])
+
+    assignments = parse_assignments(job.payload.get("assignments", []))
+    # ricontrollo: ruoli e template possono essere cambiati dopo l'accodamento
+    invalid = invalid_assignments(role, week_starts, assignments)
+    if invalid:
+        first = invalid[0]
+        raise ValueError(
+            f"{len(invalid)} assegnazioni non valide "
+            f"(prima: template {first['template']} il {first['date']}: {first['error']})"
+        )
+
+    for week_start in week_starts:
+        plan = plan_publish(role, [week_start], assignments)
+        if not job.payload.get("allow_conflicts"):
+            conflicts = plan_conflicts(plan)
+            if conflicts:
+                # le settimane precedenti restano pubblicate (una transazione ciascuna)
+                raise ValueError(
+                    f"Settimana {week_start}: {len(conflicts)} turni sovrapposti "
+                    f"(primo: utente {conflicts[0].user_id} il {conflicts[0].date})"
+                )
+            unavailable = plan_unavailable(plan)
+            if unavailable:
+                raise ValueError(
+                    f"Settimana {week_start}: {len(unavailable)} turni in periodi di indisponibilità "
+                    f"(primo: utente {unavailable[0].user_id} il {unavailable[0].date})"
+                )
+        _add_progress(job, apply_plan(plan))
+
+
+def _run_generate_month(job):
+    chunks = _month_chunks(job.payload["year"], job.payload["month"])
+
+    job.weeks_total = len(chunks)
+    job.save(update_fields=["weeks_total"])
+
+    for start, end in chunks:
+        _add_progress(job, apply_plan(plan_generate(start, end)))
+
+
+RUNNERS = {
+    "publish": _run_publish,
+    "generate_month": _run_generate_month,
+}
+
+
+def run_job(job):
+    """Esegue un Job già segnato "running" da claim_next_job, aggiornando stato e avanzamento."""
+    try:
+        RUNNERS[job.kind](job)
+    except Exception as e:
+        logger.exception("Job %s fallito", job.id)
+        job.status = "failed"
+        job.error = str(e)
+    else:
+        job.status = "done"
+
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "error", "finished_at"])
+
+
+# ----------------------------------------------------------
+# EVENTI DEI JOB NEL PROCESSO DEL SERVER
+# ----------------------------------------------------------
+def job_dates(job):
+    """Primo e ultimo giorno che il job può aver modificato (dal payload)."""
+    if job.kind == "publish":
+        weeks = sorted(datetime.date.fromisoformat(d) for d in job.payload["weeks"])
+        return weeks[0], weeks[-1] + datetime.timedelta(days=6)
+    chunks = _month_chunks(job.payload["year"], job.payload["month"])
+    return chunks[0][0], chunks[-1][1]
+
+
+def publish_finished_jobs(since):
+    """
+    Pubblica sul broker di questo processo un evento "shift" / "bulk" per
+    ogni job terminato dopo `since` che ha scritto almeno una settimana
+    (anche se poi è fallito). L'evento non ha utenti: lo ricevono tutti.
+    Restituisce il `since` per la chiamata successiva.
+    """
+    jobs = list(
+        Job.objects
+        .filter(finished_at__gt=since, weeks_done__gt=0)
+        .order_by("finished_at", "id")
+    )
+    broker = events.get_broker()
+    for job in jobs:
+        start, end = job_dates(job)
+        broker.publish({
+            "type": "shift",
+            "action": "bulk",
+            "users": [],
+            "start": str(start),
+            "end": str(end),
+            "job_id": job.id,
+        })
+    return jobs[-1].finished_at if jobs else since
+
+
+def _watch_finished_jobs(interval):
+    since = timezone.now()
+    while True:
+        time.sleep(interval)
+        try:
+            since = publish_finished_jobs(since)
+        except Exception:
+            logger.exception("Eventi dei job terminati non pubblicati")
+        finally:
+            close_old_connections()
+
+
+def watch_finished_jobs(interval=JOB_EVENTS_INTERVAL):
+    """
+    Avvia una sola volta per processo il thread che ogni `interval` secondi
+    inoltra ai client SSE gli eventi dei job terminati. Serve solo con
+    LocalBroker: un broker condiviso riceve già gli eventi del worker.
+    """
+    global _watcher
+    if not isinstance(events.get_broker(), events.LocalBroker):
+        return
+    with _watcher_lock:
+        if _watcher is None:
+            _watcher = threading.Thread(
+                target=_watch_finished_jobs, args=(interval,), name="job-events", daemon=True,
+            )
+            _watcher.start()
+
@@ -0,0 +1,191 @@
+"""
+Registro ore mensile (MonthlyHoursLedger) mantenuto incrementalmente.
+
+Ogni modifica a un Shift produce dei delta (minuti, numero turni) sulla
+chiave (utente, mese, ruolo, tipo corso):
+- i signal di Shift coprono create / modifica / delete singoli
+  (incluso lo split di respond_replacement)
+- apply_plan (publish / generate_month) sospende i signal e applica
+  i delta di tutto il piano in un colpo solo
+
+rebuild_ledger ricostruisce il registro dai turni (comando rebuild_hours_ledger).
+"""
+import calendar
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import date, datetime
+
+from django.db import transaction
+from django.db.models.functions import ExtractHour, ExtractMinute
+
+from .models import MonthlyHoursLedger, Shift
+
+_state = threading.local()
+
+
+@contextmanager
+def suspended():
+    """Disattiva gli aggiornamenti dai signal (il chiamante applica i delta)."""
+    previous = getattr(_state, "suspended", False)
+    _state.suspended = True
+    try:
+        yield
+    finally:
+        _state.suspended = previous
+
+
+def is_suspended():
+    return getattr(_state, "suspended", False)
+
+
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def minutes_between(start_time, end_time):
+    start = datetime.combine(date.min, start_time)
+    end = datetime.combine(date.min, end_time)
+    return int((end - start).total_seconds() // 60)
+
+
+def shift_minutes(prefix=""):
+    """Espressione SQL della durata di un turno in minuti."""
+    return (
+        (ExtractHour(f"{prefix}end_time") * 60 + ExtractMinute(f"{prefix}end_time")) -
+        (ExtractHour(f"{prefix}start_time") * 60 + ExtractMinute(f"{prefix}start_time"))
+    )
+
+
+def add_delta(deltas, user_id, day, role_id, course_type_id, start_time, end_time, sign=1):
+    """Accumula in `deltas` il contributo (±) di un turno."""
+    key = (user_id, month_start(day), role_id, course_type_id)
+    entry = deltas[key]
+    entry[0] += sign * minutes_between(start_time, end_time)
+    entry[1] += sign
+
+
+def new_deltas():
+    return defaultdict(lambda: [0, 0])
+
+
+def apply_deltas(deltas):
+    """
+    Applica i delta al registro: una select delle righe coinvolte,
+    poi bulk_update / bulk_create / delete delle righe azzerate.
+    """
+    deltas = {k: v for k, v in deltas.items() if v[0] or v[1]}
+    if not deltas:
+        return
+
+    user_ids = {k[0] for k in deltas}
+    months = {k[1] for k in deltas}
+    role_ids = {k[2] for k in deltas}
+
+    with transaction.atomic():
+        existing = {
+            (row.user_id, row.month, row.role_id, row.course_type_id): row
+            for row in MonthlyHoursLedger.objects.select_for_update().filter(
+                user_id__in=user_ids, month__in=months, role_id__in=role_ids
+            )
+        }
+
+        to_create, to_update, to_delete = [], [], []
+        for key, (minutes, count) in deltas.items():
+            row = existing.get(key)
+            if row is None:
+                to_create.append(MonthlyHoursLedger(
+                    user_id=key[0],
+                    month=key[1],
+                    role_id=key[2],
+                    course_type_id=key[3],
+                    total_minutes=minutes,
+                    shift_count=count,
+                ))
+                continue
+
+            row.total_minutes += minutes
+            row.shift_count += count
+            if row.shift_count <= 0 and row.total_minutes == 0:
+                to_delete.append(row.id)
+            else:
+                to_update.append(row)
+
+        if to_create:
+            MonthlyHoursLedger.objects.bulk_create(to_create)
+        if to_update:
+            MonthlyHoursLedger.objects.bulk_update(to_update, ["total_minutes", "shift_count"])
+        if to_delete:
+            MonthlyHoursLedger.objects.filter(id__in=to_delete).delete()
+
+
+# ----------------------------------------------------------
+# RICOSTRUZIONE / VERIFICA
+# ----------------------------------------------------------
+def compute_from_shifts(start=None, end=None):
+    """Totali calcolati dai turni grezzi: {chiave: (minuti, turni)}."""
+    qs = Shift.objects.all()
+    if start:
+        qs = qs.filter(date__gte=start)
+    if end:
+        qs = qs.filter(date__lte=end)
+
+    deltas = new_deltas()
+    for row in qs.values_list(
+        "user_id", "date", "role_id", "course_type_id", "start_time", "end_time"
+    ).iterator(chunk_size=5000):
+        add_delta(deltas, *row)
+    return {k: tuple(v) for k, v in deltas.items()}
+
+
+def _month_bounds(start, end):
+    """Allarga l'intervallo ai mesi interi (il registro è mensile)."""
+    if start:
+        start = month_start(start)
+    if end:
+        end = date(end.year, end.month, calendar.monthrange(end.year, end.month)[1])
+    return start, end
+
+
+def _ledger_queryset(start=None, end=None):
+    qs = MonthlyHoursLedger.objects.all()
+    if start:
+        qs = qs.filter(month__gte=month_start(start))
+    if end:
+        qs = qs.filter(month__lte=month_start(end))
+    return qs
+
+
+def diff_ledger(start=None, end=None):
+    """Differenze tra registro e turni: {chiave: (registro, atteso)}."""
+    start, end = _month_bounds(start, end)
+    expected = compute_from_shifts(start, end)
+    stored = {
+        (r.user_id, r.month, r.role_id, r.course_type_id): (r.total_minutes, r.shift_count)
+        for r in _ledger_queryset(start, end)
+    }
+    return {
+        key: (stored.get(key), expected.get(key))
+        for key in set(expected) | set(stored)
+        if stored.get(key) != expected.get(key)
+    }
+
+
+def rebuild_ledger(start=None, end=None):
+    """Ricostruisce il registro (per i mesi indicati, o tutto) dai turni."""
+    start, end = _month_bounds(start, end)
+    expected = compute_from_shifts(start, end)
+    with transaction.atomic():
+        _ledger_queryset(start, end).delete()
+        MonthlyHoursLedger.objects.bulk_create([
+            MonthlyHoursLedger(
+                user_id=key[0],
+                month=key[1],
+                role_id=key[2],
+                course_type_id=key[3],
+                total_minutes=minutes,
+                shift_count=count,
+            )
+            for key, (minutes, count) in expected.items()
+        ], batch_size=1000)
+    return len(expected)
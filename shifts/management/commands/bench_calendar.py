@@ -0,0 +1,120 @@
+import time as _time
+import tracemalloc
+from calendar import monthrange
+from datetime import date, time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from shifts.models import Shift
+from shifts.periods import Period, week_period
+from shifts.projections import month_calendar, week_calendar
+from users.models import UserRole
+
+User = get_user_model()
+
+
+class _Rollback(Exception):
+    pass
+
+
+def legacy_month_calendar(start, end):
+    """Implementazione precedente (oggetti Shift + lazy load del ruolo)."""
+    shifts = Shift.objects.filter(
+        date__gte=start,
+        date__lte=end
+    ).select_related("user")
+
+    return [
+        {
+            "id": s.id,
+            "title": s.user.username if s.user else "—",
+            "role": s.role.code,
+            "date": str(s.date),
+            "start_time": s.start_time.strftime("%H:%M"),
+            "end_time": s.end_time.strftime("%H:%M"),
+            "user_id": s.user.id if s.user else None,
+        }
+        for s in shifts
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark dei calendari (get_month_shifts / get_week_shifts): "
+        "latenza, memoria e query prima e dopo le proiezioni .values()."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--shifts", type=int, default=2000, help="Turni fittizi nel mese")
+        parser.add_argument("--repeat", type=int, default=5, help="Ripetizioni per misura")
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                first, last = self._seed(options["shifts"])
+
+                cases = [
+                    ("mese (prima)", lambda: legacy_month_calendar(first, last)),
+                    ("mese (dopo)", lambda: month_calendar(Period(first, last + timedelta(days=1)))),
+                    ("settimana (dopo)", lambda: week_calendar(week_period(first))),
+                ]
+                for name, fn in cases:
+                    self._measure(name, fn, options["repeat"])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _measure(self, name, fn, repeat):
+        connection.queries_log.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            rows = len(fn())
+        queries = len(ctx.captured_queries)
+
+        timings = []
+        for _ in range(repeat):
+            t0 = _time.perf_counter()
+            fn()
+            timings.append((_time.perf_counter() - t0) * 1000)
+
+        tracemalloc.start()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        self.stdout.write(
+            f"{name:<18} righe={rows:<6} query={queries:<6} "
+            f"min={min(timings):8.2f} ms  media={sum(timings) / len(timings):8.2f} ms  "
+            f"picco memoria={peak / 1024:8.1f} KiB"
+        )
+
+    def _seed(self, count):
+        roles = list(UserRole.objects.all())
+        if not roles:
+            raise CommandError("Nessun UserRole presente")
+
+        today = date.today()
+        first = date(today.year, today.month, 1)
+        last = date(today.year, today.month, monthrange(today.year, today.month)[1])
+        days = (last - first).days + 1
+
+        users = User.objects.bulk_create([
+            User(username=f"bench_{i}", first_name="Bench", last_name=str(i))
+            for i in range(max(1, count // (days * 4)) + 1)
+        ])
+
+        shifts = []
+        for i in range(count):
+            user = users[i % len(users)]
+            slot = i // len(users)
+            shifts.append(Shift(
+                user=user,
+                role=roles[i % len(roles)],
+                date=first + timedelta(days=slot % days),
+                start_time=time(6 + (slot // days) % 16),
+                end_time=time(7 + (slot // days) % 16),
+            ))
+        Shift.objects.bulk_create(shifts, batch_size=1000)
+        return first, last
@@ -0,0 +1,159 @@
+from datetime import date, time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from shifts.expansion import assigned_templates, existing_shifts
+from shifts.models import Shift, ReplacementRequest
+from shifts.pagination import ReplacementCursorPagination
+from shifts.periods import week_period
+from shifts.projections import accepted_replacements, calendar_rows
+from shifts.views import received_requests, sent_requests
+from users.models import UserRole
+
+User = get_user_model()
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Mostra l'EXPLAIN delle query calde (get_week_shifts, "
+        "replacements_received / sent con la paginazione a cursore, publish), "
+        "costruite con le stesse funzioni delle view, e segnala le scansioni complete."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--seed-years",
+            type=int,
+            default=0,
+            help="Genera N anni di turni fittizi (in una transazione annullata alla fine)",
+        )
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Termina con errore se una query fa una scansione completa",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                if options["seed_years"]:
+                    self._seed(options["seed_years"])
+                full_scans = self._explain_all()
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        if full_scans:
+            msg = "Scansioni complete in: " + ", ".join(full_scans)
+            if options["check"]:
+                raise CommandError(msg)
+            self.stdout.write(self.style.WARNING(msg))
+        else:
+            self.stdout.write(self.style.SUCCESS("Tutte le query usano un indice"))
+
+    # ----------------------------------------------------------
+    # QUERY DEGLI ENDPOINT
+    # ----------------------------------------------------------
+    def _queries(self):
+        role = UserRole.objects.order_by("id").first()
+        user = User.objects.order_by("id").first()
+        if role is None or user is None:
+            raise CommandError("Servono almeno un UserRole e un utente")
+
+        week_start = date.today() - timedelta(days=date.today().weekday())
+        week = week_period(week_start)
+        received = received_requests(user.id)
+        sent = sent_requests(user.id)
+
+        return [
+            ("get_week_shifts", calendar_rows(week)),
+            ("get_week_shifts (sostituzioni)", accepted_replacements(week)),
+            ("replacements_received", self._first_page(received)),
+            ("replacements_received (pagina successiva)", self._next_page(received, week_start)),
+            ("replacements_sent", self._first_page(sent)),
+            ("replacements_sent (pagina successiva)", self._next_page(sent, week_start)),
+            ("publish (turni esistenti)", existing_shifts(week.start, week.last, role)),
+            ("publish (template)", assigned_templates(role)),
+        ]
+
+    # come ReplacementCursorPagination: ordinamento, poi page_size + 1 righe
+    @staticmethod
+    def _first_page(qs):
+        paginator = ReplacementCursorPagination()
+        return qs.order_by(*paginator.ordering)[:paginator.page_size + 1]
+
+    @classmethod
+    def _next_page(cls, qs, position):
+        # con un cursore DRF filtra sul primo campo di ordinamento ("-shift_date")
+        return cls._first_page(qs.filter(shift_date__lt=position))
+
+    def _explain_all(self):
+        if connection.vendor == "sqlite":
+            connection.cursor().execute("ANALYZE")
+
+        full_scans = []
+        for name, qs in self._queries():
+            plan = qs.explain()
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(plan)
+            self.stdout.write("")
+            if self._has_full_scan(plan):
+                full_scans.append(name)
+        return full_scans
+
+    @staticmethod
+    def _has_full_scan(plan):
+        for line in plan.splitlines():
+            line = line.strip(" |-`")
+            # SQLite: "SCAN shifts_shift" senza indice; PostgreSQL: "Seq Scan"
+            if line.startswith("SCAN ") and "USING" not in line:
+                return True
+            if "Seq Scan" in line:
+                return True
+        return False
+
+    # ----------------------------------------------------------
+    # DATI FITTIZI
+    # ----------------------------------------------------------
+    def _seed(self, years):
+        roles = list(UserRole.objects.all())
+        if not roles:
+            raise CommandError("Nessun UserRole presente")
+
+        users = User.objects.bulk_create([
+            User(username=f"explain_{i}", first_name="Explain", last_name=str(i))
+            for i in range(40)
+        ])
+
+        start = date.today() - timedelta(days=365 * years)
+        shifts = []
+        for day in range(365 * years):
+            current = start + timedelta(days=day)
+            for i, u in enumerate(users):
+                shifts.append(Shift(
+                    user=u,
+                    role=roles[i % len(roles)],
+                    date=current,
+                    start_time=time(8 + i % 10),
+                    end_time=time(9 + i % 10),
+                ))
+        Shift.objects.bulk_create(shifts, batch_size=2000)
+
+        sample = Shift.objects.filter(user__in=users).order_by("id")[::50]
+        ReplacementRequest.objects.bulk_create([
+            ReplacementRequest(
+                shift=s,
+                requester=s.user,
+                target_user=users[(k + 1) % len(users)],
+                status="pending" if k % 3 else "accepted",
+            )
+            for k, s in enumerate(sample)
+        ], batch_size=2000)
+
+        self.stdout.write(f"Generati {len(shifts)} turni fittizi su {years} anni")
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from shifts.conflicts import detect_conflicts
+from shifts.periods import PeriodError, parse_period
+
+
+class Command(BaseCommand):
+    help = "Elenca i turni sovrapposti dello stesso collaboratore in un intervallo di date."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--start", required=True, help="Data iniziale (YYYY-MM-DD)")
+        parser.add_argument("--end", required=True, help="Data finale inclusa (YYYY-MM-DD)")
+        parser.add_argument("--user", type=int, help="Solo questo collaboratore (id)")
+
+    def handle(self, *args, **options):
+        try:
+            period = parse_period({"start": options["start"], "end": options["end"]}, required=True)
+        except PeriodError as e:
+            raise CommandError(str(e))
+
+        user_ids = [options["user"]] if options["user"] else None
+        conflicts = detect_conflicts(period, user_ids)
+
+        for c in conflicts:
+            self.stdout.write(
+                f"{c.date} utente {c.user_id}: "
+                f"#{c.first.id} {c.first.start_time:%H:%M}-{c.first.end_time:%H:%M} ↔ "
+                f"#{c.second.id} {c.second.start_time:%H:%M}-{c.second.end_time:%H:%M}"
+            )
+
+        if conflicts:
+            raise CommandError(f"{len(conflicts)} sovrapposizioni tra {period.start} e {period.last}")
+        self.stdout.write(self.style.SUCCESS("Nessuna sovrapposizione"))
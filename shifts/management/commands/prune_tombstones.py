@@ -0,0 +1,23 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from shifts.changes import prune_tombstones
+
+
+class Command(BaseCommand):
+    help = (
+        "Elimina le tombstone del feed /api/shifts/changes/ più vecchie di N giorni. "
+        "I client con un cursore precedente ricevono 410 e ricaricano tutto."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=90, help="Giorni da conservare (default 90)")
+
+    def handle(self, *args, **options):
+        if options["days"] < 1:
+            raise CommandError("--days deve essere almeno 1")
+
+        deleted = prune_tombstones(timezone.now() - timedelta(days=options["days"]))
+        self.stdout.write(self.style.SUCCESS(f"{deleted} tombstone eliminate"))
@@ -0,0 +1,45 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from shifts.ledger import diff_ledger, rebuild_ledger
+
+
+class Command(BaseCommand):
+    help = "Verifica o ricostruisce il registro ore mensile (MonthlyHoursLedger) dai turni."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--start", help="Data iniziale (YYYY-MM-DD), allargata al mese")
+        parser.add_argument("--end", help="Data finale (YYYY-MM-DD), allargata al mese")
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Confronta soltanto, senza scrivere (errore se ci sono differenze)",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            start = date.fromisoformat(options["start"]) if options["start"] else None
+            end = date.fromisoformat(options["end"]) if options["end"] else None
+        except ValueError:
+            raise CommandError("Le date devono essere nel formato YYYY-MM-DD")
+
+        differences = diff_ledger(start, end)
+        for (user_id, month, role_id, course_type_id), (stored, expected) in sorted(
+            differences.items(), key=lambda item: (item[0][1], item[0][0])
+        ):
+            self.stdout.write(
+                f"utente {user_id} {month:%Y-%m} ruolo {role_id} corso {course_type_id}: "
+                f"registro={stored} atteso={expected}"
+            )
+
+        if options["check"]:
+            if differences:
+                raise CommandError(f"{len(differences)} righe del registro non corrispondono ai turni")
+            self.stdout.write(self.style.SUCCESS("Registro ore allineato ai turni"))
+            return
+
+        rows = rebuild_ledger(start, end)
+        self.stdout.write(self.style.SUCCESS(
+            f"Registro ricostruito: {rows} righe ({len(differences)} corrette)"
+        ))
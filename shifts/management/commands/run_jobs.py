@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from shifts.jobs import claim_next_job, requeue_stale_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = (
+        "Worker dei job in background (publish / generate_month con \"background\": true). "
+        "Va avviato in un solo processo, accanto al server: all'avvio rimette in coda "
+        "i job rimasti in esecuzione da un worker interrotto."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval", type=float, default=2.0, help="Secondi tra un controllo e l'altro della coda")
+        parser.add_argument("--once", action="store_true", help="Esegue i job in coda ed esce")
+
+    def handle(self, *args, **options):
+        if options["interval"] <= 0:
+            raise CommandError("--interval deve essere positivo")
+
+        requeued = requeue_stale_jobs()
+        if requeued:
+            self.stdout.write(self.style.WARNING(f"{requeued} job interrotti rimessi in coda"))
+
+        while True:
+            job = claim_next_job()
+            if job is None:
+                if options["once"]:
+                    return
+                # a coda vuota non tengo aperta la connessione (CONN_MAX_AGE)
+                close_old_connections()
+                time.sleep(options["interval"])
+                continue
+
+            run_job(job)
+            style = self.style.SUCCESS if job.status == "done" else self.style.ERROR
+            self.stdout.write(style(f"Job {job.id} ({job.kind}): {job.status}"))
@@ -0,0 +1,156 @@
+import asyncio
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.backends.signals import connection_created
+from rest_framework_simplejwt.tokens import AccessToken
+
+from shifts import events
+
+User = get_user_model()
+
+USERNAME = "_sse_load_"
+
+
+class QueryCounter:
+    """Conta le query di tutte le connessioni (anche quelle dei thread di sync_to_async)."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+    def install(self, sender=None, connection=None, **kwargs):
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+
+class Client:
+    """Client SSE che parla direttamente con l'applicazione ASGI."""
+
+    def __init__(self, app, token):
+        self.app = app
+        self.token = token
+        self.disconnect = asyncio.Event()
+        self.body_sent = False
+        self.status = None
+        self.events = 0
+        self.first_event = asyncio.Event()
+
+    async def receive(self):
+        if not self.body_sent:
+            self.body_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await self.disconnect.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(self, message):
+        if message["type"] == "http.response.start":
+            self.status = message["status"]
+        elif message["type"] == "http.response.body":
+            body = message.get("body", b"")
+            if body.startswith(b"event:"):
+                self.events += 1
+                self.first_event.set()
+
+    async def run(self):
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": "/api/events/",
+            "raw_path": b"/api/events/",
+            "query_string": f"token={self.token}".encode(),
+            "headers": [(b"host", b"localhost"), (b"accept", b"text/event-stream")],
+            "client": ("127.0.0.1", 0),
+            "server": ("localhost", 80),
+        }
+        await self.app(scope, self.receive, self.send)
+
+
+class Command(BaseCommand):
+    help = (
+        "Prova di carico di /api/events/: apre N connessioni SSE in-process, "
+        "misura le query con i client fermi e la consegna di un evento a tutti. "
+        "Usa il database configurato; l'utente di prova viene eliminato alla fine."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clients", type=int, default=500, help="Connessioni simultanee")
+        parser.add_argument("--idle", type=float, default=3.0, help="Secondi di attesa a client fermi")
+
+    def handle(self, *args, **options):
+        clients, idle = options["clients"], options["idle"]
+        if clients < 1:
+            raise CommandError("Serve almeno un client")
+
+        # un'esecuzione interrotta può aver lasciato l'utente di prova
+        User.objects.filter(username=USERNAME).delete()
+        user = User.objects.create(username=USERNAME)
+        counter = QueryCounter()
+        counter.install(connection=connection)
+        connection_created.connect(counter.install)
+        try:
+            report = asyncio.run(self._run(user, clients, idle, counter))
+        finally:
+            connection_created.disconnect(counter.install)
+            connection.execute_wrappers.remove(counter)
+            User.objects.filter(username=USERNAME).delete()
+
+        for line in report["lines"]:
+            self.stdout.write(line)
+        if report["errors"]:
+            raise CommandError("; ".join(report["errors"]))
+        self.stdout.write(self.style.SUCCESS("Nessuna query a client fermi, evento consegnato a tutti"))
+
+    async def _run(self, user, clients, idle, counter):
+        app = get_asgi_application()
+        broker = events.get_broker()
+        token = str(AccessToken.for_user(user))
+        errors, lines = [], []
+
+        started = time.perf_counter()
+        conns = [Client(app, token) for _ in range(clients)]
+        tasks = [asyncio.create_task(c.run()) for c in conns]
+        while len(broker) < clients:
+            if any(t.done() for t in tasks):
+                errors.append("una connessione si è chiusa in apertura")
+                break
+            await asyncio.sleep(0.01)
+        lines.append(
+            f"{clients} connessioni aperte in {time.perf_counter() - started:.2f}s "
+            f"({counter.count} query, una per autenticazione)"
+        )
+
+        before = counter.count
+        await asyncio.sleep(idle)
+        idle_queries = counter.count - before
+        lines.append(f"{idle:.0f}s a client fermi: {idle_queries} query")
+        if idle_queries:
+            errors.append(f"{idle_queries} query a client fermi")
+
+        before = counter.count
+        started = time.perf_counter()
+        broker.publish({"type": "shift", "action": "updated", "users": [user.id], "id": 0})
+        await asyncio.wait_for(asyncio.gather(*(c.first_event.wait() for c in conns)), 10)
+        lines.append(
+            f"evento consegnato a {sum(c.events for c in conns)} client in "
+            f"{(time.perf_counter() - started) * 1000:.1f} ms ({counter.count - before} query)"
+        )
+
+        for c in conns:
+            c.disconnect.set()
+        await asyncio.wait_for(asyncio.gather(*tasks, return_exceptions=True), 10)
+        if len(broker):
+            errors.append(f"{len(broker)} sottoscrizioni rimaste dopo la disconnessione")
+        if any(c.status != 200 for c in conns):
+            errors.append("risposte diverse da 200")
+
+        return {"lines": lines, "errors": errors}
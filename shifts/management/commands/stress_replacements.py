@@ -0,0 +1,138 @@
+import threading
+import time as _time
+from datetime import date, time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework.test import APIRequestFactory
+
+from shifts.ledger import diff_ledger
+from shifts.models import ReplacementRequest, Shift
+from shifts.views import ShiftViewSet
+from users.models import UserRole
+
+User = get_user_model()
+
+USERNAME_PREFIX = "_stress_"
+
+
+class Command(BaseCommand):
+    help = (
+        "Prova di concorrenza di respond_replacement: più collaboratori accettano "
+        "nello stesso istante richieste sullo stesso turno. Verifica che vinca "
+        "una sola accettazione e misura il throughput. Usa il database configurato; "
+        "i dati di prova vengono eliminati alla fine."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rounds", type=int, default=20, help="Turni contesi")
+        parser.add_argument("--contenders", type=int, default=8, help="Accettazioni simultanee per turno")
+
+    def handle(self, *args, **options):
+        rounds, contenders = options["rounds"], options["contenders"]
+        if rounds < 1 or contenders < 2:
+            raise CommandError("Servono almeno 1 round e 2 contendenti")
+
+        role = UserRole.objects.filter(code="bagnino").first() or UserRole.objects.first()
+        if role is None:
+            raise CommandError("Nessun ruolo presente")
+
+        owner = User.objects.create(username=f"{USERNAME_PREFIX}owner")
+        targets = User.objects.bulk_create([
+            User(username=f"{USERNAME_PREFIX}{i}") for i in range(contenders)
+        ])
+        try:
+            errors, elapsed, attempts = self._run(role, owner, targets, rounds)
+        finally:
+            User.objects.filter(username__startswith=USERNAME_PREFIX).delete()
+
+        for error in errors:
+            self.stdout.write(self.style.ERROR(error))
+        self.stdout.write(
+            f"{rounds} turni × {contenders} accettazioni: {attempts} richieste in "
+            f"{elapsed:.2f}s ({attempts / elapsed:.0f} req/s)"
+        )
+        if errors:
+            raise CommandError(f"{len(errors)} violazioni")
+        self.stdout.write(self.style.SUCCESS("Una sola accettazione per turno, registro ore allineato"))
+
+    def _run(self, role, owner, targets, rounds):
+        view = ShiftViewSet.as_view({"post": "respond_replacement"})
+        factory = APIRequestFactory()
+        first_day = date(2000, 1, 1)
+        errors = []
+        attempts = 0
+        elapsed = 0.0
+
+        for n in range(rounds):
+            # round pari: sostituzione totale, dispari: parziale sovrapposta
+            partial = n % 2 == 1
+            shift = Shift.objects.create(
+                user=owner,
+                role=role,
+                date=first_day + timedelta(days=n),
+                start_time=time(8),
+                end_time=time(12),
+            )
+            requests = [
+                ReplacementRequest.objects.create(
+                    shift=shift,
+                    requester=owner,
+                    target_user=target,
+                    partial=partial,
+                    partial_start=time(9) if partial else None,
+                    partial_end=time(11) if partial else None,
+                )
+                for target in targets
+            ]
+
+            barrier = threading.Barrier(len(requests))
+            statuses = {}
+
+            def accept(req_id):
+                try:
+                    barrier.wait()
+                    request = factory.post(
+                        "/api/shifts/respond_replacement/",
+                        {"request_id": req_id, "action": "accept"},
+                        format="json",
+                    )
+                    statuses[req_id] = view(request).status_code
+                finally:
+                    connection.close()
+
+            threads = [threading.Thread(target=accept, args=(r.id,)) for r in requests]
+            started = _time.perf_counter()
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            elapsed += _time.perf_counter() - started
+            attempts += len(requests)
+
+            winners = [req_id for req_id, code in statuses.items() if code == 200]
+            accepted = list(
+                ReplacementRequest.objects.filter(shift=shift, status="accepted").values_list("id", flat=True)
+            )
+            pending = ReplacementRequest.objects.filter(
+                id__in=[r.id for r in requests], status="pending"
+            ).count()
+
+            if len(winners) != 1 or accepted != winners or pending:
+                errors.append(
+                    f"round {n}: vincitori={winners} accettate={accepted} pending={pending} "
+                    f"risposte={sorted(statuses.values())}"
+                )
+                continue
+
+            winner = next(r for r in requests if r.id == winners[0])
+            shift.refresh_from_db()
+            if shift.user_id != winner.target_user_id:
+                errors.append(f"round {n}: turno assegnato a {shift.user_id}, atteso {winner.target_user_id}")
+
+        differences = diff_ledger(first_day, first_day + timedelta(days=rounds))
+        if differences:
+            errors.append(f"registro ore non allineato: {differences}")
+
+        return errors, elapsed, attempts
@@ -0,0 +1,103 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:19
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def remove_duplicate_shifts(apps, schema_editor):
+    """
+    Elimina i turni duplicati (stesso slot) prima di aggiungere il vincolo.
+
+    Per ogni slot resta il turno con richieste di sostituzione accettate,
+    poi quello con richieste, poi il più vecchio: le richieste dei
+    duplicati vengono spostate sul turno che resta invece di sparire
+    a cascata. Gli id eliminati vengono stampati.
+    """
+    Shift = apps.get_model('shifts', 'Shift')
+    ReplacementRequest = apps.get_model('shifts', 'ReplacementRequest')
+
+    slots = {}
+    for shift in Shift.objects.order_by('id').values(
+        'id', 'user_id', 'role_id', 'date', 'start_time', 'end_time'
+    ):
+        key = (shift['user_id'], shift['role_id'], shift['date'], shift['start_time'], shift['end_time'])
+        slots.setdefault(key, []).append(shift['id'])
+    slots = {key: ids for key, ids in slots.items() if len(ids) > 1}
+    if not slots:
+        return
+
+    requests = {}
+    for shift_id, status in ReplacementRequest.objects.filter(
+        shift_id__in=[i for ids in slots.values() for i in ids]
+    ).values_list('shift_id', 'status'):
+        accepted, total = requests.get(shift_id, (0, 0))
+        requests[shift_id] = (accepted + (status == 'accepted'), total + 1)
+
+    print(f"\n  Turni duplicati: {len(slots)} slot")
+    for key, ids in slots.items():
+        # ids è in ordine crescente: a parità di richieste resta il più vecchio
+        keep = max(ids, key=lambda i: (*requests.get(i, (0, 0)), -i))
+        removed = [i for i in ids if i != keep]
+        moved = ReplacementRequest.objects.filter(shift_id__in=removed).update(shift_id=keep)
+        Shift.objects.filter(id__in=removed).delete()
+
+        user_id, role_id, day, start_time, end_time = key
+        print(
+            f"    utente {user_id}, ruolo {role_id}, {day} {start_time}-{end_time}: "
+            f"tenuto {keep}, eliminati {removed}, richieste spostate {moved}"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0005_alter_categorybaserate_options_and_more'),
+        ('shifts', '0015_convert_role_and_category_to_fk'),
+        ('users', '0005_populate_user_roles'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='publishedweek',
+            options={'ordering': ['-start_date', 'role'], 'verbose_name': 'Settimana pubblicata', 'verbose_name_plural': 'Settimane pubblicate'},
+        ),
+        migrations.AlterField(
+            model_name='publishedweek',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, verbose_name='Data pubblicazione'),
+        ),
+        migrations.AlterField(
+            model_name='publishedweek',
+            name='role',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='published_weeks', to='users.userrole', verbose_name='Ruolo/Categoria'),
+        ),
+        migrations.AlterField(
+            model_name='publishedweek',
+            name='start_date',
+            field=models.DateField(verbose_name='Data inizio settimana'),
+        ),
+        # 0015 ha già convertito le colonne in role_id / category_id con RunPython:
+        # qui si allinea solo lo stato (un AlterField ricostruirebbe le tabelle
+        # copiando i vecchi nomi di colonna come stringhe)
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='shift',
+                    name='role',
+                    field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='shifts', to='users.userrole'),
+                ),
+                migrations.AlterField(
+                    model_name='templateshift',
+                    name='category',
+                    field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='template_shifts', to='users.userrole'),
+                ),
+            ],
+        ),
+        migrations.RunPython(remove_duplicate_shifts, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='shift',
+            constraint=models.UniqueConstraint(fields=('user', 'role', 'date', 'start_time', 'end_time'), name='unique_shift_slot'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:21
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0005_alter_categorybaserate_options_and_more'),
+        ('shifts', '0017_job'),
+        ('users', '0005_populate_user_roles'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='replacementrequest',
+            index=models.Index(fields=['shift', 'status'], name='rr_shift_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='replacementrequest',
+            index=models.Index(fields=['target_user', 'status'], name='rr_target_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='replacementrequest',
+            index=models.Index(fields=['requester', 'shift'], name='rr_requester_shift_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shift',
+            index=models.Index(fields=['date', 'role'], name='shift_date_role_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shift',
+            index=models.Index(fields=['user', 'date'], name='shift_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='templateshift',
+            index=models.Index(fields=['category', 'weekday'], name='tpl_category_weekday_idx'),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:27
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def populate_ledger(apps, schema_editor):
+    """Costruisce il registro ore dai turni esistenti"""
+    from datetime import date, datetime
+
+    Shift = apps.get_model('shifts', 'Shift')
+    MonthlyHoursLedger = apps.get_model('shifts', 'MonthlyHoursLedger')
+
+    totals = {}
+    for user_id, day, role_id, course_type_id, start, end in Shift.objects.values_list(
+        'user_id', 'date', 'role_id', 'course_type_id', 'start_time', 'end_time'
+    ):
+        key = (user_id, date(day.year, day.month, 1), role_id, course_type_id)
+        minutes = int((datetime.combine(day, end) - datetime.combine(day, start)).total_seconds() // 60)
+        entry = totals.setdefault(key, [0, 0])
+        entry[0] += minutes
+        entry[1] += 1
+
+    MonthlyHoursLedger.objects.bulk_create([
+        MonthlyHoursLedger(
+            user_id=key[0],
+            month=key[1],
+            role_id=key[2],
+            course_type_id=key[3],
+            total_minutes=minutes,
+            shift_count=count,
+        )
+        for key, (minutes, count) in totals.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0005_alter_categorybaserate_options_and_more'),
+        ('shifts', '0018_composite_indexes'),
+        ('users', '0005_populate_user_roles'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyHoursLedger',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(verbose_name='Mese (primo giorno)')),
+                ('total_minutes', models.IntegerField(default=0)),
+                ('shift_count', models.IntegerField(default=0)),
+                ('course_type', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='courses.coursetype')),
+                ('role', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hours_ledger', to='users.userrole')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hours_ledger', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Registro ore mensile',
+                'verbose_name_plural': 'Registro ore mensile',
+                'indexes': [models.Index(fields=['month', 'user'], name='ledger_month_user_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('course_type__isnull', False)), fields=('user', 'month', 'role', 'course_type'), name='unique_ledger_course'), models.UniqueConstraint(condition=models.Q(('course_type__isnull', True)), fields=('user', 'month', 'role'), name='unique_ledger_no_course')],
+            },
+        ),
+        migrations.RunPython(populate_ledger, migrations.RunPython.noop),
+    ]
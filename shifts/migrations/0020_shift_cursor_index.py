@@ -0,0 +1,21 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0006_effective_dated_rates'),
+        ('shifts', '0019_monthly_hours_ledger'),
+        ('users', '0006_payroll_close_payslip'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='shift',
+            index=models.Index(fields=['date', 'start_time', 'id'], name='shift_date_start_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shifts', '0020_shift_cursor_index'),
+        ('users', '0006_payroll_close_payslip'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CoverageRequirement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekday', models.IntegerField(blank=True, choices=[(0, 'Lunedì'), (1, 'Martedì'), (2, 'Mercoledì'), (3, 'Giovedì'), (4, 'Venerdì'), (5, 'Sabato'), (6, 'Domenica')], null=True)),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('min_staff', models.PositiveSmallIntegerField(default=1, verbose_name='Presenze minime')),
+                ('max_staff', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Presenze massime')),
+                ('role', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='coverage_requirements', to='users.userrole')),
+            ],
+            options={
+                'verbose_name': 'Copertura richiesta',
+                'verbose_name_plural': 'Coperture richieste',
+                'indexes': [models.Index(fields=['role', 'weekday'], name='coverage_role_weekday_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shifts', '0021_coverage_requirement'),
+        ('users', '0007_user_max_weekly_hours'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShiftPreference',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekday', models.IntegerField(blank=True, choices=[(0, 'Lunedì'), (1, 'Martedì'), (2, 'Mercoledì'), (3, 'Giovedì'), (4, 'Venerdì'), (5, 'Sabato'), (6, 'Domenica')], null=True)),
+                ('start_time', models.TimeField(blank=True, null=True)),
+                ('end_time', models.TimeField(blank=True, null=True)),
+                ('kind', models.CharField(choices=[('prefer', 'Preferisce'), ('avoid', 'Da evitare')], default='prefer', max_length=10)),
+                ('role', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='users.userrole')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shift_preferences', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Preferenza turni',
+                'verbose_name_plural': 'Preferenze turni',
+                'indexes': [models.Index(fields=['user', 'weekday'], name='preference_user_weekday_idx')],
+            },
+        ),
+    ]
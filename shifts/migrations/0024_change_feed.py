@@ -0,0 +1,52 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:59
+
+from django.db import migrations, models
+
+
+def create_counter(apps, schema_editor):
+    """Riga unica del contatore: le righe esistenti restano con change_seq = 0"""
+    ChangeCounter = apps.get_model('shifts', 'ChangeCounter')
+    ChangeCounter.objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shifts', '0023_unavailability'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.BigIntegerField(default=0)),
+                ('pruned', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='replacementrequest',
+            name='change_seq',
+            field=models.BigIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='shift',
+            name='change_seq',
+            field=models.BigIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('shift', 'Turno'), ('replacement', 'Richiesta di sostituzione')], max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('owner_id', models.BigIntegerField(blank=True, null=True)),
+                ('change_seq', models.BigIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['change_seq'], name='tombstone_seq_idx'), models.Index(fields=['created_at'], name='tombstone_created_idx')],
+            },
+        ),
+        migrations.RunPython(create_counter, migrations.RunPython.noop),
+    ]
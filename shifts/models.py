@@ -1,8 +1,72 @@
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models import F
 from django.conf import settings
 
+WEEKDAY_CHOICES = [
+    (i, d) for i, d in enumerate(
+        ["Lunedì", "Martedì", "Mercoledì", "Giovedì", "Venerdì", "Sabato", "Domenica"]
+    )
+]
+
+
+class ChangeCounter(models.Model):
+    """
+    Contatore globale (una sola riga) delle modifiche a turni e richieste
+    di sostituzione, usato come cursore da /api/shifts/changes/.
+    L'UPDATE blocca la riga fino al commit: i numeri diventano visibili
+    nello stesso ordine in cui sono assegnati, quindi un client che ha
+    letto il cursore N non perde modifiche con numero <= N.
+    """
+    value = models.BigIntegerField(default=0)
+    # numero più alto tra le tombstone eliminate (cursori precedenti non validi)
+    pruned = models.BigIntegerField(default=0)
+
+    @classmethod
+    def allocate(cls, count=1):
+        """
+        Riserva `count` numeri consecutivi e restituisce l'ultimo.
+        Va chiamata nella transazione che scrive le righe.
+        """
+        if not cls.objects.filter(pk=1).update(value=F("value") + count):
+            cls.objects.create(pk=1, value=count)
+        return cls.objects.values_list("value", flat=True).get(pk=1)
+
+    @classmethod
+    def current(cls):
+        return cls.objects.values_list("value", "pruned").filter(pk=1).first() or (0, 0)
+
 
-class Shift(models.Model):
+class CacheVersion(models.Model):
+    """
+    Versione delle risposte in cache di un periodo (vedi shifts/cache.py).
+    Sta nel database perché la incrementano anche il worker run_jobs e
+    gli altri processi del server, che non condividono la cache in memoria.
+    """
+    scope = models.CharField(max_length=40, unique=True)
+    version = models.BigIntegerField()
+
+    def __str__(self):
+        return f"{self.scope}: {self.version}"
+
+
+class ChangeTracked(models.Model):
+    """Riga del feed incrementale: change_seq cambia a ogni save()."""
+    change_seq = models.BigIntegerField(default=0, db_index=True, editable=False)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, "change_seq"}
+        with transaction.atomic(savepoint=False):
+            self.change_seq = ChangeCounter.allocate()
+            super().save(*args, **kwargs)
+
+
+class Shift(ChangeTracked):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     role = models.ForeignKey(
         'users.UserRole',
@@ -20,6 +84,21 @@ class Shift(models.Model):
     )
     approved = models.BooleanField(default=False)
 
+    class Meta:
+        constraints = [
+            # Chiave di deduplica per la generazione dai template
+            models.UniqueConstraint(
+                fields=["user", "role", "date", "start_time", "end_time"],
+                name="unique_shift_slot",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["date", "role"], name="shift_date_role_idx"),
+            models.Index(fields=["user", "date"], name="shift_user_date_idx"),
+            # ordinamento della paginazione a cursore
+            models.Index(fields=["date", "start_time", "id"], name="shift_date_start_idx"),
+        ]
+
     def total_hours(self):
         from datetime import datetime
         start_dt = datetime.combine(self.date, self.start_time)
@@ -36,11 +115,7 @@ class TemplateShift(models.Model):
         on_delete=models.PROTECT,
         related_name='template_shifts'
     )    
-    weekday = models.IntegerField(choices=[
-        (i, d) for i, d in enumerate(
-            ["Lunedì", "Martedì", "Mercoledì", "Giovedì", "Venerdì", "Sabato", "Domenica"]
-        )
-    ])
+    weekday = models.IntegerField(choices=WEEKDAY_CHOICES)
     start_time = models.TimeField()
     end_time = models.TimeField()
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
@@ -51,11 +126,16 @@ class TemplateShift(models.Model):
         blank=True
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["category", "weekday"], name="tpl_category_weekday_idx"),
+        ]
+
     def __str__(self):
         return f"{self.category.label} - {self.get_weekday_display()} {self.start_time}-{self.end_time}"
     
 
-class ReplacementRequest(models.Model):
+class ReplacementRequest(ChangeTracked):
     STATUS_CHOICES = [
         ('pending', 'In attesa'),
         ('accepted', 'Accettata'),
@@ -93,10 +173,44 @@ class ReplacementRequest(models.Model):
         related_name="replacement_requests_closed"
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["shift", "status"], name="rr_shift_status_idx"),
+            models.Index(fields=["target_user", "status"], name="rr_target_status_idx"),
+            models.Index(fields=["requester", "shift"], name="rr_requester_shift_idx"),
+        ]
+
     def __str__(self):
         return f"Richiesta {self.shift} → {self.target_user} ({self.status})"
 
 
+class Tombstone(models.Model):
+    """
+    Riga eliminata, oppure uscita dalla vista di un utente (turno passato
+    a un altro collaboratore), per il feed incrementale.
+    owner_id non è una FK: la tombstone deve sopravvivere all'utente.
+    """
+    KIND_CHOICES = [
+        ('shift', 'Turno'),
+        ('replacement', 'Richiesta di sostituzione'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    owner_id = models.BigIntegerField(null=True, blank=True)
+    change_seq = models.BigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["change_seq"], name="tombstone_seq_idx"),
+            models.Index(fields=["created_at"], name="tombstone_created_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.object_id} eliminato ({self.change_seq})"
+
+
 class PublishedWeek(models.Model):
     """
     Traccia quali settimane sono state pubblicate per ogni categoria/ruolo.
@@ -122,4 +236,215 @@ class PublishedWeek(models.Model):
         ordering = ['-start_date', 'role']
 
     def __str__(self):
-        return f"{self.role.label} - {self.start_date}"
\ No newline at end of file
+        return f"{self.role.label} - {self.start_date}"
+
+class Job(models.Model):
+    """
+    Operazione lunga (pubblicazione / generazione) eseguita in background.
+    """
+    KIND_CHOICES = [
+        ('publish', 'Pubblicazione'),
+        ('generate_month', 'Generazione mensile'),
+    ]
+    STATUS_CHOICES = [
+        ('queued', 'In coda'),
+        ('running', 'In esecuzione'),
+        ('done', 'Completato'),
+        ('failed', 'Fallito'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    payload = models.JSONField(default=dict)
+
+    # Avanzamento
+    weeks_total = models.PositiveIntegerField(default=0)
+    weeks_done = models.PositiveIntegerField(default=0)
+    created = models.PositiveIntegerField(default=0)
+    updated = models.PositiveIntegerField(default=0)
+    deleted = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+
+    submitted_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="jobs"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.id} ({self.status})"
+
+
+class MonthlyHoursLedger(models.Model):
+    """
+    Totali mensili per (utente, mese, ruolo, tipo corso), aggiornati
+    incrementalmente a ogni modifica dei turni (vedi shifts/ledger.py).
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="hours_ledger"
+    )
+    month = models.DateField(verbose_name='Mese (primo giorno)')
+    role = models.ForeignKey(
+        'users.UserRole',
+        on_delete=models.CASCADE,
+        related_name='hours_ledger'
+    )
+    course_type = models.ForeignKey(
+        'courses.CourseType',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True
+    )
+    total_minutes = models.IntegerField(default=0)
+    shift_count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "month", "role", "course_type"],
+                condition=models.Q(course_type__isnull=False),
+                name="unique_ledger_course",
+            ),
+            models.UniqueConstraint(
+                fields=["user", "month", "role"],
+                condition=models.Q(course_type__isnull=True),
+                name="unique_ledger_no_course",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["month", "user"], name="ledger_month_user_idx"),
+        ]
+        verbose_name = 'Registro ore mensile'
+        verbose_name_plural = 'Registro ore mensile'
+
+    def __str__(self):
+        return f"{self.user} - {self.month:%Y-%m} - {self.role}: {self.total_minutes} min"
+
+
+class CoverageRequirement(models.Model):
+    """
+    Presenze richieste per un ruolo in una fascia oraria (vedi shifts/coverage.py).
+    Senza giorno la fascia vale per tutti i giorni della settimana;
+    senza massimo non viene segnalato il sovraffollamento.
+    """
+    role = models.ForeignKey(
+        'users.UserRole',
+        on_delete=models.CASCADE,
+        related_name='coverage_requirements'
+    )
+    weekday = models.IntegerField(choices=WEEKDAY_CHOICES, null=True, blank=True)
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    min_staff = models.PositiveSmallIntegerField(default=1, verbose_name='Presenze minime')
+    max_staff = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name='Presenze massime')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["role", "weekday"], name="coverage_role_weekday_idx"),
+        ]
+        verbose_name = 'Copertura richiesta'
+        verbose_name_plural = 'Coperture richieste'
+
+    def clean(self):
+        if self.start_time and self.end_time and self.start_time >= self.end_time:
+            raise ValidationError("L'ora di fine deve essere successiva all'inizio")
+        if self.max_staff is not None and self.max_staff < self.min_staff:
+            raise ValidationError("Il massimo non può essere inferiore al minimo")
+
+    def __str__(self):
+        day = self.get_weekday_display() if self.weekday is not None else "Tutti i giorni"
+        return f"{self.role.label} - {day} {self.start_time}-{self.end_time} (min {self.min_staff})"
+
+
+class ShiftPreference(models.Model):
+    """
+    Preferenza dichiarata da un collaboratore, usata dall'assegnazione
+    automatica degli slot liberi (vedi shifts/assignment.py).
+    Senza ruolo, giorno od orari vale per tutti i ruoli / giorni / l'intera giornata.
+    """
+    KIND_CHOICES = [
+        ('prefer', 'Preferisce'),
+        ('avoid', 'Da evitare'),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='shift_preferences'
+    )
+    role = models.ForeignKey(
+        'users.UserRole',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True
+    )
+    weekday = models.IntegerField(choices=WEEKDAY_CHOICES, null=True, blank=True)
+    start_time = models.TimeField(null=True, blank=True)
+    end_time = models.TimeField(null=True, blank=True)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, default='prefer')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "weekday"], name="preference_user_weekday_idx"),
+        ]
+        verbose_name = 'Preferenza turni'
+        verbose_name_plural = 'Preferenze turni'
+
+    def clean(self):
+        if (self.start_time is None) != (self.end_time is None):
+            raise ValidationError("Indicare sia l'inizio sia la fine, oppure nessuno dei due")
+        if self.start_time and self.start_time >= self.end_time:
+            raise ValidationError("L'ora di fine deve essere successiva all'inizio")
+
+    def __str__(self):
+        day = self.get_weekday_display() if self.weekday is not None else "Tutti i giorni"
+        return f"{self.user.username} - {self.get_kind_display()} {day}"
+
+
+class Unavailability(models.Model):
+    """
+    Periodo in cui un collaboratore non può lavorare (vedi shifts/availability.py).
+    Senza orari vale per l'intera giornata, con weekday solo quel giorno
+    della settimana (ricorrenza settimanale), senza end_date non scade.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='unavailabilities'
+    )
+    start_date = models.DateField()
+    end_date = models.DateField(null=True, blank=True)
+    weekday = models.IntegerField(choices=WEEKDAY_CHOICES, null=True, blank=True)
+    start_time = models.TimeField(null=True, blank=True)
+    end_time = models.TimeField(null=True, blank=True)
+    note = models.CharField(max_length=200, blank=True)
+
+    class Meta:
+        indexes = [
+            # NOT EXISTS per collaboratore e caricamento per intervallo di date
+            models.Index(fields=["user", "start_date", "end_date"], name="unavail_user_dates_idx"),
+            models.Index(fields=["start_date", "end_date"], name="unavail_dates_idx"),
+        ]
+        verbose_name = 'Indisponibilità'
+        verbose_name_plural = 'Indisponibilità'
+
+    def clean(self):
+        if self.end_date and self.start_date and self.end_date < self.start_date:
+            raise ValidationError("La data di fine deve essere successiva all'inizio")
+        if (self.start_time is None) != (self.end_time is None):
+            raise ValidationError("Indicare sia l'inizio sia la fine, oppure nessuno dei due")
+        if self.start_time and self.start_time >= self.end_time:
+            raise ValidationError("L'ora di fine deve essere successiva all'inizio")
+
+    def __str__(self):
+        return f"{self.user.username} - dal {self.start_date}"
@@ -0,0 +1,24 @@
+"""
+Paginazione a cursore delle liste di turni e richieste.
+
+CursorPagination di DRF filtra sul primo campo di ordinamento (keyset)
+e usa l'offset solo per i pari merito, quindi la pagina N costa come
+la prima; gli indici shift_date_start_idx / shift_user_date_idx coprono
+l'ordinamento. page_size è limitato da max_page_size.
+"""
+from rest_framework.pagination import CursorPagination
+
+
+class ShiftCursorPagination(CursorPagination):
+    ordering = ("date", "start_time", "id")
+    page_size = 200
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+
+
+class ReplacementCursorPagination(CursorPagination):
+    # shift_date è annotato sulla queryset (F("shift__date"))
+    ordering = ("-shift_date", "id")
+    page_size = 100
+    page_size_query_param = "page_size"
+    max_page_size = 500
@@ -0,0 +1,95 @@
+"""
+Periodi delle query string, tradotti in intervalli semiaperti [start, end).
+
+Tutti gli endpoint di turni e richieste usano lo stesso parsing:
+- year + month            → mese
+- week=2025-W10           → settimana ISO
+- start_date=2025-03-03   → settimana da quel giorno (7 giorni)
+- start + end (inclusa)   → intervallo esplicito
+
+Il filtro risultante è date__gte / date__lt, quindi una range scan
+sull'indice della data invece dell'estrazione di mese e anno per riga.
+"""
+from collections import namedtuple
+from datetime import date, timedelta
+
+MAX_PERIOD_DAYS = 366 * 2
+
+
+class PeriodError(ValueError):
+    """Parametri di periodo non validi (messaggio pronto per la risposta)."""
+
+
+class Period(namedtuple("Period", ["start", "end"])):
+    """Intervallo semiaperto di date: start incluso, end escluso."""
+
+    __slots__ = ()
+
+    @property
+    def last(self):
+        """Ultimo giorno incluso."""
+        return self.end - timedelta(days=1)
+
+    def filter(self, field="date"):
+        """kwargs per .filter(): es. {"date__gte": ..., "date__lt": ...}."""
+        return {f"{field}__gte": self.start, f"{field}__lt": self.end}
+
+    def days(self):
+        return [self.start + timedelta(days=i) for i in range((self.end - self.start).days)]
+
+
+def month_period(year, month):
+    try:
+        start = date(int(year), int(month), 1)
+    except (TypeError, ValueError):
+        raise PeriodError("year e month devono essere numeri validi")
+    end = date(start.year + 1, 1, 1) if start.month == 12 else date(start.year, start.month + 1, 1)
+    return Period(start, end)
+
+
+def week_period(start):
+    return Period(start, start + timedelta(days=7))
+
+
+def _parse_date(value, name):
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise PeriodError(f"{name} non valido (YYYY-MM-DD)")
+
+
+def _parse_iso_week(value):
+    try:
+        year, week = value.upper().split("-W")
+        return week_period(date.fromisocalendar(int(year), int(week), 1))
+    except (AttributeError, ValueError):
+        raise PeriodError("week non valido (YYYY-Www)")
+
+
+def parse_period(params, required=False):
+    """
+    Legge il periodo dai parametri (query_params o dict).
+    Restituisce un Period, oppure None se assente e non obbligatorio.
+    Solleva PeriodError se i parametri sono incompleti o non validi.
+    """
+    if params.get("week"):
+        return _parse_iso_week(params["week"])
+
+    if params.get("start_date"):
+        return week_period(_parse_date(params["start_date"], "start_date"))
+
+    if params.get("start") or params.get("end"):
+        start = _parse_date(params.get("start"), "start")
+        last = _parse_date(params.get("end"), "end")
+        if last < start:
+            raise PeriodError("end deve essere successiva a start")
+        if (last - start).days >= MAX_PERIOD_DAYS:
+            raise PeriodError(f"Intervallo troppo lungo (massimo {MAX_PERIOD_DAYS} giorni)")
+        return Period(start, last + timedelta(days=1))
+
+    if params.get("year") or params.get("month"):
+        return month_period(params.get("year"), params.get("month"))
+
+    if required:
+        raise PeriodError("Specificare year e month, week oppure start e end")
+    return None
@@ -0,0 +1,105 @@
+"""
+Proiezioni leggere dei turni per i calendari (RealCalendar / MyShifts).
+
+Le righe vengono lette con .values() in un'unica query con join su ruolo
+e utente: nessun oggetto Shift istanziato, nessun caricamento lazy per riga.
+I periodi sono shifts.periods.Period (intervalli semiaperti sulla data).
+"""
+from .models import Shift, ReplacementRequest
+
+
+SHIFT_FIELDS = (
+    "id",
+    "date",
+    "role__code",
+    "start_time",
+    "end_time",
+    "user_id",
+    "user__username",
+)
+
+
+def calendar_rows(period):
+    return (
+        Shift.objects
+        .filter(**period.filter())
+        .values_list(*SHIFT_FIELDS)
+    )
+
+
+def accepted_replacements(period):
+    """
+    Sostituzioni accettate sui turni del periodo. I turni si selezionano
+    con una subquery (indice sulla data), le richieste con rr_shift_status_idx:
+    un filtro su shift__date farebbe invece una scansione delle richieste.
+    """
+    return (
+        ReplacementRequest.objects
+        .filter(shift__in=Shift.objects.filter(**period.filter()).values("id"), status="accepted")
+        .order_by("id")
+        .values_list(
+            "shift_id",
+            "partial",
+            "requester_id",
+            "target_user_id",
+            "target_user__username",
+            "partial_start",
+            "partial_end",
+        )
+    )
+
+
+def week_calendar(period):
+    """
+    Turni del periodo con le info sulle sostituzioni accettate.
+    Due query in tutto, indipendentemente dal numero di turni.
+    """
+    rows = list(calendar_rows(period))
+
+    rep_map = {}
+    for shift_id, partial, requester_id, target_id, target_name, p_start, p_end in accepted_replacements(period):
+        rep_map[shift_id] = {
+            "accepted": True,
+            "partial": partial,
+            "requester_id": requester_id,
+            "accepted_by_id": target_id,
+            "accepted_by_username": target_name,
+            "partial_start": p_start,
+            "partial_end": p_end,
+        }
+
+    return [
+        {
+            "id": shift_id,
+            "date": str(shift_date),
+            "role": role_code,
+            "start_time": start_time.strftime("%H:%M"),
+            "end_time": end_time.strftime("%H:%M"),
+            "user_id": user_id,
+            "user": {
+                "id": user_id,
+                "username": username,
+            },
+
+            # INFO sostituzione (se presente)
+            "replacement_info": rep_map.get(shift_id, {"accepted": False}),
+        }
+        for shift_id, shift_date, role_code, start_time, end_time, user_id, username in rows
+    ]
+
+
+def month_calendar(period):
+    """Turni del periodo per la vista mensile. Una sola query."""
+    return [
+        {
+            "id": shift_id,
+            "title": username,
+            "role": role_code,
+            "date": str(shift_date),
+            "start_time": start_time.strftime("%H:%M"),
+            "end_time": end_time.strftime("%H:%M"),
+            "user_id": user_id,
+        }
+        for shift_id, shift_date, role_code, start_time, end_time, user_id, username
+        in calendar_rows(period)
+    ]
@@ -1,6 +1,10 @@
 # shifts/serializers.py
+from django.db.models import Prefetch
 from rest_framework import serializers
-from .models import Shift, TemplateShift, ReplacementRequest
+from .conflicts import shift_conflicts
+from .models import (
+    Shift, TemplateShift, ReplacementRequest, Job, CoverageRequirement, ShiftPreference, Unavailability,
+)
 from users.models import UserRole
 
 
@@ -19,7 +23,35 @@ class ShiftSerializer(serializers.ModelSerializer):
     class Meta:
         model = Shift
         fields = "__all__"
-    
+        # unique_shift_slot è già coperto dal controllo delle sovrapposizioni
+        # in validate (e role / role_id puntano allo stesso campo)
+        validators = []
+
+    @staticmethod
+    def setup_eager_loading(queryset, prefix=""):
+        """
+        Carica in blocco ruolo, tipo corso e ultima sostituzione accettata,
+        così la serializzazione di N turni non fa query per riga.
+        `prefix` serve quando i turni sono raggiunti da un'altra relazione
+        (es. "shift__" per le ReplacementRequest).
+        """
+        accepted = (
+            ReplacementRequest.objects
+            .filter(status="accepted")
+            .select_related("target_user", "requester")
+            .order_by("-id")
+        )
+        return queryset.select_related(
+            f"{prefix}role",
+            f"{prefix}course_type",
+        ).prefetch_related(
+            Prefetch(
+                f"{prefix}replacement_requests",
+                queryset=accepted,
+                to_attr="accepted_replacements",
+            )
+        )
+
     def get_role_data(self, obj):
         """Restituisce dati completi del ruolo"""
         if not obj.role:
@@ -38,6 +70,30 @@ class ShiftSerializer(serializers.ModelSerializer):
                 data["course_type"] = CourseType.objects.get(id=course_id)
             except CourseType.DoesNotExist:
                 raise serializers.ValidationError({"course": "CourseType non trovato"})
+
+        # orari e sovrapposizioni sul risultato finale (create o PATCH)
+        instance = self.instance
+
+        def final(field):
+            return data[field] if field in data else getattr(instance, field, None)
+
+        user, day = final("user"), final("date")
+        start_time, end_time = final("start_time"), final("end_time")
+        if start_time and end_time and start_time >= end_time:
+            raise serializers.ValidationError({"end_time": "La fine deve essere successiva all'inizio"})
+
+        if user and day and start_time and end_time:
+            overlapping = shift_conflicts(
+                user.id, day, start_time, end_time,
+                exclude_ids=[instance.id] if instance else [],
+            )
+            if overlapping:
+                raise serializers.ValidationError({
+                    "conflicts": [
+                        f"Sovrapposto al turno #{shift_id} ({start:%H:%M}-{end:%H:%M})"
+                        for shift_id, start, end in overlapping
+                    ]
+                })
         return data
 
     def get_course_type_data(self, obj):
@@ -50,15 +106,19 @@ class ShiftSerializer(serializers.ModelSerializer):
         }
 
     def get_replacement_info(self, shift):
-        req = (
-            ReplacementRequest.objects.filter(
-                shift=shift,
-                status="accepted"
+        if hasattr(shift, "accepted_replacements"):
+            # precaricata da setup_eager_loading (ordinata per -id)
+            req = shift.accepted_replacements[0] if shift.accepted_replacements else None
+        else:
+            req = (
+                ReplacementRequest.objects.filter(
+                    shift=shift,
+                    status="accepted"
+                )
+                .select_related("target_user", "requester")
+                .order_by("-id")
+                .first()
             )
-            .select_related("target_user", "requester")
-            .order_by("-id")
-            .first()
-        )
 
         if not req:
             return None
@@ -148,3 +208,88 @@ class ReplacementRequestSerializer(serializers.ModelSerializer):
     class Meta:
         model = ReplacementRequest
         fields = "__all__"
+
+
+class JobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Job
+        fields = (
+            "id",
+            "kind",
+            "status",
+            "payload",
+            "weeks_total",
+            "weeks_done",
+            "created",
+            "updated",
+            "deleted",
+            "error",
+            "created_at",
+            "started_at",
+            "finished_at",
+        )
+
+
+class CoverageRequirementSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CoverageRequirement
+        fields = "__all__"
+
+    def validate(self, data):
+        instance = self.instance
+
+        def final(field):
+            return data[field] if field in data else getattr(instance, field, None)
+
+        start_time, end_time = final("start_time"), final("end_time")
+        if start_time and end_time and start_time >= end_time:
+            raise serializers.ValidationError({"end_time": "La fine deve essere successiva all'inizio"})
+
+        max_staff = final("max_staff")
+        if max_staff is not None and max_staff < (final("min_staff") or 0):
+            raise serializers.ValidationError({"max_staff": "Il massimo non può essere inferiore al minimo"})
+        return data
+
+
+class ShiftPreferenceSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ShiftPreference
+        fields = "__all__"
+        extra_kwargs = {"user": {"required": False}}
+
+    def validate(self, data):
+        instance = self.instance
+
+        def final(field):
+            return data[field] if field in data else getattr(instance, field, None)
+
+        start_time, end_time = final("start_time"), final("end_time")
+        if (start_time is None) != (end_time is None):
+            raise serializers.ValidationError({"end_time": "Indicare sia l'inizio sia la fine, oppure nessuno dei due"})
+        if start_time and start_time >= end_time:
+            raise serializers.ValidationError({"end_time": "La fine deve essere successiva all'inizio"})
+        return data
+
+
+class UnavailabilitySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Unavailability
+        fields = "__all__"
+        extra_kwargs = {"user": {"required": False}}
+
+    def validate(self, data):
+        instance = self.instance
+
+        def final(field):
+            return data[field] if field in data else getattr(instance, field, None)
+
+        start_date, end_date = final("start_date"), final("end_date")
+        if start_date and end_date and end_date < start_date:
+            raise serializers.ValidationError({"end_date": "La data di fine deve essere successiva all'inizio"})
+
+        start_time, end_time = final("start_time"), final("end_time")
+        if (start_time is None) != (end_time is None):
+            raise serializers.ValidationError({"end_time": "Indicare sia l'inizio sia la fine, oppure nessuno dei due"})
+        if start_time and start_time >= end_time:
+            raise serializers.ValidationError({"end_time": "La fine deve essere successiva all'inizio"})
+        return data
@@ -0,0 +1,144 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import changes, ledger
+from .cache import bump_shift, forget_roles
+from .changes import bury
+from .events import replacement_event, shift_event
+from .models import ChangeCounter, Shift, ReplacementRequest
+
+# campi che influenzano calendari e registro ore
+TRACKED_FIELDS = {"user", "date", "role", "course_type", "start_time", "end_time"}
+PREVIOUS_VALUES = ("user_id", "date", "role_id", "course_type_id", "start_time", "end_time")
+
+
+def _shift_values(shift):
+    return tuple(getattr(shift, f) for f in PREVIOUS_VALUES)
+
+
+@receiver(pre_save, sender=Shift)
+def remember_previous_shift(sender, instance, update_fields=None, **kwargs):
+    """Salva i valori precedenti: servono per invalidare il vecchio mese e per i delta del registro."""
+    instance._previous_values = None
+    if update_fields is not None and not TRACKED_FIELDS & set(update_fields):
+        return
+    if instance.pk:
+        instance._previous_values = (
+            Shift.objects.filter(pk=instance.pk).values_list(*PREVIOUS_VALUES).first()
+        )
+
+
+@receiver(post_save, sender=Shift)
+def shift_saved(sender, instance, created, **kwargs):
+    previous = getattr(instance, "_previous_values", None)
+    current = _shift_values(instance)
+
+    # INVALIDAZIONE CACHE CALENDARI
+    bump_shift(instance.date, instance.role_id)
+    if previous and (previous[1], previous[2]) != (instance.date, instance.role_id):
+        bump_shift(previous[1], previous[2])
+
+    # NOTIFICHE PUSH
+    shift_event("created" if created else "updated", instance, previous[0] if previous else None)
+
+    # FEED INCREMENTALE: per il vecchio collaboratore il turno è sparito
+    if previous and previous[0] != instance.user_id:
+        bury("shift", [(instance.id, previous[0])], change_seq=instance.change_seq)
+
+    # REGISTRO ORE
+    if ledger.is_suspended() or (not created and previous in (None, current)):
+        return
+    deltas = ledger.new_deltas()
+    if previous and not created:
+        ledger.add_delta(deltas, *previous, sign=-1)
+    ledger.add_delta(deltas, *current)
+    ledger.apply_deltas(deltas)
+
+
+def _is_user(origin):
+    User = get_user_model()
+    return isinstance(origin, User) or getattr(origin, "model", None) is User
+
+
+@receiver(post_delete, sender=Shift)
+def shift_deleted(sender, instance, origin=None, **kwargs):
+    shift_event("deleted", instance)
+    if not changes.is_suspended():
+        bump_shift(instance.date, instance.role_id)
+        bury("shift", [(instance.id, instance.user_id)])
+
+    # utente eliminato: le sue righe del registro spariscono a cascata
+    if not ledger.is_suspended() and not _is_user(origin):
+        deltas = ledger.new_deltas()
+        ledger.add_delta(deltas, *_shift_values(instance), sign=-1)
+        ledger.apply_deltas(deltas)
+
+
+# ----------------------------------------------------------
+# TIPI DI CORSO ELIMINATI
+# ----------------------------------------------------------
+@receiver(pre_delete, sender="courses.CourseType")
+def remember_course_months(sender, instance, **kwargs):
+    # i turni passano a course_type NULL con un update senza signal
+    shifts = Shift.objects.filter(course_type=instance)
+    instance._ledger_months = sorted(set(shifts.dates("date", "month")))
+    instance._shift_ids = list(shifts.values_list("id", flat=True))
+
+
+@receiver(post_delete, sender="courses.CourseType")
+def course_type_deleted(sender, instance, **kwargs):
+    months = getattr(instance, "_ledger_months", None)
+    if months:
+        ledger.rebuild_ledger(months[0], months[-1])
+    shift_ids = getattr(instance, "_shift_ids", None)
+    if shift_ids:
+        Shift.objects.filter(id__in=shift_ids).update(change_seq=ChangeCounter.allocate())
+
+
+# ----------------------------------------------------------
+# RUOLI (cache codice -> id dei filtri)
+# ----------------------------------------------------------
+@receiver(pre_save, sender="users.UserRole")
+def remember_role_code(sender, instance, **kwargs):
+    instance._previous_code = None
+    if instance.pk:
+        instance._previous_code = (
+            sender.objects.filter(pk=instance.pk).values_list("code", flat=True).first()
+        )
+
+
+@receiver(post_save, sender="users.UserRole")
+def role_saved(sender, instance, **kwargs):
+    forget_roles({instance.code, getattr(instance, "_previous_code", None)})
+
+
+@receiver(post_delete, sender="users.UserRole")
+def role_deleted(sender, instance, **kwargs):
+    forget_roles({instance.code})
+
+
+# ----------------------------------------------------------
+# RICHIESTE DI SOSTITUZIONE (cache e notifiche)
+# ----------------------------------------------------------
+def _bump_request_shift(instance):
+    shift = instance.shift
+    bump_shift(shift.date, shift.role_id)
+
+
+@receiver(post_save, sender=ReplacementRequest)
+def replacement_saved(sender, instance, created, **kwargs):
+    _bump_request_shift(instance)
+    replacement_event("created" if created else "updated", instance, instance.shift.user_id)
+
+
+@receiver(post_delete, sender=ReplacementRequest)
+def replacement_deleted(sender, instance, origin=None, **kwargs):
+    if not changes.is_suspended():
+        bury("replacement", [(instance.id, instance.requester_id), (instance.id, instance.target_user_id)])
+
+    # cancellazione a cascata di un turno: cache e notifiche le gestisce già shift_deleted
+    if isinstance(origin, Shift) or getattr(origin, "model", None) is Shift:
+        return
+    _bump_request_shift(instance)
+    replacement_event("deleted", instance, instance.shift.user_id)
@@ -0,0 +1,754 @@
+import threading
+from contextlib import redirect_stdout
+from io import StringIO
+from unittest import mock
+from datetime import date, time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from users.models import UserRole
+from .cache import role_id_for_code
+from .conflicts import ShiftSlot, find_overlaps
+from .jobs import publish_finished_jobs
+from .models import (
+    CoverageRequirement, Job, ReplacementRequest, Shift, TemplateShift, Tombstone, Unavailability,
+)
+
+User = get_user_model()
+
+
+def make_staff(role, count, prefix="u"):
+    users = User.objects.bulk_create([User(username=f"{prefix}{i}") for i in range(count)])
+    User.roles.through.objects.bulk_create([
+        User.roles.through(user_id=user.id, userrole_id=role.id) for user in users
+    ])
+    return users
+
+
+# ============================================================
+#  LISTA TURNI: numero di query fisso (user-005)
+# ============================================================
+class ShiftListQueryCountTests(TestCase):
+    # versioni della cache (condivise tra processi), turni, sostituzioni accettate
+    LIST_QUERIES = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.role = UserRole.objects.get(code="bagnino")
+        cls.users = make_staff(cls.role, 10)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def _create_shifts(self, count):
+        Shift.objects.bulk_create([
+            Shift(
+                user=self.users[i % len(self.users)],
+                role=self.role,
+                date=date(2025, 3, 1 + i % 28),
+                start_time=time(8 + i // 28),
+                end_time=time(9 + i // 28),
+            )
+            for i in range(count)
+        ])
+
+    def _list(self):
+        with self.assertNumQueries(self.LIST_QUERIES):
+            response = self.client.get("/api/shifts/", {"year": 2025, "month": 3})
+        self.assertEqual(response.status_code, 200)
+        return response.json()["results"]
+
+    def test_one_shift(self):
+        self._create_shifts(1)
+        self.assertEqual(len(self._list()), 1)
+
+    def test_many_shifts(self):
+        self._create_shifts(40)
+        self.assertEqual(len(self._list()), 40)
+
+    def test_accepted_replacements_do_not_add_queries(self):
+        self._create_shifts(20)
+        ReplacementRequest.objects.bulk_create([
+            ReplacementRequest(
+                shift=shift, requester=shift.user, target_user=self.users[0], status="accepted",
+            )
+            for shift in Shift.objects.all()
+        ])
+        self.assertEqual(len(self._list()), 20)
+
+
+# ============================================================
+#  PUBLISH / GENERA MENSILE: query indipendenti dal volume (user-001)
+# ============================================================
+class PublishQueryCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.role = UserRole.objects.get(code="bagnino")
+        cls.users = make_staff(cls.role, 6)
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def _templates(self, count):
+        TemplateShift.objects.bulk_create([
+            TemplateShift(
+                category=self.role,
+                weekday=i % 7,
+                start_time=time(8 + i // 7),
+                end_time=time(9 + i // 7),
+                user=self.users[i % len(self.users)],
+            )
+            for i in range(count)
+        ])
+
+    def _publish_queries(self, weeks):
+        payload = {
+            "category": "bagnino",
+            "weeks": [{"start": start, "end": start} for start in weeks],
+        }
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post("/api/shifts/publish/", payload, format="json")
+        self.assertEqual(response.status_code, 200, response.content)
+        return len(ctx.captured_queries), response.json()
+
+    def test_publish_does_not_scale_with_templates_or_weeks(self):
+        self._templates(1)
+        small, result = self._publish_queries(["2025-03-03"])
+        self.assertEqual(result["created"], 1)
+
+        Shift.objects.all().delete()
+        TemplateShift.objects.all().delete()
+        self._templates(20)
+        large, result = self._publish_queries(["2025-03-10", "2025-03-17", "2025-03-24"])
+        self.assertEqual(result["created"], 20 * 3)
+        self.assertEqual(small, large)
+
+    def test_republish_updates_in_bulk(self):
+        self._templates(14)
+        self._publish_queries(["2025-03-03", "2025-03-10"])
+        TemplateShift.objects.update(end_time=time(20))
+
+        queries, result = self._publish_queries(["2025-03-03", "2025-03-10"])
+        self.assertEqual(result["updated"], 28)
+        self.assertLessEqual(queries, 20)
+
+    def _republish_without_templates(self, count):
+        """Pubblica `count` template, li elimina e ripubblica: query della ripubblicazione."""
+        Shift.objects.all().delete()
+        TemplateShift.objects.all().delete()
+        self._templates(count)
+        self._publish_queries(["2025-03-03"])
+        # le richieste di sostituzione spariscono a cascata con i turni
+        ReplacementRequest.objects.bulk_create([
+            ReplacementRequest(shift=shift, requester=shift.user, target_user=self.users[0])
+            for shift in Shift.objects.all()
+        ])
+        TemplateShift.objects.all().delete()
+        return self._publish_queries(["2025-03-03"])
+
+    def test_republish_deletes_in_bulk(self):
+        small, result = self._republish_without_templates(1)
+        self.assertEqual(result["deleted"], 1)
+        large, result = self._republish_without_templates(20)
+        self.assertEqual(result["deleted"], 20)
+        self.assertEqual(small, large)
+
+        # una tombstone per turno e per destinatario delle richieste, con lo stesso change_seq
+        tombstones = Tombstone.objects.filter(change_seq=Tombstone.objects.order_by("-change_seq")[0].change_seq)
+        self.assertEqual(tombstones.filter(kind="shift").count(), 20)
+        self.assertEqual(tombstones.filter(kind="replacement").count(), 40)
+
+    def test_generate_month_dry_run_writes_nothing(self):
+        self._templates(1)
+        response = self.client.post(
+            "/api/shifts/generate_month/", {"year": 2025, "month": 3, "dry_run": True}, format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["created"], 5)
+        self.assertFalse(Shift.objects.exists())
+
+    def test_generate_month_does_not_scale_with_templates(self):
+        self._templates(1)
+        with CaptureQueriesContext(connection) as small:
+            response = self.client.post("/api/shifts/generate_month/", {"year": 2025, "month": 3}, format="json")
+        self.assertEqual(response.status_code, 200)
+
+        Shift.objects.all().delete()
+        TemplateShift.objects.all().delete()
+        self._templates(20)
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.post("/api/shifts/generate_month/", {"year": 2025, "month": 4}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(response.json()["created"], 80)
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+
+# ============================================================
+#  RIPUBBLICAZIONE CON ORARI CAMBIATI (user-002)
+# ============================================================
+class RepublishRetimedTemplatesTests(TestCase):
+    def setUp(self):
+        self.role = UserRole.objects.get(code="bagnino")
+        self.user = make_staff(self.role, 1)[0]
+        self.client = APIClient()
+
+    def _publish(self):
+        return self.client.post(
+            "/api/shifts/publish/",
+            {"category": "bagnino", "weeks": [{"start": "2025-03-03", "end": "2025-03-09"}]},
+            format="json",
+        )
+
+    def _slots(self):
+        return sorted(Shift.objects.values_list("start_time", "end_time"))
+
+    def test_retimed_onto_an_occupied_slot(self):
+        early, late = TemplateShift.objects.bulk_create([
+            TemplateShift(category=self.role, weekday=0, start_time=time(8), end_time=time(9), user=self.user),
+            TemplateShift(category=self.role, weekday=0, start_time=time(9), end_time=time(10), user=self.user),
+        ])
+        self.assertEqual(self._publish().status_code, 200)
+        kept = Shift.objects.get(start_time=time(9))
+
+        TemplateShift.objects.filter(id=early.id).update(start_time=time(9), end_time=time(10))
+        TemplateShift.objects.filter(id=late.id).update(start_time=time(11), end_time=time(12))
+        response = self._publish()
+
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(self._slots(), [(time(9), time(10)), (time(11), time(12))])
+        # il turno già nello slot giusto resta quello, si sposta solo l'altro
+        self.assertTrue(Shift.objects.filter(id=kept.id, start_time=time(9)).exists())
+        self.assertEqual(response.json()["updated"], 1)
+
+    def test_swapped_slots_are_left_alone(self):
+        TemplateShift.objects.bulk_create([
+            TemplateShift(category=self.role, weekday=0, start_time=time(8), end_time=time(9), user=self.user),
+            TemplateShift(category=self.role, weekday=0, start_time=time(9), end_time=time(10), user=self.user),
+        ])
+        self._publish()
+        TemplateShift.objects.filter(start_time=time(8)).update(start_time=time(7), end_time=time(8))
+        TemplateShift.objects.filter(start_time=time(9)).update(start_time=time(8), end_time=time(9))
+
+        response = self._publish()
+
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(self._slots(), [(time(7), time(8)), (time(8), time(9))])
+
+    def test_slot_taken_concurrently_is_a_conflict(self):
+        TemplateShift.objects.create(category=self.role, weekday=0, start_time=time(8), end_time=time(9), user=self.user)
+        # uno slot occupato tra il calcolo del piano e la scrittura
+        with mock.patch("shifts.views.apply_plan", side_effect=IntegrityError("unique_shift_slot")):
+            response = self._publish()
+        self.assertEqual(response.status_code, 409)
+
+
+# ============================================================
+#  MIGRAZIONE 0016: DUPLICATI (user-002)
+# ============================================================
+class RemoveDuplicateShiftsMigrationTests(TransactionTestCase):
+    before = [("shifts", "0015_convert_role_and_category_to_fk")]
+    after = [("shifts", "0016_shift_unique_slot")]
+
+    def tearDown(self):
+        MigrationExecutor(connection).migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_duplicates_keep_the_shift_with_requests(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.before)
+        apps = executor.loader.project_state(self.before).apps
+        role = apps.get_model("users", "UserRole").objects.get_or_create(code="bagnino", defaults={"label": "Bagnino"})[0]
+        owner, other = (apps.get_model("users", "User").objects.create(username=name) for name in ("a", "b"))
+        # in 0015 lo stato ha ancora role come CharField sulla colonna role_id: turni in SQL
+        with connection.cursor() as cursor:
+            for shift_id in (1, 2, 3):
+                cursor.execute(
+                    "INSERT INTO shifts_shift (id, user_id, role_id, date, start_time, end_time, approved) "
+                    "VALUES (%s, %s, %s, '2025-03-03', '08:00:00', '09:00:00', 0)",
+                    [shift_id, owner.id, role.id],
+                )
+        Request = apps.get_model("shifts", "ReplacementRequest")
+        Request.objects.create(shift_id=2, requester=owner, target_user=other, status="accepted")
+        Request.objects.create(shift_id=3, requester=owner, target_user=other)
+
+        executor = MigrationExecutor(connection)
+        with redirect_stdout(StringIO()) as out:
+            executor.migrate(self.after)
+
+        apps = executor.loader.project_state(self.after).apps
+        self.assertEqual(list(apps.get_model("shifts", "Shift").objects.values_list("id", flat=True)), [2])
+        self.assertEqual(apps.get_model("shifts", "ReplacementRequest").objects.filter(shift_id=2).count(), 2)
+        self.assertIn("tenuto 2, eliminati [1, 3], richieste spostate 1", out.getvalue())
+
+
+# ============================================================
+#  ACCETTAZIONI CONCORRENTI (user-017)
+# ============================================================
+class ConcurrentAcceptTests(TransactionTestCase):
+    def setUp(self):
+        # TransactionTestCase svuota le tabelle: il ruolo della migrazione può mancare
+        self.role, _ = UserRole.objects.get_or_create(code="bagnino", defaults={"label": "Bagnino"})
+        self.owner, self.first, self.second = make_staff(self.role, 3)
+        self.shift = Shift.objects.create(
+            user=self.owner, role=self.role, date=date(2025, 3, 5),
+            start_time=time(8), end_time=time(12),
+        )
+
+    def _accept_concurrently(self, request_ids):
+        barrier = threading.Barrier(len(request_ids))
+        statuses = [None] * len(request_ids)
+
+        def accept(i, request_id):
+            try:
+                barrier.wait()
+                response = APIClient().post(
+                    "/api/shifts/respond_replacement/",
+                    {"request_id": request_id, "action": "accept"},
+                    format="json",
+                )
+                statuses[i] = response.status_code
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=accept, args=(i, r)) for i, r in enumerate(request_ids)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return statuses
+
+    def _request(self, target, **kwargs):
+        return ReplacementRequest.objects.create(
+            shift=self.shift, requester=self.owner, target_user=target, **kwargs
+        )
+
+    def test_same_request_accepted_once(self):
+        req = self._request(self.first)
+
+        statuses = self._accept_concurrently([req.id, req.id])
+
+        self.assertEqual(sorted(statuses), [200, 400])
+        self.assertEqual(Shift.objects.count(), 1)
+        self.shift.refresh_from_db()
+        self.assertEqual(self.shift.user, self.first)
+
+    def test_competing_targets_only_one_wins(self):
+        reqs = [self._request(self.first), self._request(self.second)]
+
+        statuses = self._accept_concurrently([r.id for r in reqs])
+
+        self.assertEqual(sorted(statuses), [200, 400])
+        self.assertEqual(Shift.objects.count(), 1)
+        self.assertEqual(ReplacementRequest.objects.filter(status="accepted").count(), 1)
+        winner = ReplacementRequest.objects.get(status="accepted").target_user
+        self.shift.refresh_from_db()
+        self.assertEqual(self.shift.user, winner)
+
+    def test_competing_partial_splits_create_no_duplicates(self):
+        reqs = [
+            self._request(target, partial=True, partial_start=time(9), partial_end=time(10))
+            for target in (self.first, self.second)
+        ]
+
+        statuses = self._accept_concurrently([r.id for r in reqs])
+
+        self.assertEqual(sorted(statuses), [200, 400])
+        # pezzo accettato + prima e dopo rimasti al titolare
+        self.assertEqual(Shift.objects.count(), 3)
+        self.assertEqual(Shift.objects.filter(user=self.owner).count(), 2)
+
+
+# ============================================================
+#  WORKER DEI JOB (user-004)
+# ============================================================
+class RunJobsCommandTests(TestCase):
+    def setUp(self):
+        role = UserRole.objects.get(code="bagnino")
+        user = make_staff(role, 1)[0]
+        TemplateShift.objects.create(category=role, weekday=0, start_time=time(8), end_time=time(9), user=user)
+
+    def test_submit_only_queues(self):
+        response = APIClient().post(
+            "/api/shifts/generate_month/", {"year": 2025, "month": 3, "background": True}, format="json",
+        )
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(Job.objects.get().status, "queued")
+        self.assertFalse(Shift.objects.exists())
+
+    def test_stale_running_jobs_are_requeued_and_run(self):
+        stale = Job.objects.create(
+            kind="generate_month", status="running", weeks_done=2, payload={"year": 2025, "month": 3},
+        )
+        queued = Job.objects.create(kind="generate_month", payload={"year": 2025, "month": 4})
+
+        call_command("run_jobs", "--once", stdout=StringIO())
+
+        for job in (stale, queued):
+            job.refresh_from_db()
+            self.assertEqual(job.status, "done")
+            self.assertEqual(job.weeks_done, job.weeks_total)
+        self.assertEqual(Shift.objects.count(), 5 + 4)
+
+    def test_calendar_etag_changes_after_worker_run(self):
+        client = APIClient()
+        calendar = {"year": 2025, "month": 3}
+        etag = client.get("/api/shifts/", calendar)["ETag"]
+        response = client.post("/api/shifts/generate_month/", {**calendar, "background": True}, format="json")
+        self.assertEqual(response.status_code, 202)
+
+        # il worker è un altro processo: la sua cache in memoria non è quella del server
+        with mock.patch("shifts.cache.cache", LocMemCache("run_jobs", {})):
+            call_command("run_jobs", "--once", stdout=StringIO())
+
+        response = client.get("/api/shifts/", calendar, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(len(response.json()["results"]), 5)
+
+    def test_finished_jobs_are_published_by_the_server(self):
+        since = timezone.now()
+        Job.objects.create(
+            kind="generate_month", status="done", weeks_done=5,
+            payload={"year": 2025, "month": 2}, finished_at=since,
+        )
+        published = Job.objects.create(
+            kind="publish", status="done", weeks_done=2,
+            payload={"weeks": ["2025-03-10", "2025-03-03"]}, finished_at=since + timedelta(seconds=1),
+        )
+        # fallito prima di scrivere: niente da ricaricare
+        Job.objects.create(
+            kind="generate_month", status="failed",
+            payload={"year": 2025, "month": 4}, finished_at=since + timedelta(seconds=2),
+        )
+
+        with mock.patch("shifts.events.get_broker") as get_broker:
+            self.assertEqual(publish_finished_jobs(since), published.finished_at)
+
+        get_broker.return_value.publish.assert_called_once_with({
+            "type": "shift", "action": "bulk", "users": [],
+            "start": "2025-03-03", "end": "2025-03-16", "job_id": published.id,
+        })
+
+
+# ============================================================
+#  CACHE CODICE RUOLO (user-008)
+# ============================================================
+class RoleCodeCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_unknown_code_is_not_cached(self):
+        self.assertIsNone(role_id_for_code("sub"))
+        with self.captureOnCommitCallbacks(execute=True):
+            role = UserRole.objects.create(code="sub", label="Sub")
+        self.assertEqual(role_id_for_code("sub"), role.id)
+
+    def test_renamed_and_deleted_roles_are_forgotten(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            role = UserRole.objects.create(code="sub", label="Sub")
+        self.assertEqual(role_id_for_code("sub"), role.id)
+
+        role.code = "apnea"
+        with self.captureOnCommitCallbacks(execute=True):
+            role.save()
+        self.assertIsNone(role_id_for_code("sub"))
+        self.assertEqual(role_id_for_code("apnea"), role.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            role.delete()
+        self.assertIsNone(role_id_for_code("apnea"))
+
+
+# ============================================================
+#  TURNI SOVRAPPOSTI (user-020)
+# ============================================================
+class ConflictDetectionTests(TestCase):
+    def setUp(self):
+        self.role = UserRole.objects.get(code="bagnino")
+        self.other_role = UserRole.objects.get(code="segreteria")
+        self.mario, self.luigi = make_staff(self.role, 2)
+        self.client = APIClient()
+
+    def _slot(self, slot_id, user_id, start, end, day=date(2025, 3, 3)):
+        return ShiftSlot(slot_id, user_id, day, time(*start), time(*end))
+
+    def test_sweep_finds_only_real_overlaps(self):
+        slots = [
+            self._slot(1, 1, (8, 0), (10, 0)),
+            self._slot(2, 1, (9, 0), (12, 0)),
+            self._slot(3, 1, (9, 30), (9, 45)),
+            self._slot(4, 1, (12, 0), (13, 0)),          # tocca il 2 senza sovrapporsi
+            self._slot(5, 1, (8, 0), (9, 0), date(2025, 3, 4)),
+            self._slot(6, 2, (8, 0), (12, 0)),           # altro collaboratore
+        ]
+
+        pairs = {frozenset((c.first.id, c.second.id)) for c in find_overlaps(slots)}
+
+        self.assertEqual(pairs, {frozenset((1, 2)), frozenset((1, 3)), frozenset((2, 3))})
+
+    def test_endpoint_reports_saved_overlaps(self):
+        # bulk_create non passa dalla validazione del serializer
+        Shift.objects.bulk_create([
+            Shift(user=self.mario, role=self.role, date=date(2025, 3, 3), start_time=time(8), end_time=time(10)),
+            Shift(user=self.mario, role=self.other_role, date=date(2025, 3, 3), start_time=time(9), end_time=time(11)),
+            Shift(user=self.luigi, role=self.role, date=date(2025, 3, 3), start_time=time(9), end_time=time(11)),
+        ])
+
+        response = self.client.get("/api/shifts/conflicts/", {"year": 2025, "month": 3})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [{
+            "user_id": self.mario.id,
+            "date": "2025-03-03",
+            "shifts": [
+                {"id": Shift.objects.get(role=self.role, user=self.mario).id, "start_time": "08:00", "end_time": "10:00"},
+                {"id": Shift.objects.get(role=self.other_role).id, "start_time": "09:00", "end_time": "11:00"},
+            ],
+        }])
+
+    def test_publish_overlapping_another_role_is_a_conflict(self):
+        Shift.objects.create(
+            user=self.mario, role=self.other_role, date=date(2025, 3, 3), start_time=time(9), end_time=time(11),
+        )
+        TemplateShift.objects.create(category=self.role, weekday=0, start_time=time(8), end_time=time(10), user=self.mario)
+        payload = {"category": "bagnino", "weeks": [{"start": "2025-03-03", "end": "2025-03-09"}]}
+
+        response = self.client.post("/api/shifts/publish/", payload, format="json")
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(len(response.json()["conflicts"]), 1)
+        self.assertEqual(Shift.objects.count(), 1)
+
+        response = self.client.post("/api/shifts/publish/", {**payload, "allow_conflicts": True}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Shift.objects.count(), 2)
+
+    def test_patch_onto_an_overlap_is_rejected(self):
+        first, second = Shift.objects.bulk_create([
+            Shift(user=self.mario, role=self.role, date=date(2025, 3, 3), start_time=time(8), end_time=time(10)),
+            Shift(user=self.mario, role=self.role, date=date(2025, 3, 3), start_time=time(10), end_time=time(12)),
+        ])
+
+        response = self.client.patch(f"/api/shifts/{second.id}/", {"start_time": "09:00"}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("conflicts", response.json())
+
+        response = self.client.patch(f"/api/shifts/{second.id}/", {"start_time": "10:30"}, format="json")
+        self.assertEqual(response.status_code, 200)
+
+
+# ============================================================
+#  COPERTURA AL MINUTO (user-021)
+# ============================================================
+class CoverageTests(TestCase):
+    def setUp(self):
+        self.role = UserRole.objects.get(code="bagnino")
+        self.users = make_staff(self.role, 4)
+        self.client = APIClient()
+
+    def test_template_week_under_and_over(self):
+        CoverageRequirement.objects.create(
+            role=self.role, weekday=0, start_time=time(8), end_time=time(12), min_staff=2, max_staff=3,
+        )
+        TemplateShift.objects.bulk_create([
+            TemplateShift(category=self.role, weekday=0, start_time=start, end_time=end, user=user)
+            for user, (start, end) in zip(self.users, [
+                (time(8), time(10)), (time(9), time(12)), (time(9), time(11)), (time(9, 30), time(10, 30)),
+            ])
+        ] + [
+            # senza collaboratore: non conta come presenza
+            TemplateShift(category=self.role, weekday=0, start_time=time(11), end_time=time(12)),
+        ])
+
+        response = self.client.get("/api/templates/coverage/", {"category": "bagnino"})
+
+        self.assertEqual(response.status_code, 200)
+        gaps = [(g["weekday"], g["start"], g["end"], g["status"], g["staffed"], g["required"]) for g in response.json()]
+        self.assertEqual(gaps, [
+            (0, "08:00", "09:00", "under", 1, 2),
+            (0, "09:30", "10:00", "over", 4, 3),
+            (0, "11:00", "12:00", "under", 1, 2),
+        ])
+
+    def test_period_coverage_uses_the_shifts_of_each_day(self):
+        CoverageRequirement.objects.create(role=self.role, start_time=time(8), end_time=time(9), min_staff=1)
+        Shift.objects.bulk_create([
+            Shift(user=self.users[0], role=self.role, date=date(2025, 3, 3 + i), start_time=time(8), end_time=time(9))
+            for i in range(5)
+        ] + [
+            # copre solo metà fascia la domenica
+            Shift(user=self.users[1], role=self.role, date=date(2025, 3, 9), start_time=time(8, 30), end_time=time(9)),
+        ])
+
+        response = self.client.get("/api/shifts/coverage/", {"week": "2025-W10", "role": "bagnino"})
+
+        self.assertEqual(response.status_code, 200)
+        gaps = [(g["date"], g["start"], g["end"], g["staffed"]) for g in response.json()]
+        self.assertEqual(gaps, [
+            ("2025-03-08", "08:00", "09:00", 0),
+            ("2025-03-09", "08:00", "08:30", 0),
+        ])
+
+    def test_unknown_role_has_no_requirements(self):
+        CoverageRequirement.objects.create(role=self.role, start_time=time(8), end_time=time(9))
+        response = self.client.get("/api/shifts/coverage/", {"week": "2025-W10", "role": "nessuno"})
+        self.assertEqual(response.json(), [])
+
+
+# ============================================================
+#  ASSEGNAZIONE AUTOMATICA DEGLI SLOT LIBERI (user-022)
+# ============================================================
+class AssignmentSolverTests(TestCase):
+    WEEK = "2025-03-03"
+
+    def setUp(self):
+        self.role = UserRole.objects.get(code="bagnino")
+        self.capped, self.free = make_staff(self.role, 2)
+        User.objects.filter(id=self.capped.id).update(max_weekly_hours=4)
+        # tre slot liberi da 4 ore: Lunedì, Martedì, Mercoledì
+        TemplateShift.objects.bulk_create([
+            TemplateShift(category=self.role, weekday=weekday, start_time=time(8), end_time=time(12))
+            for weekday in range(3)
+        ])
+        self.client = APIClient()
+
+    def assign(self):
+        response = self.client.post(
+            "/api/templates/assign/", {"category": "bagnino", "week": self.WEEK, "time_budget": 1}, format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_respects_weekly_hours_and_unavailability(self):
+        Unavailability.objects.create(user=self.free, start_date=date(2025, 3, 3), end_date=date(2025, 3, 3))
+
+        result = self.assign()
+
+        self.assertTrue(result["complete"])
+        self.assertEqual(
+            [(a["date"], a["user"]) for a in result["assignments"]],
+            [("2025-03-03", self.capped.id), ("2025-03-04", self.free.id), ("2025-03-05", self.free.id)],
+        )
+        self.assertEqual(result["unassigned"], [])
+
+    def test_existing_shifts_count_towards_the_limit(self):
+        # 2 ore già in settimana in un altro ruolo (quelli del ruolo li rifà publish):
+        # il collaboratore con limite 4 non ha spazio per uno slot da 4
+        Shift.objects.create(
+            user=self.capped, role=UserRole.objects.get(code="pulizia"), date=date(2025, 3, 7), start_time=time(14), end_time=time(16),
+        )
+        Unavailability.objects.create(
+            user=self.free, start_date=date(2025, 3, 5), end_date=date(2025, 3, 5),
+            start_time=time(11), end_time=time(13),
+        )
+
+        result = self.assign()
+
+        self.assertEqual({a["user"] for a in result["assignments"]}, {self.free.id})
+        self.assertEqual([a["date"] for a in result["assignments"]], ["2025-03-03", "2025-03-04"])
+        self.assertEqual([slot["date"] for slot in result["unassigned"]], ["2025-03-05"])
+
+
+# ============================================================
+#  INDISPONIBILITÀ IN PUBBLICAZIONE (user-023)
+# ============================================================
+class PublishUnavailabilityTests(TestCase):
+    WEEKS = [{"start": "2025-03-03", "end": "2025-03-09"}]
+
+    def setUp(self):
+        self.role = UserRole.objects.get(code="bagnino")
+        (self.user,) = make_staff(self.role, 1)
+        TemplateShift.objects.create(
+            category=self.role, weekday=0, start_time=time(8), end_time=time(12), user=self.user,
+        )
+        self.client = APIClient()
+
+    def publish(self, **extra):
+        return self.client.post(
+            "/api/shifts/publish/", {"category": "bagnino", "weeks": self.WEEKS, **extra}, format="json",
+        )
+
+    def unavailable(self, start, end):
+        # ricorrente il Lunedì, senza scadenza
+        Unavailability.objects.create(
+            user=self.user, start_date=date(2025, 1, 1), weekday=0, start_time=start, end_time=end,
+        )
+
+    def test_overlapping_unavailability_blocks_publish(self):
+        self.unavailable(time(9), time(10))
+
+        response = self.publish()
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["unavailable"], [{
+            "user_id": self.user.id, "date": "2025-03-03", "id": None, "start_time": "08:00", "end_time": "12:00",
+        }])
+        self.assertFalse(Shift.objects.exists())
+
+    def test_allow_conflicts_publishes_anyway(self):
+        self.unavailable(time(9), time(10))
+
+        response = self.publish(allow_conflicts=True)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Shift.objects.filter(user=self.user, date=date(2025, 3, 3)).count(), 1)
+
+    def test_adjacent_unavailability_does_not_block(self):
+        self.unavailable(time(12), time(13))
+
+        self.assertEqual(self.publish().status_code, 200)
+
+
+# ============================================================
+#  FEED INCREMENTALE: ELIMINAZIONI (user-025)
+# ============================================================
+class ChangesFeedDeletionTests(TestCase):
+    def setUp(self):
+        self.role = UserRole.objects.get(code="bagnino")
+        self.requester, self.target = make_staff(self.role, 2)
+        self.shift, self.kept = Shift.objects.bulk_create([
+            Shift(user=self.requester, role=self.role, date=date(2025, 3, 3), start_time=time(8), end_time=time(12)),
+            Shift(user=self.requester, role=self.role, date=date(2025, 3, 4), start_time=time(8), end_time=time(12)),
+        ])
+        self.request = ReplacementRequest.objects.create(
+            shift=self.shift, requester=self.requester, target_user=self.target,
+        )
+        self.client = APIClient()
+        self.cursor = self.client.get("/api/shifts/changes/").json()["cursor"]
+
+    def changes(self, **params):
+        response = self.client.get("/api/shifts/changes/", {"since": self.cursor, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_deleted_shift_and_cascaded_request_are_listed(self):
+        self.assertEqual(self.client.delete(f"/api/shifts/{self.shift.id}/").status_code, 204)
+
+        for user in (None, self.requester, self.target):
+            with self.subTest(user=user and user.username):
+                feed = self.changes(**({"user": user.id} if user else {}))
+                self.assertEqual(feed["deleted"]["replacements"], [self.request.id])
+                if user is not self.target:
+                    self.assertEqual(feed["deleted"]["shifts"], [self.shift.id])
+        self.assertEqual(self.changes()["shifts"], [])
+
+    def test_shifts_removed_by_publish_are_listed(self):
+        # nessun template: la ripubblicazione della settimana elimina entrambi i turni
+        response = self.client.post("/api/shifts/publish/", {
+            "category": "bagnino", "weeks": [{"start": "2025-03-03", "end": "2025-03-09"}],
+        }, format="json")
+        self.assertEqual(response.status_code, 200)
+
+        feed = self.changes(user=self.requester.id)
+        self.assertEqual(feed["deleted"], {
+            "shifts": sorted([self.shift.id, self.kept.id]),
+            "replacements": [self.request.id],
+        })
@@ -1,10 +1,18 @@
 # shifts/urls.py
+from django.urls import path
 from rest_framework.routers import DefaultRouter
-from .views import (ShiftViewSet, TemplateShiftViewSet,)
+from .views import (ShiftViewSet, TemplateShiftViewSet, JobViewSet, CoverageRequirementViewSet,
+                    ShiftPreferenceViewSet, UnavailabilityViewSet, shift_events,)
 
 router = DefaultRouter()
 router.register(r'shifts', ShiftViewSet, basename='shifts')
 router.register(r'templates', TemplateShiftViewSet, basename='templates')
+router.register(r'jobs', JobViewSet, basename='jobs')
+router.register(r'coverage-requirements', CoverageRequirementViewSet, basename='coverage-requirements')
+router.register(r'shift-preferences', ShiftPreferenceViewSet, basename='shift-preferences')
+router.register(r'unavailabilities', UnavailabilityViewSet, basename='unavailabilities')
 
-urlpatterns = []
+urlpatterns = [
+    path('events/', shift_events, name='shift-events'),
+]
 urlpatterns += router.urls
@@ -1,32 +1,26 @@
 import calendar
 import datetime
-from .models import Shift, TemplateShift
+from .expansion import apply_plan, plan_generate
 
-def generate_shifts_from_template(year: int, month: int):
+
+def plan_month(year: int, month: int):
     """
-    Genera automaticamente tutti i turni del mese indicato
-    basandosi sui TemplateShift settimanali.
+    Piano (SchedulePlan) dei turni del mese indicato da generare dai
+    TemplateShift settimanali, senza scrivere sul database (dry-run).
     """
-    templates = TemplateShift.objects.all()
     _, num_days = calendar.monthrange(year, month)
+    return plan_generate(
+        datetime.date(year, month, 1),
+        datetime.date(year, month, num_days),
+    )
+
 
-    created_count = 0
-    for day in range(1, num_days + 1):
-        date = datetime.date(year, month, day)
-        weekday = date.weekday()
+def generate_shifts_from_template(year: int, month: int) -> int:
+    """
+    Genera automaticamente tutti i turni del mese indicato
+    basandosi sui TemplateShift settimanali.
 
-        for t in templates.filter(weekday=weekday):
-            obj, created = Shift.objects.get_or_create(
-                user=t.user,
-                role=t.category,             
-                date=date,
-                start_time=t.start_time,
-                end_time=t.end_time,
-                defaults={
-                    "approved": False,
-                    "course_type": t.course_type, 
-                },
-            )
-            if created:
-                created_count += 1
-    return created_count
+    Usa il motore di espansione condiviso (shifts.expansion) e
+    restituisce il numero di turni creati.
+    """
+    return apply_plan(plan_month(year, month))["created"]
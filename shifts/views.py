@@ -1,12 +1,22 @@
-from datetime import date, timedelta
-from calendar import monthrange
+import asyncio
+import json
+from collections import defaultdict
+from datetime import date, time, timedelta
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action, api_view
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from django.contrib.auth import get_user_model
 from rest_framework.permissions import IsAuthenticated
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
 User = get_user_model()
-from users.serializers import UserListSerializer
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.http import JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from users.models import UserRole
 
@@ -14,40 +24,134 @@ from users.models import UserRole
 
 from rest_framework import generics
 
-from .models import Shift, TemplateShift, ReplacementRequest, PublishedWeek
+from .models import (
+    Shift, TemplateShift, ReplacementRequest, PublishedWeek, Job, CoverageRequirement, ShiftPreference,
+    Unavailability, ChangeCounter,
+)
+from . import events, ledger
+from .expansion import apply_plan, normalize_week_start, plan_publish
+from .assignment import (
+    DEFAULT_TIME_BUDGET, MAX_TIME_BUDGET, assignments_as_dicts, invalid_assignments, parse_assignments,
+    plan_assignments,
+)
+from .cache import bump_shift, cached_response, period_scopes, role_id_for_code, GLOBAL_SCOPE
+from .changes import DEFAULT_LIMIT, MAX_LIMIT, CursorExpired, changes_since, stamp
+from .availability import free_users
+from .conflicts import (
+    conflicts_as_dicts, detect_conflicts, plan_conflicts, plan_unavailable, shift_conflicts, slots_as_dicts,
+)
+from .coverage import shift_coverage, template_coverage
+from .jobs import submit_job, watch_finished_jobs
+from .pagination import ReplacementCursorPagination, ShiftCursorPagination
+from .periods import PeriodError, month_period, parse_period, week_period
+from .projections import month_calendar, week_calendar
+from .utils import generate_shifts_from_template, plan_month
 from .serializers import (
     ShiftSerializer,
     TemplateShiftSerializer,
     ReplacementRequestSerializer,
+    JobSerializer,
+    CoverageRequirementSerializer,
+    ShiftPreferenceSerializer,
+    UnavailabilitySerializer,
 )
 
 
+def _coverage_roles(code):
+    """Filtro ruolo delle scoperture: None = tutti, [] se il codice non esiste."""
+    if not code:
+        return None
+    role_id = role_id_for_code(code)
+    return [role_id] if role_id else []
+
+
+# ============================================================
+#  QUERY DELLE LISTE DI RICHIESTE (anche per explain_queries)
+# ============================================================
+def _replacement_list(**filters):
+    qs = ReplacementRequest.objects.filter(**filters).select_related(
+        "shift", "requester", "target_user", "closed_by"
+    )
+    # shift_date: primo campo di ordinamento di ReplacementCursorPagination
+    return ShiftSerializer.setup_eager_loading(qs, prefix="shift__").annotate(shift_date=F("shift__date"))
+
+
+def sent_requests(user_id, period=None):
+    """Richieste inviate da un utente, eventualmente nel periodo (data del turno)."""
+    qs = _replacement_list(requester_id=user_id)
+    return qs.filter(**period.filter("shift__date")) if period else qs
+
+
+def received_requests(user_id, only_pending=True, period=None):
+    """Richieste ricevute da un utente (di default solo quelle in attesa)."""
+    qs = _replacement_list(target_user_id=user_id)
+    if only_pending:
+        qs = qs.filter(status="pending")
+    return qs.filter(**period.filter("shift__date")) if period else qs
+
+
+# scrittura concorrente su uno slot del piano (unique_shift_slot), vedi apply_plan
+SLOT_TAKEN = "Turni modificati da un'altra operazione nel frattempo: riprovare"
+
+
 # ============================================================
 #  TURNI REALI (quelli effettivi pubblicati)
 # ============================================================
 class ShiftViewSet(viewsets.ModelViewSet):
     """
     Gestisce i turni effettivi dei collaboratori.
-    Permette di filtrare per utente, ruolo, mese e anno.
+    Permette di filtrare per utente, ruolo e periodo (vedi shifts/periods.py).
+    Le liste sono paginate a cursore (next / previous / results).
     """
     queryset = Shift.objects.all()
     serializer_class = ShiftSerializer
     permission_classes = [permissions.AllowAny]  # in futuro: IsAuthenticated
+    pagination_class = ShiftCursorPagination
 
     def get_queryset(self):
-        qs = super().get_queryset()
+        qs = ShiftSerializer.setup_eager_loading(super().get_queryset())
         user_id = self.request.query_params.get('user')
         role = self.request.query_params.get('role')
-        month = self.request.query_params.get('month')
-        year = self.request.query_params.get('year')
+
+        try:
+            period = parse_period(self.request.query_params)
+        except PeriodError as e:
+            raise ValidationError({'error': str(e)})
 
         if user_id:
             qs = qs.filter(user_id=user_id)
         if role:
             qs = qs.filter(role__code=role)  # ✅ Usa lookup FK
-        if month and year:
-            qs = qs.filter(date__month=month, date__year=year)
-        return qs.order_by('date', 'start_time')
+        if period:
+            qs = qs.filter(**period.filter())
+        return qs.order_by('date', 'start_time', 'id')
+
+    def _paginated_requests(self, request, qs):
+        """Pagina a cursore le richieste, dalla data turno più recente."""
+        paginator = ReplacementCursorPagination()
+        page = paginator.paginate_queryset(qs, request, view=self)
+        ser = ReplacementRequestSerializer(page, many=True)
+        return paginator.get_paginated_response(ser.data)
+
+    def list(self, request, *args, **kwargs):
+        """Lista turni servita dalla cache versionata (ETag / 304)."""
+        role = request.query_params.get('role')
+
+        try:
+            period = parse_period(request.query_params)
+        except PeriodError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if period:
+            scopes = period_scopes(period, role_id_for_code(role) if role else None)
+        else:
+            scopes = [GLOBAL_SCOPE]
+
+        return cached_response(
+            request,
+            scopes,
+            lambda: super(ShiftViewSet, self).list(request, *args, **kwargs).data,
+        )
 
     # ----------------------------------------------------------
     # GENERA MENSILE (base, non categoria-specifico)
@@ -56,6 +160,8 @@ class ShiftViewSet(viewsets.ModelViewSet):
     def generate_month(self, request):
         """
         Genera automaticamente i turni reali del mese partendo dai TemplateShift.
+        Con "dry_run": true restituisce il piano senza scrivere,
+        con "background": true accoda un Job e risponde subito 202.
         """
         try:
             year = int(request.data.get('year'))
@@ -63,31 +169,36 @@ class ShiftViewSet(viewsets.ModelViewSet):
         except (TypeError, ValueError):
             return Response({'error': 'Specifica year e month'}, status=status.HTTP_400_BAD_REQUEST)
 
-        days_in_month = monthrange(year, month)[1]
-        created_count = 0
-
-        for day in range(1, days_in_month + 1):
-            current_date = date(year, month, day)
-            weekday = current_date.weekday()  # 0=lun, 6=dom
-            templates = TemplateShift.objects.filter(weekday=weekday)
-
-            for template in templates:
-                # evita duplicati se già generato
-                shift, created = Shift.objects.get_or_create(
-                    user=template.user,
-                    role=template.category,  # ✅ TemplateShift usa 'category', non 'role'
-                    date=current_date,
-                    start_time=template.start_time,
-                    end_time=template.end_time,
-                    defaults={'course_type': template.course_type}
-                )
-                if created:
-                    created_count += 1
+        if not 1 <= month <= 12:
+            return Response({'error': 'Specifica year e month'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if request.data.get('dry_run'):
+            plan = plan_month(year, month)
+            return Response({'dry_run': True, **plan.as_dict()})
+
+        if request.data.get('background'):
+            job = submit_job("generate_month", {"year": year, "month": month}, request.user)
+            return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+        # evita duplicati se già generato (vincolo unique_shift_slot)
+        try:
+            created_count = generate_shifts_from_template(year, month)
+        except IntegrityError:
+            return Response({'error': SLOT_TAKEN}, status=status.HTTP_409_CONFLICT)
 
         return Response({'created': created_count})
 
     @action(detail=False, methods=['post'])
     def publish(self, request):
+        """
+        Pubblica i turni dei template per le settimane indicate.
+        Con "dry_run": true restituisce l'anteprima del diff senza scrivere,
+        con "background": true accoda un Job e risponde subito 202.
+        Se il piano sovrappone turni dello stesso collaboratore o assegna turni
+        in un'indisponibilità risponde 409, a meno di "allow_conflicts": true.
+        "assignments" copre gli slot senza collaboratore con la proposta
+        rivista di /api/templates/assign/.
+        """
         weeks = request.data.get("weeks", [])
         category = request.data.get("category")
 
@@ -104,105 +215,78 @@ class ShiftViewSet(viewsets.ModelViewSet):
             return Response({"error": "Lista 'weeks' mancante o vuota"},
                             status=status.HTTP_400_BAD_REQUEST)
 
-        total_created = 0
-        total_updated = 0
-        total_deleted = 0
         debug_log = []
+        week_starts = []
 
         for week in weeks:
             try:
                 start_date = date.fromisoformat(week["start"])
-                end_date = date.fromisoformat(week["end"])
+                date.fromisoformat(week["end"])
             except Exception:
                 return Response({"error": "Formato data errato"}, status=400)
 
             # Normalizza settimana a Lunedì
-            if start_date.weekday() == 6:
-                normalized = start_date + timedelta(days=1)
-            else:
-                normalized = start_date - timedelta(days=start_date.weekday())
-
-            start_date = normalized
+            start_date = normalize_week_start(start_date)
             end_date = start_date + timedelta(days=6)
 
             debug_log.append(f"Settimana normalizzata: {start_date} → {end_date}")
+            week_starts.append(start_date)
 
-            # Registra settimana come pubblicata
-            # ✅ Usa role invece di category
-            PublishedWeek.objects.get_or_create(
-                role=role,
-                start_date=start_date
-            )
-
-            # Turni esistenti della settimana
-            existing_shifts = Shift.objects.filter(
-                date__range=[start_date, end_date],
-                role=role  # ✅ Usa l'oggetto UserRole già recuperato
-            )
-
-            existing_map = {
-                (s.date, s.user_id, s.role.code): s
-                for s in existing_shifts
-            }
+        allow_conflicts = bool(request.data.get("allow_conflicts"))
 
-            template_keys = set()
-
-            # Genera i turni dai template
-            for i in range(7):
-                current_date = start_date + timedelta(days=i)
-                weekday = current_date.weekday()
+        try:
+            assignments = parse_assignments(request.data.get("assignments", []))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
+
+        invalid = invalid_assignments(role, week_starts, assignments)
+        if invalid:
+            return Response({
+                "error": "assignments non valido",
+                "invalid_assignments": invalid,
+            }, status=400)
+
+        if request.data.get("background"):
+            job = submit_job("publish", {
+                "role_id": role.id,
+                "weeks": [ws.isoformat() for ws in week_starts],
+                "allow_conflicts": allow_conflicts,
+                "assignments": request.data.get("assignments", []),
+            }, request.user)
+            return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+        plan = plan_publish(role, week_starts, assignments)
+        conflicts = conflicts_as_dicts(plan_conflicts(plan))
+        unavailable = slots_as_dicts(plan_unavailable(plan))
+
+        if request.data.get("dry_run"):
+            return Response({
+                "message": "Anteprima pubblicazione",
+                "dry_run": True,
+                **plan.as_dict(),
+                "conflicts": conflicts,
+                "unavailable": unavailable,
+                "debug": debug_log,
+            })
 
-                templates = TemplateShift.objects.filter(
-                    weekday=weekday,
-                    category=role  # ✅ TemplateShift usa 'category'
-                )
+        # validazione: niente turni sovrapposti né in periodi di indisponibilità
+        if (conflicts or unavailable) and not allow_conflicts:
+            return Response({
+                "error": "La pubblicazione crea turni sovrapposti o in periodi di indisponibilità",
+                "conflicts": conflicts,
+                "unavailable": unavailable,
+            }, status=status.HTTP_409_CONFLICT)
 
-                for template in templates:
-                    if not template.user:
-                        continue
-
-                    key = (current_date, template.user_id, template.category.code)  # ✅ Usa .code dalla FK
-                    template_keys.add(key)
-
-                    if key in existing_map:
-                        shift = existing_map[key]
-
-                        # 🔥 CONFRONTO CORRETTO (course_type!)
-                        tpl_course_id = template.course_type_id
-
-                        if (
-                            shift.start_time != template.start_time or
-                            shift.end_time != template.end_time or
-                            shift.course_type_id != tpl_course_id
-                        ):
-                            shift.start_time = template.start_time
-                            shift.end_time = template.end_time
-                            shift.course_type_id = tpl_course_id
-                            shift.save(update_fields=["start_time", "end_time", "course_type"])
-                            total_updated += 1
-
-                    else:
-                        Shift.objects.create(
-                            user=template.user,
-                            role=template.category,  # ✅ TemplateShift.category → Shift.role
-                            date=current_date,
-                            start_time=template.start_time,
-                            end_time=template.end_time,
-                            course_type=template.course_type,
-                        )
-                        total_created += 1
-
-            # Elimina turni non più presenti nei template
-            for key, shift in existing_map.items():
-                if key not in template_keys:
-                    shift.delete()
-                    total_deleted += 1
+        try:
+            result = apply_plan(plan)
+        except IntegrityError:
+            return Response({"error": SLOT_TAKEN}, status=status.HTTP_409_CONFLICT)
 
         return Response({
             "message": "Pubblicazione completata",
-            "created": total_created,
-            "updated": total_updated,
-            "deleted": total_deleted,
+            "created": result["created"],
+            "updated": result["updated"],
+            "deleted": result["deleted"],
             "debug": debug_log,
         })
 
@@ -216,10 +300,17 @@ class ShiftViewSet(viewsets.ModelViewSet):
 
         Body:
         - requester_id (opzionale, per ora utile perché non hai login reale)
-        - target_users: lista di user_id (obbligatoria)
+        - target_users: lista di user_id (obbligatoria se non broadcast)
+        - broadcast: bool (True = tutti i collaboratori del ruolo del turno)
         - partial: bool (True = solo parte turno)
         - partial_start: "HH:MM"
         - partial_end: "HH:MM"
+
+        I destinatari vengono validati con una sola query (devono avere il
+        ruolo del turno ed essere liberi nella parte richiesta, senza turni
+        sovrapposti né indisponibilità) e le richieste create con un unico
+        bulk_create. Chi ha già una richiesta pending sullo stesso turno
+        viene saltato.
         """
         try:
             shift = self.get_object()
@@ -227,51 +318,110 @@ class ShiftViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Turno non trovato'}, status=status.HTTP_404_NOT_FOUND)
 
         # chi sta chiedendo? per ora permettiamo di passare requester_id
-        requester = request.user if request.user and request.user.is_authenticated else None
-        requester_id = request.data.get("requester_id")
-        if requester_id:
-            try:
-                requester = User.objects.get(id=requester_id)
-            except User.DoesNotExist:
+        requester_id = request.user.id if request.user and request.user.is_authenticated else None
+        if request.data.get("requester_id"):
+            requester_id = (
+                User.objects.filter(id=request.data.get("requester_id")).values_list("id", flat=True).first()
+            )
+            if requester_id is None:
                 return Response({'error': 'requester_id non valido'}, status=400)
 
         # fallback estremo: se proprio non abbiamo info, usiamo il titolare del turno
-        if requester is None:
-            requester = shift.user
+        if requester_id is None:
+            requester_id = shift.user_id
 
+        broadcast = bool(request.data.get("broadcast", False))
         target_users = request.data.get("target_users", [])
         partial = bool(request.data.get("partial", False))
-        partial_start = request.data.get("partial_start")
-        partial_end = request.data.get("partial_end")
 
-        if not isinstance(target_users, list) or len(target_users) == 0:
+        if not broadcast and (not isinstance(target_users, list) or len(target_users) == 0):
             return Response({'error': 'Nessun collaboratore selezionato'}, status=400)
 
-        # se partial, voglio entrambe le ore
-        if partial and (not partial_start or not partial_end):
-            return Response({'error': 'Specifica partial_start e partial_end'}, status=400)
+        # se partial, voglio entrambe le ore, dentro il turno
+        partial_start = partial_end = None
+        if partial:
+            try:
+                partial_start = time.fromisoformat(request.data.get("partial_start"))
+                partial_end = time.fromisoformat(request.data.get("partial_end"))
+            except (TypeError, ValueError):
+                return Response({'error': 'Specifica partial_start e partial_end'}, status=400)
+            if not shift.start_time <= partial_start < partial_end <= shift.end_time:
+                return Response({'error': 'Orari parziali fuori dal turno'}, status=400)
+
+        # collaboratori idonei: ruolo del turno e liberi, escluso il titolare e chi chiede
+        eligible = (
+            free_users(
+                shift.role_id,
+                shift.date,
+                partial_start or shift.start_time,
+                partial_end or shift.end_time,
+            )
+            .exclude(id__in=[shift.user_id, requester_id])
+            .exclude(Exists(
+                ReplacementRequest.objects.filter(
+                    shift=shift, status="pending", target_user=OuterRef("pk")
+                )
+            ))
+        )
 
-        created_ids = []
-        for user_id in target_users:
+        if broadcast:
+            target_ids = list(eligible.values_list("id", flat=True))
+        else:
+            try:
+                requested = {int(user_id) for user_id in target_users}
+            except (TypeError, ValueError):
+                return Response({'error': 'target_users non valido'}, status=400)
             # evita di mandare la richiesta a sé stesso
-            if int(user_id) == requester.id:
-                continue
-
-            req = ReplacementRequest.objects.create(
-                shift=shift,
-                requester=requester,
-                target_user_id=user_id,
-                partial=partial,
-                partial_start=partial_start if partial else None,
-                partial_end=partial_end if partial else None,
-                original_start_time=shift.start_time,
-                original_end_time=shift.end_time,
+            requested.discard(requester_id)
+
+            target_ids = list(eligible.filter(id__in=requested).values_list("id", flat=True))
+            invalid = requested - set(target_ids)
+            if invalid:
+                already = set(
+                    ReplacementRequest.objects
+                    .filter(shift=shift, status="pending", target_user_id__in=invalid)
+                    .values_list("target_user_id", flat=True)
+                )
+                invalid -= already | {shift.user_id}
+            busy = set(
+                User.objects
+                .filter(id__in=invalid, roles=shift.role_id, is_active=True)
+                .values_list("id", flat=True)
             )
-            created_ids.append(req.id)
+            if busy:
+                return Response({
+                    'error': 'Collaboratori non disponibili nell\'orario del turno',
+                    'unavailable_users': sorted(busy),
+                }, status=400)
+            if invalid:
+                return Response({
+                    'error': 'Collaboratori non validi per il ruolo del turno',
+                    'invalid_users': sorted(invalid),
+                }, status=400)
+
+        with transaction.atomic():
+            created = ReplacementRequest.objects.bulk_create(stamp(
+                ReplacementRequest(
+                    shift=shift,
+                    requester_id=requester_id,
+                    target_user_id=user_id,
+                    partial=partial,
+                    partial_start=partial_start,
+                    partial_end=partial_end,
+                    original_start_time=shift.start_time,
+                    original_end_time=shift.end_time,
+                )
+                for user_id in sorted(target_ids)
+            ), batch_size=500)
+
+        # bulk_create non invia signal: invalida qui i calendari del mese e avvisa i destinatari
+        if created:
+            bump_shift(shift.date, shift.role_id)
+            events.publish("replacement", "created", users=[requester_id, *target_ids], shift_id=shift.id)
 
         return Response({
             "message": "Richieste inviate",
-            "requests": created_ids
+            "requests": [r.id for r in created]
         }, status=200)
 
     # ----------------------------------------------------------
@@ -291,24 +441,13 @@ class ShiftViewSet(viewsets.ModelViewSet):
 
         if not user_id:
             return Response({'error': 'user_id mancante'}, status=400)
-        
-        year = request.query_params.get("year")
-        month = request.query_params.get("month")
-
-        qs = ReplacementRequest.objects.filter(
-            requester_id=user_id
-        ).select_related("shift", "target_user")
-
-        if year and month:
-            qs = qs.filter(
-                shift__date__year=year,
-                shift__date__month=month
-            )
 
-        qs = qs.order_by("-shift__date")
+        try:
+            period = parse_period(request.query_params)
+        except PeriodError as e:
+            return Response({'error': str(e)}, status=400)
 
-        ser = ReplacementRequestSerializer(qs, many=True)
-        return Response(ser.data, status=200)
+        return self._paginated_requests(request, sent_requests(user_id, period))
 
     # ----------------------------------------------------------
     # RICHIESTE RICEVUTE (per collaboratore)
@@ -318,26 +457,12 @@ class ShiftViewSet(viewsets.ModelViewSet):
         user_id = request.query_params.get("user_id")
         only_pending = request.query_params.get("only_pending", "true") == "true"
 
-        year = request.query_params.get("year")
-        month = request.query_params.get("month")
-
-        qs = ReplacementRequest.objects.filter(
-            target_user_id=user_id
-        ).select_related("shift")
-
-        if only_pending:
-            qs = qs.filter(status="pending")
-
-        if year and month:
-            qs = qs.filter(
-                shift__date__year=year,
-                shift__date__month=month
-            )
-
-        qs = qs.order_by("-shift__date")
+        try:
+            period = parse_period(request.query_params)
+        except PeriodError as e:
+            return Response({'error': str(e)}, status=400)
 
-        ser = ReplacementRequestSerializer(qs, many=True)
-        return Response(ser.data)
+        return self._paginated_requests(request, received_requests(user_id, only_pending, period))
 
 
     # ----------------------------------------------------------
@@ -345,6 +470,14 @@ class ShiftViewSet(viewsets.ModelViewSet):
     # ----------------------------------------------------------
     @action(detail=False, methods=['post'])
     def respond_replacement(self, request):
+        """
+        Accetta o rifiuta una richiesta di sostituzione.
+
+        Tutto il flusso gira in una transazione con il turno e le sue
+        richieste bloccati (select_for_update): due accettazioni simultanee
+        vengono serializzate e solo la prima trova la richiesta "pending".
+        Annullamenti e ricollegamenti sono update set-based.
+        """
         req_id = request.data.get("request_id")
         action = request.data.get("action")
 
@@ -352,31 +485,89 @@ class ShiftViewSet(viewsets.ModelViewSet):
             return Response({'error': 'request_id o action non validi'}, status=400)
 
         try:
-            req = ReplacementRequest.objects.select_related(
-                "shift", "target_user", "requester"
-            ).get(id=req_id)
-        except ReplacementRequest.DoesNotExist:
+            req_id = int(req_id)
+        except (TypeError, ValueError):
+            return Response({'error': 'request_id o action non validi'}, status=400)
+
+        shift_id = ReplacementRequest.objects.filter(id=req_id).values_list("shift_id", flat=True).first()
+        if shift_id is None:
             return Response({'error': 'Richiesta non trovata'}, status=404)
 
-        if req.status != 'pending':
-            return Response({'error': 'Richiesta già gestita'}, status=400)
+        with transaction.atomic():
+            # lock: prima il turno, poi tutte le sue richieste (ordine fisso)
+            shift = Shift.objects.select_for_update().filter(id=shift_id).first()
+            if shift is None:
+                return Response({'error': 'Richiesta non trovata'}, status=404)
 
-        shift = req.shift
-        requester = req.requester
-        sostituto = req.target_user
+            shift_requests = list(
+                ReplacementRequest.objects.select_for_update().filter(shift_id=shift_id).order_by("id")
+            )
+            req = next((r for r in shift_requests if r.id == req_id), None)
+            if req is None:
+                # ricollegata a un altro turno da uno split concorrente
+                return Response({'error': 'Richiesta modificata, riprovare'}, status=409)
+
+            if req.status != 'pending':
+                return Response({'error': 'Richiesta già gestita'}, status=400)
+            req.shift = shift
+
+            if action == "reject":
+                req.status = 'rejected'
+                req.save(update_fields=["status"])
+                return Response({'message': 'Richiesta rifiutata'}, status=200)
+
+            response = self._accept_replacement(req, shift, shift_requests)
+            if response.status_code == 200:
+                # annullamenti e ricollegamenti sono update senza signal
+                events.publish(
+                    "replacement", "updated",
+                    users=[u for r in shift_requests for u in (r.requester_id, r.target_user_id)],
+                    shift_id=shift.id,
+                )
+            return response
+
+    def _accept_replacement(self, req, shift, shift_requests):
+        """Accettazione (totale o parziale) con turno e richieste già bloccati."""
+        sostituto_id = req.target_user_id
+        now = timezone.now()
+        others = [r for r in shift_requests if r.id != req.id]
+
+        def cancel(requests):
+            ids = [r.id for r in requests if r.status == 'pending']
+            if ids:
+                ReplacementRequest.objects.filter(id__in=ids).update(
+                    status='cancelled',
+                    closed_by_id=sostituto_id,     # chi ha accettato
+                    updated_at=now,
+                    change_seq=ChangeCounter.allocate(),
+                )
 
         orig_start = shift.start_time
         orig_end = shift.end_time
         part_start = req.partial_start
         part_end = req.partial_end
 
-        # -----------------------------------------------------
-        # 🔴 RIFIUTA
-        # -----------------------------------------------------
-        if action == "reject":
-            req.status = 'rejected'
-            req.save(update_fields=["status"])
-            return Response({'message': 'Richiesta rifiutata'}, status=200)
+        # 🔥 RICHIESTA ACCETTATA PRECEDENTE DELLO SHIFT ORIGINALE
+        previous_req = next((
+            r for r in reversed(others)
+            if r.status == "accepted" and
+            r.original_start_time == orig_start and
+            r.original_end_time == orig_end
+        ), None)
+
+        # il sostituto non deve avere turni sovrapposti alla parte accettata
+        overlapping = shift_conflicts(
+            sostituto_id,
+            shift.date,
+            part_start if req.partial else orig_start,
+            part_end if req.partial else orig_end,
+            exclude_ids=[shift.id],
+        )
+        if overlapping:
+            return Response({
+                'error': 'Il sostituto ha già un turno sovrapposto',
+                'conflicts': [shift_id for shift_id, _, _ in overlapping],
+            }, status=status.HTTP_409_CONFLICT)
 
         # -----------------------------------------------------
         # 🟢 ACCETTA
@@ -385,10 +576,10 @@ class ShiftViewSet(viewsets.ModelViewSet):
 
         # 🔥 SALVA ORARI ORIGINALI SOLO NELLA REQUEST
         if req.original_start_time is None:
-            req.original_start_time = shift.start_time
+            req.original_start_time = orig_start
 
         if req.original_end_time is None:
-            req.original_end_time = shift.end_time
+            req.original_end_time = orig_end
 
         req.save(update_fields=[
             "status",
@@ -400,160 +591,111 @@ class ShiftViewSet(viewsets.ModelViewSet):
         # 🔵 SOSTITUZIONE TOTALE
         # -----------------------------------------------------
         if not req.partial:
-
             # Aggiorna turno reale → passa al sostituto
-            shift.user = sostituto
+            shift.user_id = sostituto_id
             shift.save(update_fields=["user"])
 
             # Le altre richieste pending → CANCELLED
-            other_requests = ReplacementRequest.objects.filter(
-                shift=shift
-            ).exclude(id=req.id)
-
-            other_requests.filter(status='pending').update(
-                status='cancelled',
-                closed_by=sostituto,     # chi ha accettato
-                updated_at=timezone.now()
-            )
-
-
+            cancel(others)
             return Response({'message': 'Sostituzione totale accettata'}, status=200)
 
         # -----------------------------------------------------
         # 🟣 SOSTITUZIONE PARZIALE (SPLIT)
         # -----------------------------------------------------
+        overlapping, non_overlapping, total_reqs = [], [], []
+        for other in others:
+            if not other.partial:
+                total_reqs.append(other)
+            elif other.partial_start < part_end and other.partial_end > part_start:
+                overlapping.append(other)
+            else:
+                non_overlapping.append(other)
 
-        # 1) altre richieste sul turno
-        other_reqs = ReplacementRequest.objects.filter(shift=shift).exclude(id=req.id)
-
-        # 2) parziali / totali
-        partial_reqs = other_reqs.filter(partial=True)
-        total_reqs = other_reqs.filter(partial=False)
-
-        # 3) sovrapposte alla richiesta accettata
-        overlapping = partial_reqs.filter(
-            partial_start__lt=part_end,
-            partial_end__gt=part_start,
-        )
-        non_overlapping = partial_reqs.exclude(id__in=overlapping.values("id"))
-
-        # 4 e 5
-        overlapping.filter(status='pending').update(
-            status='cancelled',
-            closed_by=sostituto,
-            updated_at=timezone.now()
-        )
-
-        total_reqs.filter(status='pending').update(
-            status='cancelled',
-            closed_by=sostituto,
-            updated_at=timezone.now()
-        )
-
-
-        # 6) Crea segmenti
-        new_requester_shifts = []
-
-        # 🔥 RICHIESTA ACCETTATA PRECEDENTE DELLO SHIFT ORIGINALE
-        previous_req = ReplacementRequest.objects.filter(
-            shift=shift,
-            status="accepted",
-            original_start_time=shift.start_time,
-            original_end_time=shift.end_time
-        ).exclude(id=req.id).order_by("-id").first()
-
-
-
-        def clone_previous_replacement(new_shift):
-            """
-            🔥 Clona la vecchia richiesta accettata sul nuovo shift,
-            SOLO se il vecchio turno era già una sostituzione totale.
-            """
-            if not previous_req:
-                return
-
-            # Creo una copia 1:1 della richiesta precedente
-            ReplacementRequest.objects.create(
-                shift=new_shift,
-                requester=previous_req.requester,
-                target_user=previous_req.target_user,
-                partial=previous_req.partial,
-                partial_start=previous_req.partial_start,
-                partial_end=previous_req.partial_end,
-                original_start_time=previous_req.original_start_time,
-                original_end_time=previous_req.original_end_time,
-                status="accepted"
-            )
-
-
-        def create_shift(user, start, end):
-            s = Shift.objects.create(
-                user=user,
-                role=shift.role,
-                date=shift.date,
-                start_time=start,
-                end_time=end,
-                approved=shift.approved,
-                course_type=shift.course_type,
-            )
-
-            # ⭐ Se il pezzo appartiene al sostituto, eredita la vecchia sostituzione
-            if previous_req and user == previous_req.target_user:
-                clone_previous_replacement(s)
-
-            if user == requester:
-                new_requester_shifts.append(s)
-
-            return s
-
+        cancel(overlapping + total_reqs)
 
         # ⭐ SALVA IL PEZZO ACCETTATO DAL NUOVO SOSTITUTO
-        shift_original_user = shift.user  # chi era prima del nuovo split
-
-        # Caso 1 — parte iniziale
-        if part_start == orig_start and part_end < orig_end:
-            shift.user = sostituto
-            shift.start_time = part_start
-            shift.end_time = part_end
-            shift.save(update_fields=["user", "start_time", "end_time"])
-
-            create_shift(shift_original_user, part_end, orig_end)
-
-        # Caso 2 — parte finale
-        elif part_start > orig_start and part_end == orig_end:
-            shift.user = sostituto
+        shift_original_user_id = shift.user_id  # chi era prima del nuovo split
+
+        # pezzi rimasti al titolare (prima e/o dopo la parte accettata)
+        segments = []
+        if part_start > orig_start:
+            segments.append((orig_start, part_start))
+        if part_end < orig_end:
+            segments.append((part_end, orig_end))
+
+        # registro ore: un solo aggiornamento per tutto lo split
+        deltas = ledger.new_deltas()
+        ledger.add_delta(deltas, shift_original_user_id, shift.date, shift.role_id,
+                         shift.course_type_id, orig_start, orig_end, sign=-1)
+        ledger.add_delta(deltas, sostituto_id, shift.date, shift.role_id,
+                         shift.course_type_id, part_start, part_end)
+        for start, end in segments:
+            ledger.add_delta(deltas, shift_original_user_id, shift.date, shift.role_id,
+                             shift.course_type_id, start, end)
+
+        with ledger.suspended():
+            shift.user_id = sostituto_id
             shift.start_time = part_start
             shift.end_time = part_end
             shift.save(update_fields=["user", "start_time", "end_time"])
 
-            create_shift(shift_original_user, orig_start, part_start)
-
-        # Caso 3 — parte interna
-        else:
-            shift.user = sostituto
-            shift.start_time = part_start
-            shift.end_time = part_end
-            shift.save(update_fields=["user", "start_time", "end_time"])
+            new_shifts = Shift.objects.bulk_create(stamp(
+                Shift(
+                    user_id=shift_original_user_id,
+                    role_id=shift.role_id,
+                    date=shift.date,
+                    start_time=start,
+                    end_time=end,
+                    approved=shift.approved,
+                    course_type_id=shift.course_type_id,
+                )
+                for start, end in segments
+            ))
+        ledger.apply_deltas(deltas)
 
-            create_shift(shift_original_user, orig_start, part_start)
-            create_shift(shift_original_user, part_end, orig_end)
+        new_requester_shifts = []
+        clones = []
+        for s in new_shifts:
+            # ⭐ Se il pezzo appartiene al sostituto, eredita la vecchia sostituzione
+            if previous_req and shift_original_user_id == previous_req.target_user_id:
+                clones.append(ReplacementRequest(
+                    shift=s,
+                    requester_id=previous_req.requester_id,
+                    target_user_id=previous_req.target_user_id,
+                    partial=previous_req.partial,
+                    partial_start=previous_req.partial_start,
+                    partial_end=previous_req.partial_end,
+                    original_start_time=previous_req.original_start_time,
+                    original_end_time=previous_req.original_end_time,
+                    status="accepted"
+                ))
+
+            if shift_original_user_id == req.requester_id:
+                new_requester_shifts.append(s)
 
-        # 7) Ricollega richieste non sovrapposte
-        for other in non_overlapping.filter(status='pending'):
-            target_shift = None
-            for s in new_requester_shifts:
-                if s.start_time <= other.partial_start and s.end_time >= other.partial_end:
-                    target_shift = s
-                    break
+        if clones:
+            ReplacementRequest.objects.bulk_create(stamp(clones))
 
+        # Ricollega le richieste non sovrapposte al pezzo che le contiene
+        relink = defaultdict(list)
+        orphans = []
+        for other in non_overlapping:
+            if other.status != 'pending':
+                continue
+            target_shift = next((
+                s for s in new_requester_shifts
+                if s.start_time <= other.partial_start and s.end_time >= other.partial_end
+            ), None)
             if target_shift:
-                other.shift = target_shift
-                other.save(update_fields=["shift"])
+                relink[target_shift.id].append(other.id)
             else:
-                other.status = 'cancelled'
-                other.closed_by = sostituto
-                other.save(update_fields=["status", "closed_by"])
+                orphans.append(other)
 
+        for target_shift_id, ids in relink.items():
+            ReplacementRequest.objects.filter(id__in=ids).update(
+                shift_id=target_shift_id, updated_at=now, change_seq=ChangeCounter.allocate()
+            )
+        cancel(orphans)
 
         return Response({'message': 'Sostituzione parziale accettata'}, status=200)
 
@@ -568,59 +710,19 @@ class ShiftViewSet(viewsets.ModelViewSet):
         Restituisce tutti i turni reali della settimana,
         includendo informazioni su eventuali sostituzioni.
         """
-        start_str = request.query_params.get("start_date")
-        if not start_str:
+        if not request.query_params.get("start_date") and not request.query_params.get("week"):
             return Response({'error': 'start_date mancante'}, status=400)
 
         try:
-            start_date = date.fromisoformat(start_str)
-        except ValueError:
-            return Response({'error': 'start_date non valido'}, status=400)
-
-        end_date = start_date + timedelta(days=6)
-
-        shifts = Shift.objects.filter(
-            date__range=[start_date, end_date]
-        ).select_related("user")
-
-        # Recupera eventuali richieste accettate per ogni turno
-        accepted_reqs = (
-            ReplacementRequest.objects
-            .filter(shift__in=shifts, status="accepted")
-            .select_related("requester", "target_user", "shift")
+            period = parse_period(request.query_params, required=True)
+        except PeriodError as e:
+            return Response({'error': str(e)}, status=400)
+
+        return cached_response(
+            request,
+            period_scopes(period),
+            lambda: week_calendar(period),
         )
-
-        rep_map = {}
-        for r in accepted_reqs:
-            rep_map[r.shift_id] = {
-                "accepted": True,
-                "partial": r.partial,
-                "requester_id": r.requester_id,
-                "accepted_by_id": r.target_user_id,
-                "accepted_by_username": r.target_user.username,
-                "partial_start": r.partial_start,
-                "partial_end": r.partial_end,
-            }
-
-        data = []
-        for s in shifts:
-            data.append({
-                "id": s.id,
-                "date": str(s.date),
-                "role": s.role.code,
-                "start_time": s.start_time.strftime("%H:%M"),
-                "end_time": s.end_time.strftime("%H:%M"),
-                "user_id": s.user.id if s.user else None,
-                "user": {
-                    "id": s.user.id,
-                    "username": s.user.username
-                } if s.user else None,
-
-                # INFO sostituzione (se presente)
-                "replacement_info": rep_map.get(s.id, {"accepted": False}),
-            })
-
-        return Response(data, status=200)
     
     @action(detail=False, methods=['get'])
     def get_month_shifts(self, request):
@@ -631,30 +733,15 @@ class ShiftViewSet(viewsets.ModelViewSet):
         - month (int)
         """
         try:
-            year = int(request.query_params.get("year"))
-            month = int(request.query_params.get("month"))
-        except:
+            period = month_period(request.query_params.get("year"), request.query_params.get("month"))
+        except PeriodError:
             return Response({'error': 'Specificare year e month'}, status=400)
 
-        shifts = Shift.objects.filter(
-            date__year=year,
-            date__month=month
-        ).select_related("user")
-
-        data = [
-            {
-                "id": s.id,
-                "title": s.user.username if s.user else "—",
-                "role": s.role.code,
-                "date": str(s.date),
-                "start_time": s.start_time.strftime("%H:%M"),
-                "end_time": s.end_time.strftime("%H:%M"),
-                "user_id": s.user.id if s.user else None,
-            }
-            for s in shifts
-        ]
-
-        return Response(data, status=200)
+        return cached_response(
+            request,
+            period_scopes(period),
+            lambda: month_calendar(period),
+        )
     
     @action(detail=False, methods=['get'])
     def published_weeks(self, request):
@@ -669,23 +756,16 @@ class ShiftViewSet(viewsets.ModelViewSet):
         if not category:
             return Response({"error": "category richiesta"}, status=400)
 
-        # ✅ Converti year e month in interi
         try:
-            year = int(year)
-            month = int(month)
-        except (TypeError, ValueError):
-            return Response({"error": "year e month devono essere numeri"}, status=400)
+            period = month_period(year, month)
+        except PeriodError as e:
+            return Response({"error": str(e)}, status=400)
 
-        first = date(year, month, 1)  # ✅ Ora funziona!
-        last = date(year, month, monthrange(year, month)[1])
-
-        search_start = first - timedelta(days=7)
-        search_end = last + timedelta(days=7)
-
-        
+        # settimane a cavallo dei mesi adiacenti
         weeks = PublishedWeek.objects.filter(
             role__code=category,  # ✅ Cambiato
-            start_date__range=[search_start, search_end]
+            start_date__gte=period.start - timedelta(days=7),
+            start_date__lt=period.end + timedelta(days=7),
         ).values_list("start_date", flat=True)
 
         return Response({
@@ -693,19 +773,118 @@ class ShiftViewSet(viewsets.ModelViewSet):
         })
     
 
+    @action(detail=False, methods=['get'])
+    def conflicts(self, request):
+        """
+        GET /api/shifts/conflicts/?year=2025&month=3[&user=12]
+        Turni sovrapposti dello stesso collaboratore nel periodo
+        (periodi come in shifts/periods.py).
+        """
+        try:
+            period = parse_period(request.query_params, required=True)
+        except PeriodError as e:
+            return Response({'error': str(e)}, status=400)
+
+        user_ids = None
+        if request.query_params.get("user"):
+            try:
+                user_ids = [int(request.query_params["user"])]
+            except ValueError:
+                return Response({'error': 'user non valido'}, status=400)
+
+        return Response(conflicts_as_dicts(detect_conflicts(period, user_ids)))
+
+    @action(detail=False, methods=['get'])
+    def coverage(self, request):
+        """
+        GET /api/shifts/coverage/?week=2025-W10[&role=bagnino]
+        Intervalli sotto o sopra le presenze richieste (CoverageRequirement)
+        nei turni effettivi del periodo.
+        """
+        try:
+            period = parse_period(request.query_params, required=True)
+        except PeriodError as e:
+            return Response({'error': str(e)}, status=400)
+
+        return Response(shift_coverage(period, _coverage_roles(request.query_params.get('role'))))
+
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """
+        GET /api/shifts/changes/?since=<cursor>[&user=12][&limit=500]
+        Turni e richieste di sostituzione modificati dopo il cursore, più
+        gli id eliminati (vedi shifts/changes.py). Senza since restituisce
+        solo il cursore corrente. Con "more": true si richiama subito con
+        il nuovo cursore; 410 se il cursore è scaduto (ricaricare tutto).
+        """
+        params = request.query_params
+        try:
+            since = int(params["since"]) if params.get("since") else None
+            user_id = int(params["user"]) if params.get("user") else None
+            limit = min(int(params.get("limit", DEFAULT_LIMIT)), MAX_LIMIT)
+        except ValueError:
+            return Response({'error': 'since, user e limit devono essere interi'}, status=400)
+        if (since is not None and since < 0) or limit < 1:
+            return Response({'error': 'since o limit non validi'}, status=400)
+
+        try:
+            changes = changes_since(since, user_id, limit)
+        except CursorExpired as e:
+            return Response({'error': str(e), 'cursor': e.cursor}, status=status.HTTP_410_GONE)
+
+        return Response({
+            "cursor": changes.cursor,
+            "more": changes.more,
+            "shifts": ShiftSerializer(changes.shifts, many=True).data,
+            "replacements": ReplacementRequestSerializer(changes.replacements, many=True).data,
+            "deleted": changes.deleted,
+        })
+
     @action(detail=True, methods=["get"], permission_classes=[IsAuthenticated])
     def available_collaborators(self, request, pk=None):
-        shift = self.get_object()
-        role_code = shift.role.code  # ✅ Estrai il code dalla FK
+        """
+        Collaboratori del ruolo del turno che possono sostituire:
+        esclusi quelli con un turno sovrapposto nello stesso giorno
+        (start < altro.end e end > altro.start) o un'indisponibilità
+        dichiarata, ordinati per ore già in calendario nella settimana.
+        Una sola query oltre al turno.
+        """
+        shift = get_object_or_404(Shift, pk=pk)
+        week = week_period(shift.date - timedelta(days=shift.date.weekday()))
+
+        week_minutes = (
+            Shift.objects
+            .filter(user=OuterRef("pk"), **week.filter())
+            .values("user")
+            .annotate(total=Sum(ledger.shift_minutes()))
+            .values("total")
+        )
 
         users = (
-            User.objects
-            .filter(roles__code=role_code)  # ✅ Ora passa la stringa code
+            free_users(shift.role_id, shift.date, shift.start_time, shift.end_time)
             .exclude(id=shift.user_id)
+            .annotate(week_minutes=Coalesce(Subquery(week_minutes), 0))
+            .order_by("week_minutes", "username")
+            .values("id", "username", "first_name", "last_name", "week_minutes")
         )
 
-        serializer = UserListSerializer(users, many=True)
-        return Response(serializer.data)
+        return Response([
+            {**u, "week_hours": round(u["week_minutes"] / 60, 2)}
+            for u in users
+        ])
+
+
+# ============================================================
+#  JOB IN BACKGROUND (publish / generate_month)
+# ============================================================
+class JobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Stato e avanzamento dei job in background.
+    GET /api/jobs/<id>/ per il polling.
+    """
+    queryset = Job.objects.all()
+    serializer_class = JobSerializer
+    permission_classes = [permissions.AllowAny]
 
 
 # ============================================================
@@ -723,6 +902,156 @@ class TemplateShiftViewSet(viewsets.ModelViewSet):
             qs = qs.filter(category__code=category_code)  # ✅ Usa lookup FK
         return qs.order_by('weekday', 'start_time')
 
+    @action(detail=False, methods=['get'])
+    def coverage(self, request):
+        """
+        GET /api/templates/coverage/?category=bagnino
+        Scoperture della settimana tipo rispetto alle presenze richieste.
+        """
+        return Response(template_coverage(_coverage_roles(request.query_params.get('category'))))
 
+    @action(detail=False, methods=['post'])
+    def assign(self, request):
+        """
+        POST /api/templates/assign/ {"category": "bagnino", "week": "2025-03-03"}
+        Proposta di assegnazione degli slot senza collaboratore della settimana
+        (nessuna scrittura): va rivista e passata a publish in "assignments".
+        "time_budget" (secondi, default 0.5) limita la ricerca.
+        """
+        try:
+            role = UserRole.objects.get(code=request.data.get("category"))
+        except UserRole.DoesNotExist:
+            return Response({"error": "Ruolo non trovato"}, status=400)
+
+        try:
+            week_start = normalize_week_start(date.fromisoformat(request.data.get("week")))
+        except (TypeError, ValueError):
+            return Response({"error": "week non valido (YYYY-MM-DD)"}, status=400)
+
+        try:
+            time_budget = float(request.data.get("time_budget", DEFAULT_TIME_BUDGET))
+        except (TypeError, ValueError):
+            return Response({"error": "time_budget non valido"}, status=400)
+        time_budget = min(max(time_budget, 0.01), MAX_TIME_BUDGET)
 
+        result = plan_assignments(role, week_start, time_budget)
+        return Response({"week": str(week_start), **assignments_as_dicts(result)})
+
+
+# ============================================================
+#  COPERTURE RICHIESTE (presenze minime / massime per fascia)
+# ============================================================
+class CoverageRequirementViewSet(viewsets.ModelViewSet):
+    queryset = CoverageRequirement.objects.all()
+    serializer_class = CoverageRequirementSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        role_code = self.request.query_params.get('role')
+        if role_code:
+            qs = qs.filter(role__code=role_code)
+        return qs.order_by('role', 'weekday', 'start_time')
 
+
+# ============================================================
+#  DICHIARAZIONI DEI COLLABORATORI (preferenze, indisponibilità)
+# ============================================================
+class OwnRecordsMixin:
+    """
+    Lo staff vede e modifica i record di tutti (filtro ?user=),
+    gli altri solo i propri; user è impostato dal login se non indicato.
+    """
+    permission_classes = [IsAuthenticated]
+    ordering = ()
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        if not self.request.user.is_staff:
+            qs = qs.filter(user=self.request.user)
+        elif self.request.query_params.get('user'):
+            qs = qs.filter(user_id=self.request.query_params['user'])
+        return qs.order_by(*self.ordering)
+
+    def perform_create(self, serializer):
+        if self.request.user.is_staff and serializer.validated_data.get("user"):
+            serializer.save()
+        else:
+            serializer.save(user=self.request.user)
+
+    def perform_update(self, serializer):
+        if self.request.user.is_staff:
+            serializer.save()
+        else:
+            serializer.save(user=self.request.user)
+
+
+class ShiftPreferenceViewSet(OwnRecordsMixin, viewsets.ModelViewSet):
+    """Preferenze usate dall'assegnazione automatica degli slot liberi."""
+    queryset = ShiftPreference.objects.all()
+    serializer_class = ShiftPreferenceSerializer
+    ordering = ('user', 'weekday', 'start_time')
+
+
+class UnavailabilityViewSet(OwnRecordsMixin, viewsets.ModelViewSet):
+    """Periodi in cui il collaboratore non può lavorare."""
+    queryset = Unavailability.objects.all()
+    serializer_class = UnavailabilitySerializer
+    ordering = ('user', 'start_date', 'start_time')
+
+
+# ============================================================
+#  NOTIFICHE PUSH (Server-Sent Events)
+# ============================================================
+SSE_KEEPALIVE = 25
+
+
+async def _sse_user(request):
+    """Utente del token JWT (header Authorization o ?token=, EventSource non manda header)."""
+    token = request.GET.get("token")
+    header = request.headers.get("Authorization", "")
+    if not token and header.startswith("Bearer "):
+        token = header[len("Bearer "):]
+    if not token:
+        return None
+    try:
+        user_id = AccessToken(token)[api_settings.USER_ID_CLAIM]
+    except TokenError:
+        return None
+    return await User.objects.filter(id=user_id, is_active=True).only("id", "is_staff").afirst()
+
+
+async def shift_events(request):
+    """
+    GET /api/events/?token=<access>
+    Stream SSE degli eventi di turni e richieste che riguardano l'utente
+    (tutti per lo staff). Una sola query alla connessione, poi nessuna:
+    il client ricarica i dati quando riceve un evento.
+    Richiede un server ASGI (es. uvicorn core.asgi:application).
+    """
+    user = await _sse_user(request)
+    if user is None:
+        return JsonResponse({"detail": "Token mancante o non valido"}, status=401)
+
+    # le modifiche del worker run_jobs (altro processo) arrivano da qui
+    watch_finished_jobs()
+    broker = events.get_broker()
+    subscription = broker.subscribe(user.id, everything=user.is_staff)
+
+    async def stream():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.get(), SSE_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            broker.unsubscribe(subscription)
+
+    response = StreamingHttpResponse(stream(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
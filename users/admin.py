@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import User, UserRole
+from .models import User, UserRole, PayrollClose, Payslip
 
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
@@ -11,3 +11,15 @@ class UserAdmin(admin.ModelAdmin):
 class UserRoleAdmin(admin.ModelAdmin):
     list_display = ("code", "label")
     search_fields = ("code", "label")
+
+@admin.register(PayrollClose)
+class PayrollCloseAdmin(admin.ModelAdmin):
+    list_display = ("year", "month", "closed_by", "closed_at")
+    list_filter = ("year",)
+
+@admin.register(Payslip)
+class PayslipAdmin(admin.ModelAdmin):
+    list_display = ("username", "year", "month", "total", "contabilita_check")
+    list_filter = ("year", "month")
+    search_fields = ("username",)
+    readonly_fields = ("close", "user", "contabilita_check", "year", "month", "username", "lines", "total")
@@ -3,9 +3,15 @@ from django.urls import path
 from .views import (
     MyContabilitaChecksView,
     ToggleContabilitaCheckView,
+    PayrollView,
+    ExportPayrollView,
+    PayrollCloseView,
 )
 
 urlpatterns = [
     path("checks/", MyContabilitaChecksView.as_view()),
     path("checks/<int:user_id>/", ToggleContabilitaCheckView.as_view()),
+    path("payroll/", PayrollView.as_view()),
+    path("export/", ExportPayrollView.as_view()),
+    path("close/", PayrollCloseView.as_view()),
 ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:30
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_populate_user_roles'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayrollClose',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField()),
+                ('month', models.PositiveSmallIntegerField()),
+                ('closed_at', models.DateTimeField(auto_now_add=True)),
+                ('closed_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='payroll_closes', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-year', '-month'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Payslip',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField()),
+                ('month', models.PositiveSmallIntegerField()),
+                ('username', models.CharField(max_length=150)),
+                ('lines', models.JSONField(default=list, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('total', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('close', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payslips', to='users.payrollclose')),
+                ('contabilita_check', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='payslips', to='users.contabilitacheck')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payslips', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['year', 'month', 'username'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='payrollclose',
+            constraint=models.UniqueConstraint(fields=('year', 'month'), name='unique_payroll_close'),
+        ),
+        migrations.AddConstraint(
+            model_name='payslip',
+            constraint=models.UniqueConstraint(fields=('year', 'month', 'user'), name='unique_payslip_month_user'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_payroll_close_payslip'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='max_weekly_hours',
+            field=models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Ore settimanali massime'),
+        ),
+    ]
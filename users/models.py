@@ -1,6 +1,7 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 
 class UserRole(models.Model):
     code = models.CharField(max_length=50, unique=True)
@@ -20,6 +21,12 @@ class User(AbstractUser):
         related_name="users",
         blank=True
     )
+    # limite usato dall'assegnazione automatica degli slot liberi
+    max_weekly_hours = models.PositiveSmallIntegerField(
+        null=True,
+        blank=True,
+        verbose_name="Ore settimanali massime"
+    )
 
     def __str__(self):
         return f"{self.username} ({self.first_name} {self.last_name})"
@@ -43,3 +50,68 @@ class ContabilitaCheck(models.Model):
 
     def __str__(self):
         return f"{self.checked_by} → {self.user}"
+
+
+class PayrollClose(models.Model):
+    """
+    Chiusura contabile di un mese: i compensi di tutti i collaboratori
+    vengono congelati una volta sola nei Payslip del mese.
+    """
+    year = models.PositiveSmallIntegerField()
+    month = models.PositiveSmallIntegerField()
+    closed_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name="payroll_closes"
+    )
+    closed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["year", "month"], name="unique_payroll_close"),
+        ]
+        ordering = ["-year", "-month"]
+
+    def __str__(self):
+        return f"Chiusura {self.month:02d}/{self.year}"
+
+
+class Payslip(models.Model):
+    """
+    Cedolino congelato di un collaboratore per un mese chiuso.
+    Le righe (lines) sono quelle di compute_payroll al momento della
+    chiusura: non cambiano più se turni o tariffe vengono modificati.
+    """
+    close = models.ForeignKey(
+        PayrollClose,
+        on_delete=models.CASCADE,
+        related_name="payslips"
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="payslips"
+    )
+    contabilita_check = models.ForeignKey(
+        ContabilitaCheck,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="payslips"
+    )
+    # copie di year / month della chiusura: lettura con un solo indice
+    year = models.PositiveSmallIntegerField()
+    month = models.PositiveSmallIntegerField()
+    username = models.CharField(max_length=150)
+    lines = models.JSONField(encoder=DjangoJSONEncoder, default=list)
+    total = models.DecimalField(max_digits=10, decimal_places=2)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["year", "month", "user"], name="unique_payslip_month_user"),
+        ]
+        ordering = ["year", "month", "username"]
+
+    def __str__(self):
+        return f"{self.username} {self.month:02d}/{self.year}"
@@ -0,0 +1,205 @@
+"""
+Chiusura contabile dei mesi.
+
+close_month calcola una sola volta i compensi di tutti i collaboratori
+(compute_payroll, dal registro ore) e li congela in Payslip collegati
+alla ContabilitaCheck del collaboratore. I mesi chiusi si leggono poi con
+una sola query sull'indice (year, month, user), senza ricalcolare nulla
+con le tariffe correnti. Lo snapshot non si sovrascrive: per
+rigenerarlo bisogna prima riaprire il mese (reopen_month lo elimina in
+blocco) e poi chiuderlo di nuovo.
+
+Anche l'export (export_line_items) legge i mesi chiusi dai cedolini e
+ricalcola solo quelli aperti, così coincide con payroll_for_year.
+"""
+from calendar import monthrange
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+
+from courses.payroll import EXPORT_COLUMNS, compute_payroll, iter_line_items
+from .models import ContabilitaCheck, PayrollClose, Payslip
+
+DECIMAL_KEYS = ("quantity", "rate", "subtotal")
+
+
+class MonthAlreadyClosed(Exception):
+    """Il mese ha già uno snapshot: va riaperto prima di richiuderlo."""
+
+
+class ClosedMonthSplit(ValueError):
+    """Il periodo dell'export copre solo una parte di un mese chiuso."""
+
+
+def month_bounds(year, month):
+    return date(year, month, 1), date(year, month, monthrange(year, month)[1])
+
+
+def close_month(year, month, closed_by=None):
+    """
+    Chiude il mese congelando in un'unica transazione i compensi calcolati ora.
+    Restituisce la PayrollClose creata; solleva MonthAlreadyClosed se il
+    mese è già chiuso.
+    """
+    start, end = month_bounds(year, month)
+
+    with transaction.atomic():
+        if PayrollClose.objects.filter(year=year, month=month).exists():
+            raise MonthAlreadyClosed(f"{month:02d}/{year} è già chiuso: riaprirlo prima di richiuderlo")
+        close = PayrollClose.objects.create(year=year, month=month, closed_by=closed_by)
+
+        results = compute_payroll(start, end)
+
+        # ultima spunta di contabilità per ogni collaboratore
+        checks = dict(
+            ContabilitaCheck.objects
+            .filter(user_id__in=[r["user_id"] for r in results])
+            .order_by("user_id", "checked_at")
+            .values_list("user_id", "id")
+        )
+
+        Payslip.objects.bulk_create([
+            Payslip(
+                close=close,
+                user_id=r["user_id"],
+                contabilita_check_id=checks.get(r["user_id"]),
+                year=year,
+                month=month,
+                username=r["username"],
+                lines=r["lines"],
+                total=r["total"],
+            )
+            for r in results
+        ], batch_size=500)
+
+    return close
+
+
+def reopen_month(year, month):
+    """Riapre il mese eliminando lo snapshot. Restituisce False se non era chiuso."""
+    deleted, _ = PayrollClose.objects.filter(year=year, month=month).delete()
+    return bool(deleted)
+
+
+def _thaw_line(line):
+    line = dict(line)
+    for key in DECIMAL_KEYS:
+        line[key] = Decimal(line[key])
+    return line
+
+
+def payslip_results(year, months, user_ids=None):
+    """Cedolini congelati nel formato di compute_payroll."""
+    qs = Payslip.objects.filter(year=year, month__in=months)
+    if user_ids is not None:
+        qs = qs.filter(user_id__in=user_ids)
+
+    return [
+        {
+            "user_id": p.user_id,
+            "username": p.username,
+            "year": p.year,
+            "month": p.month,
+            "lines": [_thaw_line(line) for line in p.lines],
+            "total": p.total,
+            "closed": True,
+        }
+        for p in qs.only("user_id", "username", "year", "month", "lines", "total")
+    ]
+
+
+def payroll_for_year(year, month=None, user_ids=None):
+    """
+    Compensi dell'anno (o di un solo mese): snapshot per i mesi chiusi,
+    calcolo dal registro ore per quelli aperti.
+    """
+    months = [month] if month else list(range(1, 13))
+    closed = set(
+        PayrollClose.objects.filter(year=year, month__in=months).values_list("month", flat=True)
+    )
+
+    results = payslip_results(year, sorted(closed), user_ids) if closed else []
+
+    open_months = [m for m in months if m not in closed]
+    if open_months:
+        start, _ = month_bounds(year, open_months[0])
+        _, end = month_bounds(year, open_months[-1])
+        for item in compute_payroll(start, end, user_ids):
+            if item["month"] not in closed:
+                item["closed"] = False
+                results.append(item)
+
+    results.sort(key=lambda r: (r["username"], r["year"], r["month"]))
+    return results
+
+
+# ----------------------------------------------------------
+# EXPORT
+# ----------------------------------------------------------
+def _months(start, end):
+    current = date(start.year, start.month, 1)
+    while current <= end:
+        yield current.year, current.month
+        current = (current + timedelta(days=32)).replace(day=1)
+
+
+def _payslip_items(year, month):
+    """Voci dell'export di un mese chiuso, dai cedolini congelati."""
+    payslips = (
+        Payslip.objects
+        .filter(year=year, month=month)
+        .order_by("username", "user_id")
+        .values_list("user_id", "username", "user__first_name", "user__last_name", "lines")
+    )
+    for user_id, username, first_name, last_name, lines in payslips.iterator(chunk_size=500):
+        for line in lines:
+            line = _thaw_line(line)
+            yield {
+                "user_id": user_id,
+                "username": username,
+                "first_name": first_name,
+                "last_name": last_name,
+                "year": year,
+                "month": month,
+                **{key: line[key] for key in EXPORT_COLUMNS[6:]},
+            }
+
+
+def export_line_items(start, end):
+    """
+    Voci di compenso di tutti i collaboratori tra start e end (inclusi), in
+    ordine di mese: i mesi chiusi dai cedolini, gli intervalli aperti
+    calcolati con iter_line_items. Lo snapshot vale per il mese intero:
+    solleva ClosedMonthSplit (prima di iniziare lo streaming) se il
+    periodo ne copre solo una parte.
+    """
+    months = list(_months(start, end))
+    closed = set(
+        PayrollClose.objects
+        .filter(year__gte=start.year, year__lte=end.year)
+        .values_list("year", "month")
+    ) & set(months)
+
+    for year, month in sorted(closed):
+        first, last = month_bounds(year, month)
+        if start > first or end < last:
+            raise ClosedMonthSplit(
+                f"{month:02d}/{year} è chiuso: il periodo deve comprendere il mese intero"
+            )
+
+    def items():
+        open_start = None
+        for year, month in months:
+            first, last = month_bounds(year, month)
+            if (year, month) not in closed:
+                open_start = open_start or max(start, first)
+                continue
+            if open_start:
+                yield from iter_line_items(open_start, first - timedelta(days=1))
+                open_start = None
+            yield from _payslip_items(year, month)
+        if open_start:
+            yield from iter_line_items(open_start, end)
+
+    return items()
@@ -0,0 +1,13 @@
+from rest_framework.permissions import BasePermission
+
+
+class IsContabilita(BasePermission):
+    """Staff o collaboratori con il ruolo "contabilita" (compensi di tutti)."""
+    message = "Non autorizzato"
+
+    def has_permission(self, request, view):
+        user = request.user
+        return bool(
+            user and user.is_authenticated and
+            (user.is_staff or user.roles.filter(code="contabilita").exists())
+        )
@@ -0,0 +1,75 @@
+import csv
+from datetime import date, time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from courses.models import CategoryBaseRate
+from shifts.models import Shift
+from .models import UserRole
+
+User = get_user_model()
+
+
+# ============================================================
+#  COMPENSI: parametri (user-014)
+# ============================================================
+class PayrollYearValidationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username="admin", is_staff=True))
+
+    def test_year_outside_date_range_is_rejected(self):
+        for year in ("0", "10000", "-1"):
+            response = self.client.get("/api/contabilita/payroll/", {"year": year})
+            self.assertEqual(response.status_code, 400, year)
+
+    def test_close_with_invalid_year_is_rejected(self):
+        response = self.client.post("/api/contabilita/close/", {"year": 0, "month": 3}, format="json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_valid_year(self):
+        response = self.client.get("/api/contabilita/payroll/", {"year": 2025, "month": 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [])
+
+
+# ============================================================
+#  EXPORT DEI MESI CHIUSI (user-013)
+# ============================================================
+class ExportClosedMonthTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username="admin", is_staff=True))
+        role = UserRole.objects.get(code="bagnino")
+        CategoryBaseRate.objects.filter(role=role).delete()
+        self.rate = CategoryBaseRate.objects.create(role=role, base_rate=Decimal("10.00"))
+        worker = User.objects.create(username="mario")
+        worker.roles.add(role)
+        for day in (date(2025, 3, 3), date(2025, 4, 7)):
+            Shift.objects.create(user=worker, role=role, date=day, start_time=time(8), end_time=time(10))
+
+    def _export(self, **params):
+        response = self.client.get("/api/contabilita/export/", {"output": "csv", **params})
+        self.assertEqual(response.status_code, 200)
+        rows = list(csv.DictReader(b"".join(response.streaming_content).decode().splitlines()))
+        return {(row["year"], row["month"]): row["subtotal"] for row in rows if row["username"] == "mario"}
+
+    def test_closed_month_exports_the_frozen_payslip(self):
+        self.client.post("/api/contabilita/close/", {"year": 2025, "month": 3}, format="json")
+        self.rate.base_rate = Decimal("15.00")
+        self.rate.save()
+
+        subtotals = self._export(start="2025-03-01", end="2025-04-30")
+
+        # marzo dal cedolino (vecchia tariffa), aprile ricalcolato
+        self.assertEqual(subtotals, {("2025", "3"): "20.00", ("2025", "4"): "30.00"})
+        payroll = self.client.get("/api/contabilita/payroll/", {"year": 2025, "month": 3}).json()
+        self.assertEqual(Decimal(str(payroll[0]["total"])), Decimal("20.00"))
+
+    def test_period_splitting_a_closed_month_is_rejected(self):
+        self.client.post("/api/contabilita/close/", {"year": 2025, "month": 3}, format="json")
+        response = self.client.get("/api/contabilita/export/", {"start": "2025-03-10", "end": "2025-04-30"})
+        self.assertEqual(response.status_code, 400)
@@ -1,7 +1,13 @@
 # Standard library
+import csv
+import json
+from datetime import MAXYEAR, MINYEAR
+
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
 
 # Django REST Framework
 from rest_framework import generics, status
@@ -13,7 +19,13 @@ from rest_framework.views import APIView
 from rest_framework.viewsets import ReadOnlyModelViewSet
 
 # Local imports
-from .models import UserRole, ContabilitaCheck
+from courses.payroll import EXPORT_COLUMNS
+from shifts.periods import PeriodError, parse_period
+from .models import UserRole, ContabilitaCheck, PayrollClose
+from .payslips import (
+    ClosedMonthSplit, MonthAlreadyClosed, close_month, export_line_items, payroll_for_year, reopen_month,
+)
+from .permissions import IsContabilita
 from .serializers import RegisterSerializer, UserRoleSerializer, UserListSerializer
 
 User = get_user_model()
@@ -160,3 +172,182 @@ class MyContabilitaChecksView(APIView):
             }
             for c in checks
         ])
+
+
+def _parse_year(value):
+    """Anno dai parametri; ValueError se non è un anno valido per datetime.date."""
+    year = int(value)
+    if not MINYEAR <= year <= MAXYEAR:
+        raise ValueError
+    return year
+
+
+class PayrollView(APIView):
+    """
+    GET /api/contabilita/payroll/?year=2025&month=3[&user=12]
+    Compensi mensili (senza month: tutto l'anno). I mesi chiusi vengono
+    letti dai cedolini congelati, gli altri calcolati dal database.
+    Staff e contabilità vedono tutti, gli altri solo se stessi.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            year = _parse_year(request.query_params.get("year"))
+            month = request.query_params.get("month")
+            month = int(month) if month else None
+            if month is not None and not 1 <= month <= 12:
+                raise ValueError
+        except (TypeError, ValueError):
+            return Response(
+                {"detail": "year (e month) devono essere numeri validi"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        user_id = request.query_params.get("user")
+        user_ids = None
+        if user_id:
+            try:
+                user_ids = [int(user_id)]
+            except ValueError:
+                return Response(
+                    {"detail": "user non valido"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        # i collaboratori vedono solo il proprio compenso
+        if not IsContabilita().has_permission(request, self):
+            if user_ids not in (None, [request.user.id]):
+                return Response({"detail": "Non autorizzato"}, status=status.HTTP_403_FORBIDDEN)
+            user_ids = [request.user.id]
+
+        return Response(payroll_for_year(year, month, user_ids))
+
+
+class PayrollCloseView(APIView):
+    """
+    GET    /api/contabilita/close/?year=2025         → mesi chiusi
+    POST   /api/contabilita/close/ {year, month}     → chiude il mese (409 se già chiuso)
+    DELETE /api/contabilita/close/?year=2025&month=3 → riapre il mese
+    Solo staff e contabilità.
+    """
+    permission_classes = [IsContabilita]
+
+    def _parse(self, data):
+        year = _parse_year(data.get("year"))
+        month = int(data.get("month"))
+        if not 1 <= month <= 12:
+            raise ValueError
+        return year, month
+
+    def get(self, request):
+        closes = PayrollClose.objects.select_related("closed_by")
+        year = request.query_params.get("year")
+        if year:
+            if not year.isdigit():
+                return Response({"detail": "year non valido"}, status=status.HTTP_400_BAD_REQUEST)
+            closes = closes.filter(year=int(year))
+
+        return Response([
+            {
+                "year": c.year,
+                "month": c.month,
+                "closed_by": c.closed_by.username if c.closed_by else None,
+                "closed_at": c.closed_at,
+            }
+            for c in closes
+        ])
+
+    def post(self, request):
+        try:
+            year, month = self._parse(request.data)
+        except (TypeError, ValueError):
+            return Response(
+                {"detail": "year e month devono essere numeri validi"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            close = close_month(year, month, request.user)
+        except MonthAlreadyClosed as e:
+            return Response({"detail": str(e)}, status=status.HTTP_409_CONFLICT)
+        return Response({
+            "year": close.year,
+            "month": close.month,
+            "closed_at": close.closed_at,
+            "payslips": close.payslips.count(),
+        }, status=status.HTTP_201_CREATED)
+
+    def delete(self, request):
+        try:
+            year, month = self._parse(request.query_params)
+        except (TypeError, ValueError):
+            return Response(
+                {"detail": "year e month devono essere numeri validi"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if not reopen_month(year, month):
+            return Response({"detail": "Mese non chiuso"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class _Echo:
+    """Pseudo-buffer per csv.writer: restituisce la riga invece di scriverla."""
+    def write(self, value):
+        return value
+
+
+class ExportPayrollView(APIView):
+    """
+    GET /api/contabilita/export/?year=2025&month=3&output=csv
+    GET /api/contabilita/export/?start=2025-01-01&end=2025-12-31&output=jsonl
+    (periodi come in shifts/periods.py, es. anche week=2025-W10)
+
+    Export in streaming dei compensi di tutti i collaboratori:
+    una riga per utente / mese / ruolo / tipo corso.
+    I mesi chiusi vengono dai cedolini congelati (come PayrollView).
+    Solo staff e contabilità.
+    """
+    permission_classes = [IsContabilita]
+
+    def get(self, request):
+        params = request.query_params
+        try:
+            period = parse_period(params, required=True)
+        except PeriodError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        start, end = period.start, period.last
+
+        # "format" è riservato alla content negotiation di DRF
+        fmt = params.get("output", "csv")
+        try:
+            items = export_line_items(start, end)
+        except ClosedMonthSplit as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        filename = f"compensi_{start.isoformat()}_{end.isoformat()}"
+
+        if fmt == "jsonl":
+            response = StreamingHttpResponse(
+                (json.dumps(item, cls=DjangoJSONEncoder) + "\n" for item in items),
+                content_type="application/x-ndjson",
+            )
+            response["Content-Disposition"] = f'attachment; filename="{filename}.jsonl"'
+            return response
+
+        if fmt != "csv":
+            return Response(
+                {"detail": "output deve essere csv o jsonl"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        writer = csv.writer(_Echo())
+
+        def rows():
+            yield writer.writerow(EXPORT_COLUMNS)
+            for item in items:
+                yield writer.writerow([item[c] for c in EXPORT_COLUMNS])
+
+        response = StreamingHttpResponse(rows(), content_type="text/csv")
+        response["Content-Disposition"] = f'attachment; filename="{filename}.csv"'
+        return response